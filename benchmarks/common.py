@@ -0,0 +1,35 @@
+# benchmarks/common.py
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+# БД по умолчанию для бенчмарков: SQLite в памяти (не трогает рабочую базу).
+# Для замеров на PostgreSQL передайте --database-url postgresql+asyncpg://...
+DEFAULT_BENCH_DATABASE_URL = "sqlite+aiosqlite://"
+
+
+class QueryCounter:
+    """
+    Считает SQL-выражения, отправленные движком, и ORM-объекты, загруженные из результатов.
+    Использование:
+        counter = QueryCounter(engine)
+        counter.reset(); await some_crud(...); print(counter.statements, counter.rows)
+    """
+    def __init__(self, engine: AsyncEngine):
+        self.statements = 0
+        self.rows = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(Session, "loaded_as_persistent", self._on_load)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+    def _on_load(self, session, instance):
+        self.rows += 1
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.rows = 0
+
+    def snapshot(self) -> tuple[int, int]:
+        return self.statements, self.rows
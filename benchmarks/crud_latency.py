@@ -0,0 +1,523 @@
+# benchmarks/crud_latency.py
+"""
+Бенчмарк задержек функций db/crud.py на синтетических наборах данных (по умолчанию 10 тыс., 100 тыс.
+и 1 млн заявок).
+
+Для каждого размера база очищается и заполняется генератором benchmarks/seed.py (детерминированно),
+затем каждая функция выполняется --iterations раз, каждый раз в новой сессии и с пустыми кэшами
+приложения (замеряется путь с промахом кэша). Списки с курсорной пагинацией замеряются на первой,
+средней и последней странице; accept_request - при одновременном принятии одной заявки --contention
+инженерами. Массовые операции (bulk_*) меняют весь набор данных и не замеряются - замеряется их
+предпросмотр (count_*).
+
+Отчет: p50/p95/p99 задержки, число SQL-запросов и загруженных ORM-объектов на вызов.
+Базовая линия (по умолчанию benchmarks/baselines/crud_<диалект>.json) хранит эти показатели
+и планы запросов (EXPLAIN в PostgreSQL, EXPLAIN QUERY PLAN в SQLite). Регрессией считается:
+  * рост числа запросов;
+  * изменение плана хотя бы одного запроса (другой индекс, полный просмотр вместо поиска по индексу);
+  * рост p95 больше чем на --tolerance (доля) и одновременно больше чем на --min-delta-ms.
+Число запросов и планы от машины не зависят, задержки - зависят. В репозитории хранится эталонная
+базовая линия SQLite (baselines/crud_sqlite.json): с ней сравнивайте с --no-latency. Для проверки
+задержек (например, в CI) сохраните базовую линию на той же машине с кодом основной ветки
+(--save-baseline --baseline PATH), затем запустите проверку изменений с тем же --baseline PATH.
+
+ВНИМАНИЕ: пользователи и заявки в целевой БД удаляются. По умолчанию используется временный
+файл SQLite; для PostgreSQL укажите отдельную базу. Скрипт не запустится, если в базе есть
+пользователи, созданные не генератором.
+
+Запуск:
+    python -m benchmarks.crud_latency [--database-url URL] [--sizes 10000 100000 1000000]
+                                      [--iterations 50] [--contention 8] [--rounds 20]
+                                      [--baseline PATH] [--save-baseline]
+                                      [--tolerance 0.5] [--min-delta-ms 2.0] [--no-latency]
+Код возврата 1 при регрессии относительно базовой линии или ошибках при конкурентном принятии.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import math
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker
+
+from benchmarks.common import QueryCounter
+from benchmarks.seed import USER_ID_BASE, seed, truncate
+from db import crud
+from db.cache import user_directory
+from db.database import create_db_engine
+from db.migrations.runner import migrate
+from db.models import Request, RequestStatus, User, UserRole
+from db.pagination import (
+    USERS_SORT_KEY, WAITING_SORT_KEY, SortKey, active_sort_key, archive_sort_key, encode_cursor
+)
+from db.partitions import ACTIVE_PARTITION_KEY
+from db.stats import get_period_stats
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger(__name__)
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+# Последний день периода генерации: одинаковые данные при каждом запуске
+BENCH_END_DATE = datetime.date(2025, 1, 1)
+BENCH_SEED = 42
+PAGE_SIZE = 10
+# Заявок в выборке для get_request (перебираются по кругу)
+REQUEST_SAMPLE_SIZE = 200
+# Запросы, для которых снимается план (INSERT и служебные команды не интересны)
+_EXPLAINABLE = re.compile(r"\s*(SELECT|WITH|UPDATE|DELETE)\b", re.IGNORECASE)
+# Секции архива создаются по месяцам: в сигнатуре плана их имена обобщаются
+_ARCHIVE_PARTITION = re.compile(r"requests_archive_\d{4}_\d{2}")
+
+Call = Callable[[AsyncSession, int], Awaitable[Any]]
+
+
+class Dataset(NamedTuple):
+    """Объекты загруженного набора, на которых замеряются функции."""
+    request_ids: list[int]
+    waiting_ids: list[int]
+    engineer_ids: list[int]
+    busy_engineer_id: int
+    archive_engineer_id: int
+    client_id: int
+    building: str
+    middle_cursors: dict[str, str | None]
+
+
+class PlanRecorder:
+    """Запоминает запросы, выполненные при включенной записи, и снимает их планы."""
+    def __init__(self, engine: AsyncEngine):
+        self.recording = False
+        self._statements: dict[str, Any] = {}
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.recording and not executemany and _EXPLAINABLE.match(statement):
+            self._statements.setdefault(statement, parameters)
+
+    async def explain(self, engine: AsyncEngine) -> list[str]:
+        """
+        Отсортированные сигнатуры планов записанных запросов; запись очищается.
+        Порядок выполнения не учитывается: SELECT'ы selectinload разных связей идут в произвольном порядке.
+        """
+        statements, self._statements = self._statements, {}
+        async with engine.connect() as conn:
+            return sorted([await _plan_signature(conn, statement, parameters) for statement, parameters in statements.items()])
+
+
+def _plan_nodes(node: dict, nodes: list[str]) -> None:
+    description = node["Node Type"]
+    if "Index Name" in node:
+        description += f" using {node['Index Name']}"
+    elif "Relation Name" in node:
+        description += f" on {node['Relation Name']}"
+    nodes.append(description)
+    for child in node.get("Plans", ()):
+        _plan_nodes(child, nodes)
+
+async def _plan_signature(conn: AsyncConnection, statement: str, parameters) -> str:
+    """
+    План запроса без оценок стоимости: узлы с таблицами и индексами.
+    Одинаковые узлы подряд (просмотр нескольких секций архива) сворачиваются в один.
+    """
+    parameters = tuple(parameters) if parameters else None
+    if conn.dialect.name == "postgresql":
+        document = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)).scalar_one()
+        if isinstance(document, str):
+            document = json.loads(document)
+        nodes = []
+        _plan_nodes(document[0]["Plan"], nodes)
+    else:
+        result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        nodes = [row[-1] for row in result]
+    signature = []
+    for node in nodes:
+        node = _ARCHIVE_PARTITION.sub("requests_archive_*", node)
+        if not signature or signature[-1] != node:
+            signature.append(node)
+    return " > ".join(signature)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+def _summary(latencies: list[float], statements: int, rows: int, plan: list[str]) -> dict:
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "statements": statements,
+        "rows": rows,
+        "plan": plan,
+    }
+
+def _reset_caches() -> None:
+    user_directory.clear()
+    crud._count_cache.clear()
+
+
+# --- Подготовка набора данных ---
+async def _check_disposable(engine: AsyncEngine) -> bool:
+    """В базе нет пользователей, кроме созданных генератором (ее можно очищать)."""
+    async with engine.connect() as conn:
+        foreign = (await conn.execute(select(func.count()).select_from(User).where(User.id < USER_ID_BASE))).scalar_one()
+    return foreign == 0
+
+async def _middle_cursor(session: AsyncSession, key: SortKey, *conditions) -> str | None:
+    """Курсор на строку в середине списка (начало средней страницы)."""
+    id_column = key.columns[-1]
+    total = (await session.execute(
+        select(func.count()).select_from(select(id_column).where(*conditions).subquery())
+    )).scalar_one()
+    if total == 0:
+        return None
+    order = [column.desc() if key.descending else column.asc() for column in key.columns]
+    row = (await session.execute(
+        select(*key.columns).where(*conditions).order_by(*order).offset(total // 2).limit(1)
+    )).one()
+    return encode_cursor(row, key)
+
+async def _top_by_count(session: AsyncSession, column, *conditions) -> int | None:
+    """Значение column с наибольшим числом заявок (самый загруженный инженер или клиент)."""
+    return (await session.execute(
+        select(column).where(column.is_not(None), *conditions)
+        .group_by(column).order_by(func.count().desc(), column).limit(1)
+    )).scalar_one_or_none()
+
+async def load_dataset(session: AsyncSession, rounds: int, contention: int) -> Dataset:
+    active = Request.archived_month == ACTIVE_PARTITION_KEY
+    archive = Request.archived_month < ACTIVE_PARTITION_KEY
+    waiting = (active, Request.status == RequestStatus.WAITING)
+    in_progress = (active, Request.status == RequestStatus.IN_PROGRESS)
+    archived = (archive, Request.status == RequestStatus.ARCHIVED)
+
+    engineer_ids = list((await session.execute(
+        select(User.id).where(User.role == UserRole.ENGINEER).order_by(User.id).limit(max(contention, 1))
+    )).scalars())
+    busy_engineer_id = await _top_by_count(session, Request.engineer_id, *in_progress) or engineer_ids[0]
+    archive_engineer_id = await _top_by_count(session, Request.engineer_id, *archived) or engineer_ids[0]
+    client_id = await _top_by_count(
+        session, Request.requester_id, active,
+        Request.status.not_in([RequestStatus.ARCHIVED, RequestStatus.CANCELED])
+    )
+    if client_id is None:
+        client_id = (await session.execute(
+            select(User.id).where(User.role == UserRole.CLIENT).order_by(User.id).limit(1)
+        )).scalar_one()
+    building = (await session.execute(
+        select(Request.building).where(*waiting).group_by(Request.building)
+        .order_by(func.count().desc(), Request.building).limit(1)
+    )).scalar_one_or_none() or ""
+
+    min_id, max_id = (await session.execute(select(func.min(Request.id), func.max(Request.id)))).one()
+    rng = random.Random(BENCH_SEED)
+    request_ids = [rng.randint(min_id, max_id) for _ in range(REQUEST_SAMPLE_SIZE)]
+    waiting_ids = list((await session.execute(
+        select(Request.id).where(*waiting).order_by(Request.created_at, Request.id).limit(rounds)
+    )).scalars())
+
+    middle_cursors = {
+        "get_new_requests": await _middle_cursor(session, WAITING_SORT_KEY, *waiting),
+        "get_all_in_progress_requests": await _middle_cursor(session, active_sort_key('accepted_asc'), *in_progress),
+        "get_engineer_requests": await _middle_cursor(
+            session, active_sort_key('accepted_asc'), *in_progress, Request.engineer_id == busy_engineer_id
+        ),
+        "get_archived_requests": await _middle_cursor(session, archive_sort_key('date_desc'), *archived),
+        "get_all_users": await _middle_cursor(session, USERS_SORT_KEY),
+    }
+    return Dataset(
+        request_ids, waiting_ids, engineer_ids, busy_engineer_id, archive_engineer_id,
+        client_id, building, middle_cursors
+    )
+
+
+# --- Замеры ---
+def _page_cases(name: str, fetch: Callable, middle_cursor: str | None) -> dict[str, Call]:
+    """Первая, средняя и последняя (пустой курсор в обратном направлении) страницы списка."""
+    return {
+        f"{name}[first]": lambda s, i: fetch(s, limit=PAGE_SIZE),
+        f"{name}[middle]": lambda s, i: fetch(s, limit=PAGE_SIZE, cursor=middle_cursor),
+        f"{name}[last]": lambda s, i: fetch(s, limit=PAGE_SIZE, cursor="", backward=True),
+    }
+
+def read_cases(data: Dataset) -> dict[str, Call]:
+    """Функции чтения; вызов получает сессию и номер итерации."""
+    cursors = data.middle_cursors
+    before = datetime.datetime.combine(BENCH_END_DATE, datetime.time(), tzinfo=datetime.timezone.utc) - datetime.timedelta(days=180)
+    sample = data.request_ids
+    return {
+        "get_user": lambda s, i: crud.get_user(s, data.client_id),
+        "get_user_role": lambda s, i: crud.get_user_role(s, data.client_id),
+        "get_user_snapshots": lambda s, i: crud.get_user_snapshots(s, set(data.engineer_ids) | {data.client_id}),
+        "get_users_by_role": lambda s, i: crud.get_users_by_role(s, UserRole.ENGINEER),
+        "get_user_with_requests": lambda s, i: crud.get_user_with_requests(s, data.busy_engineer_id),
+        **_page_cases("get_all_users", crud.get_all_users, cursors["get_all_users"]),
+        "get_request": lambda s, i: crud.get_request(s, sample[i % len(sample)]),
+        **_page_cases("get_new_requests", crud.get_new_requests, cursors["get_new_requests"]),
+        **_page_cases(
+            "get_all_in_progress_requests", crud.get_all_in_progress_requests, cursors["get_all_in_progress_requests"]
+        ),
+        **_page_cases(
+            "get_engineer_requests",
+            lambda s, **page: crud.get_engineer_requests(s, data.busy_engineer_id, **page),
+            cursors["get_engineer_requests"]
+        ),
+        **_page_cases("get_archived_requests", crud.get_archived_requests, cursors["get_archived_requests"]),
+        "get_archived_requests(engineer)[first]": lambda s, i: crud.get_archived_requests(
+            s, limit=PAGE_SIZE, engineer_id=data.archive_engineer_id
+        ),
+        "get_client_requests": lambda s, i: crud.get_client_requests(s, data.client_id),
+        "get_request_timeline": lambda s, i: crud.get_request_timeline(s, sample[i % len(sample)]),
+        "search_requests(text)": lambda s, i: crud.search_requests(s, text="принтер не печатает", limit=PAGE_SIZE),
+        "search_requests(building)": lambda s, i: crud.search_requests(s, building=data.building[:4], limit=PAGE_SIZE),
+        "get_in_progress_engineers": lambda s, i: crud.get_in_progress_engineers(s),
+        "count_reassignable_requests": lambda s, i: crud.count_reassignable_requests(s, data.busy_engineer_id),
+        "get_waiting_buildings": lambda s, i: crud.get_waiting_buildings(s),
+        "count_waiting_building_requests": lambda s, i: crud.count_waiting_building_requests(s, data.building),
+        "count_requests_created_before": lambda s, i: crud.count_requests_created_before(s, before),
+        "get_period_stats": lambda s, i: get_period_stats(s, days=30, today=BENCH_END_DATE),
+    }
+
+
+class Runner:
+    def __init__(self, engine: AsyncEngine, iterations: int):
+        self.engine = engine
+        self.session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        self.counter = QueryCounter(engine)
+        self.recorder = PlanRecorder(engine)
+        self.iterations = iterations
+
+    async def measure(self, call: Call, iterations: int | None = None, warmup: bool = True) -> dict:
+        """
+        Выполняет call в новой сессии с пустыми кэшами. Прогрев (первое соединение, компиляция
+        выражений SQLAlchemy) не учитывается; планы снимаются с запросов первой замеренной итерации.
+        """
+        if warmup:
+            _reset_caches()
+            async with self.session_factory() as session:
+                await call(session, 0)
+        latencies, statements, rows = [], 0, 0
+        for iteration in range(iterations if iterations is not None else self.iterations):
+            _reset_caches()
+            async with self.session_factory() as session:
+                self.counter.reset()
+                self.recorder.recording = iteration == 0
+                started_at = time.perf_counter()
+                await call(session, iteration)
+                latencies.append(time.perf_counter() - started_at)
+                self.recorder.recording = False
+                statements = max(statements, self.counter.statements)
+                rows = max(rows, self.counter.rows)
+        return _summary(latencies, statements, rows, await self.recorder.explain(self.engine))
+
+    async def _timed_accept(self, request_id: int, engineer_id: int) -> tuple[float, int | None]:
+        async with self.session_factory() as session:
+            started_at = time.perf_counter()
+            request = await crud.accept_request(session, request_id, engineer_id)
+            return time.perf_counter() - started_at, engineer_id if request else None
+
+    async def measure_contention(self, request_ids: list[int], engineer_ids: list[int]) -> tuple[dict, list[tuple[int, int]], int]:
+        """
+        Каждую заявку одновременно принимают все engineer_ids (каждый в своей сессии).
+        Задержка - по каждой попытке, запросы - суммарно за раунд. Возвращает (итоги,
+        [(заявка, принявший инженер)], число раундов с ошибками или не одним победителем).
+        """
+        latencies, statements, accepted, failures = [], 0, [], 0
+        for round_number, request_id in enumerate(request_ids):
+            _reset_caches()
+            self.counter.reset()
+            self.recorder.recording = round_number == 0
+            outcomes = await asyncio.gather(
+                *(self._timed_accept(request_id, engineer_id) for engineer_id in engineer_ids),
+                return_exceptions=True
+            )
+            self.recorder.recording = False
+            statements = max(statements, self.counter.statements)
+            winners, errors = [], 0
+            for outcome in outcomes:
+                if isinstance(outcome, BaseException):
+                    errors += 1
+                    log.error(f"accept_request({request_id}) failed under contention: {outcome!r}")
+                    continue
+                latency, winner = outcome
+                latencies.append(latency)
+                if winner is not None:
+                    winners.append(winner)
+            if len(winners) == 1 and not errors:
+                accepted.append((request_id, winners[0]))
+            else:
+                failures += 1
+                log.error(f"Request {request_id}: {len(winners)} engineers accepted it under contention.")
+        if not latencies:
+            return {}, accepted, failures
+        plan = await self.recorder.explain(self.engine)
+        return _summary(latencies, statements, 0, plan), accepted, failures
+
+
+async def measure_size(runner: Runner, data: Dataset, contention: int) -> tuple[dict[str, dict], int]:
+    """Все замеры на загруженном наборе: сначала чтение, затем записи (они меняют данные)."""
+    results = {}
+    for name, call in read_cases(data).items():
+        results[name] = await runner.measure(call)
+
+    results["create_request"] = await runner.measure(
+        lambda s, i: crud.create_request(
+            s, data.client_id, "Bench Client", data.building or "Корпус А", "101", f"Бенчмарк: заявка {i}"
+        ),
+        warmup=False
+    )
+    contention_result, accepted, failures = await runner.measure_contention(
+        data.waiting_ids, data.engineer_ids[:contention]
+    )
+    if contention_result:
+        results["accept_request[contention]"] = contention_result
+    if accepted:
+        results["complete_request"] = await runner.measure(
+            lambda s, i: crud.complete_request(s, *accepted[i]), iterations=len(accepted), warmup=False
+        )
+    # Имя меняется на каждой итерации: замеряется запись, а не пропуск неизмененного профиля
+    results["get_or_create_user"] = await runner.measure(
+        lambda s, i: crud.get_or_create_user(s, data.client_id, None, "Bench", f"Client {i}"), warmup=False
+    )
+    results["set_user_role"] = await runner.measure(
+        lambda s, i: crud.set_user_role(s, data.client_id, UserRole.CLIENT), warmup=False
+    )
+    return results, failures
+
+
+# --- Базовая линия ---
+def load_baseline(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8")).get("sizes", {})
+
+def save_baseline(path: Path, dialect: str, by_size: dict[int, dict[str, dict]]) -> None:
+    """Записывает показатели замеренных размеров (остальные размеры в файле сохраняются)."""
+    sizes = load_baseline(path)
+    sizes.update({str(size): results for size, results in by_size.items()})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps({"dialect": dialect, "sizes": sizes}, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+    )
+    log.info(f"Baseline saved to {path}.")
+
+def compare(
+    results: dict[str, dict],
+    baseline: dict[str, dict],
+    tolerance: float,
+    min_delta_ms: float,
+    check_latency: bool = True
+) -> list[str]:
+    """
+    Регрессии относительно базовой линии (функции без базовой линии не проверяются).
+    check_latency=False - только число запросов и планы (не зависят от машины).
+    """
+    problems = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current["statements"] > base["statements"]:
+            problems.append(f"{name}: запросов {base['statements']} -> {current['statements']}")
+        # Планы сравниваются как мультимножества (без учета порядка запросов)
+        base_plan, current_plan = Counter(base["plan"]), Counter(current["plan"])
+        if current_plan != base_plan:
+            changed = [f"      было:  {plan}" for plan in (base_plan - current_plan).elements()]
+            changed += [f"      стало: {plan}" for plan in (current_plan - base_plan).elements()]
+            problems.append(f"{name}: изменился план запросов\n" + "\n".join(changed))
+        p95, base_p95 = current["p95_ms"], base["p95_ms"]
+        if check_latency and p95 > base_p95 * (1 + tolerance) and p95 - base_p95 > min_delta_ms:
+            problems.append(f"{name}: p95 {base_p95:.2f} мс -> {p95:.2f} мс")
+    return problems
+
+
+def print_report(size: int, results: dict[str, dict]) -> None:
+    header = f"{'функция':<46}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'запросов':>10}{'строк':>8}"
+    print(f"\nN={size}")
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        print(
+            f"{name:<46}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            f"{result['statements']:>10}{result['rows']:>8}"
+        )
+
+
+async def run(args) -> bool:
+    engine = create_db_engine(args.database_url)
+    dialect = engine.dialect.name
+    baseline_path = args.baseline or BASELINE_DIR / f"crud_{dialect}.json"
+    baseline = {} if args.save_baseline else load_baseline(baseline_path)
+    runner = Runner(engine, args.iterations)
+    by_size, problems, failures = {}, [], 0
+    try:
+        await migrate(engine)
+        if not await _check_disposable(engine):
+            log.error("Database contains users not created by benchmarks.seed: refusing to truncate it.")
+            return False
+        for size in args.sizes:
+            log.info(f"Seeding {size} requests...")
+            await truncate(engine)
+            await seed(engine, users=max(size // 10, 100), requests=size, seed_value=BENCH_SEED, end_date=BENCH_END_DATE)
+            async with runner.session_factory() as session:
+                data = await load_dataset(session, args.rounds, args.contention)
+            results, size_failures = await measure_size(runner, data, args.contention)
+            failures += size_failures
+            by_size[size] = results
+            print_report(size, results)
+            if str(size) in baseline:
+                problems.extend(f"N={size} {problem}" for problem in compare(
+                    results, baseline[str(size)], args.tolerance, args.min_delta_ms, check_latency=not args.no_latency
+                ))
+            elif not args.save_baseline:
+                log.warning(f"No baseline for N={size} in {baseline_path}: comparison skipped.")
+    finally:
+        await engine.dispose()
+
+    if args.save_baseline:
+        save_baseline(baseline_path, dialect, by_size)
+    if failures:
+        print(f"\nРаундов конкурентного принятия с ошибками: {failures}")
+    if problems:
+        print("\nРЕГРЕССИИ:")
+        for problem in problems:
+            print(f"  {problem}")
+    return not problems and not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк задержек и планов запросов функций db/crud.py")
+    parser.add_argument("--database-url", default=None, help="По умолчанию - временный файл SQLite. База будет очищена!")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="Размеры наборов (заявок)")
+    parser.add_argument("--iterations", type=int, default=50, help="Вызовов каждой функции")
+    parser.add_argument("--contention", type=int, default=8, help="Инженеров, одновременно принимающих заявку")
+    parser.add_argument("--rounds", type=int, default=20, help="Заявок, принимаемых под конкуренцией")
+    parser.add_argument("--baseline", type=Path, default=None, help="Файл базовой линии (по умолчанию baselines/crud_<диалект>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Сохранить результаты как базовую линию")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Допустимый рост p95 (доля)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Рост p95 меньше этого не считается регрессией")
+    parser.add_argument(
+        "--no-latency", action="store_true",
+        help="Сравнивать с базовой линией только число запросов и планы (для базовой линии с другой машины)"
+    )
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.database_url is None:
+            args.database_url = f"sqlite+aiosqlite:///{tmp_dir}/crud_latency.db"
+        ok = asyncio.run(run(args))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+# benchmarks/seed.py
+"""
+Генератор синтетических данных production-масштаба (пользователи и заявки).
+
+Данные детерминированы: одинаковые --seed, --end-date и размеры дают одинаковые строки.
+Распределения приближены к реальным: роли (клиенты/инженеры/админы), рост потока заявок
+со временем, рабочие часы и дни, статусы в зависимости от возраста заявки, "активные"
+клиенты и инженеры с большой историей.
+
+Загрузка пакетами: в PostgreSQL - через COPY (asyncpg copy_records_to_table),
+в остальных СУБД - многострочными INSERT. Схема должна быть создана миграциями.
+Загруженные заявки затем добавляются в таблицы статистики (request_stats_*)
+тем же проходом, что и при миграции m0005. Если в базе уже есть сгенерированные пользователи,
+загрузка без --truncate не начинается (их id совпали бы с новыми).
+
+Запуск:
+    python -m benchmarks.seed [--database-url URL] [--users 100000] [--requests 1000000]
+                              [--seed 42] [--days 365] [--end-date 2025-01-01]
+                              [--batch-size 10000] [--truncate]
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+import random
+import sys
+import time
+from typing import Iterator
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from db.migrations.m0005_request_stats import backfill as backfill_stats
+from db.migrations.runner import check_schema_version
+from db.models import Request, RequestLatencyStats, RequestStatsDaily, RequestStatus, User, UserRole
+from db.partitions import ACTIVE_PARTITION_KEY, archive_partition_key
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger(__name__)
+
+# ID сгенерированных пользователей начинаются отсюда (не пересекаются с реальными Telegram ID тестовых аккаунтов)
+USER_ID_BASE = 7_000_000_000
+
+FIRST_NAMES = [
+    "Иван", "Петр", "Анна", "Мария", "Сергей", "Елена", "Алексей", "Ольга", "Дмитрий", "Наталья",
+    "Андрей", "Татьяна", "Михаил", "Ирина", "Артем", "Екатерина", "Евгений", "Светлана", "Николай", "Юлия",
+]
+LAST_NAMES = [
+    "Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов", "Михайлов", "Новиков",
+    "Федоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семенов", "Егоров", "Павлов", "Козлов", "Степанов",
+]
+BUILDINGS = ["Корпус А", "Корпус Б", "Корпус В", "Корпус Г", "АБК", "Склад", "Лаборатория", "Удаленно"]
+PROBLEMS = [
+    "Не работает", "Не включается", "Зависает", "Медленно работает", "Не печатает", "Ошибка при запуске",
+    "Нужно установить", "Нужно обновить", "Не подключается", "Сломался", "Шумит", "Требуется замена",
+]
+DEVICES = [
+    "принтер HP LaserJet", "компьютер", "ноутбук", "монитор", "сканер штрихкодов", "МФУ Kyocera",
+    "1С Бухгалтерия", "MS Office", "Outlook", "VPN", "сетевой диск", "телефон IP", "проектор", "Wi-Fi",
+]
+DETAILS = [
+    "", "", "Срочно.", "После обновления Windows.", "Выдает синий экран.", "Пишет ошибку доступа.",
+    "Не видит сеть.", "Замялась бумага.", "Нужна консультация.", "Проблема повторяется каждый день.",
+]
+# Вес часа создания заявки (по местному времени): поток в рабочие часы
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 10, 30, 60, 70, 65, 45, 60, 65, 60, 45, 25, 10, 5, 3, 2, 1, 1]
+
+
+def generate_users(rng: random.Random, count: int) -> Iterator[dict]:
+    """Пользователи: ~1% инженеров, 1 админ на 5000 (минимум 2 инженера и 1 админ), остальные клиенты."""
+    admins = max(1, count // 5000)
+    engineers = max(2, count // 100)
+    registered_base = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    for index in range(count):
+        if index < admins:
+            role = UserRole.ADMIN
+        elif index < admins + engineers:
+            role = UserRole.ENGINEER
+        else:
+            role = UserRole.CLIENT
+        user_id = USER_ID_BASE + index
+        yield {
+            "id": user_id,
+            "username": f"user{user_id}" if rng.random() < 0.6 else None,
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES) if rng.random() < 0.8 else None,
+            "role": role,
+            "phone_number": None,
+            "registered_at": registered_base + datetime.timedelta(seconds=index),
+        }
+
+
+def _skewed_choice(rng: random.Random, items: list[int], skew: float) -> int:
+    """Элемент списка с перекосом к началу: skew > 1 - несколько "активных" элементов получают большую долю."""
+    return items[int(len(items) * rng.random() ** skew)]
+
+def _pick_status(rng: random.Random, age: datetime.timedelta) -> RequestStatus:
+    """Статус в зависимости от возраста заявки: старые почти все в архиве, свежие - в очереди и в работе."""
+    roll = rng.random()
+    if age > datetime.timedelta(days=14):
+        return RequestStatus.CANCELED if roll < 0.04 else RequestStatus.ARCHIVED
+    if roll < 0.15:
+        return RequestStatus.WAITING
+    if roll < 0.40:
+        return RequestStatus.IN_PROGRESS
+    if roll < 0.45:
+        return RequestStatus.CANCELED
+    return RequestStatus.ARCHIVED
+
+def generate_requests(
+    rng: random.Random,
+    count: int,
+    client_ids: list[int],
+    engineer_ids: list[int],
+    end: datetime.datetime,
+    days: int,
+    start_index: int = 0,
+    stop_index: int | None = None
+) -> Iterator[dict]:
+    """
+    Заявки с индексами [start_index, stop_index) из count: дата создания растет с индексом
+    (поток заявок увеличивается ближе к end), время суток - по HOUR_WEIGHTS, выходные реже.
+    """
+    start = end - datetime.timedelta(days=days)
+    stop_index = count if stop_index is None else stop_index
+    for index in range(start_index, stop_index):
+        # Плотность заявок растет со временем: день = days * x^0.75
+        day = int(days * ((index + rng.random()) / count) ** 0.75)
+        created_day = start + datetime.timedelta(days=min(day, days - 1))
+        if created_day.weekday() >= 5 and rng.random() < 0.7:
+            created_day -= datetime.timedelta(days=created_day.weekday() - 4) # Переносим на пятницу
+        hour = rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+        created_at = created_day + datetime.timedelta(hours=hour, seconds=rng.randrange(3600))
+        if created_at > end:
+            created_at = end - datetime.timedelta(seconds=rng.randrange(3600))
+
+        status = _pick_status(rng, end - created_at)
+        accepted_at = completed_at = archived_at = None
+        engineer_id = None
+        if status in (RequestStatus.IN_PROGRESS, RequestStatus.ARCHIVED):
+            engineer_id = _skewed_choice(rng, engineer_ids, 1.5)
+            accepted_at = created_at + datetime.timedelta(seconds=rng.expovariate(1 / 7200))
+            if status == RequestStatus.ARCHIVED:
+                completed_at = accepted_at + datetime.timedelta(seconds=rng.expovariate(1 / 86400))
+                archived_at = completed_at
+            # События "из будущего" откатываем к более раннему статусу
+            if completed_at and completed_at > end:
+                status, completed_at, archived_at = RequestStatus.IN_PROGRESS, None, None
+            if accepted_at > end:
+                status, accepted_at, engineer_id = RequestStatus.WAITING, None, None
+
+        requester_id = _skewed_choice(rng, client_ids, 2.0)
+        description = f"{rng.choice(PROBLEMS)} {rng.choice(DEVICES)}. {rng.choice(DETAILS)}".strip()
+        yield {
+            "requester_id": requester_id,
+            "engineer_id": engineer_id,
+            "full_name": f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}",
+            "building": rng.choice(BUILDINGS),
+            "room": str(rng.randint(1, 520)),
+            "description": description,
+            "pc_number": f"INV-{rng.randrange(100000):05d}" if rng.random() < 0.6 else None,
+            "contact_phone": f"+79{rng.randrange(10**9):09d}" if rng.random() < 0.9 else None,
+            "status": status,
+            "created_at": created_at,
+            "accepted_at": accepted_at,
+            "completed_at": completed_at,
+            "archived_at": archived_at,
+            "last_updated_at": archived_at or accepted_at or created_at,
+            "archived_month": archive_partition_key(archived_at) if archived_at else ACTIVE_PARTITION_KEY,
+        }
+
+
+class BulkLoader:
+    """Пакетная запись строк: COPY в PostgreSQL, многострочный INSERT в остальных СУБД."""
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.use_copy = engine.dialect.name == "postgresql"
+
+    async def load(self, table, rows: list[dict]) -> None:
+        if not rows:
+            return
+        if self.use_copy:
+            columns = list(rows[0])
+            records = [
+                tuple(value.name if isinstance(value, (UserRole, RequestStatus)) else value for value in row.values())
+                for row in rows
+            ]
+            async with self.engine.connect() as conn:
+                raw_connection = await conn.get_raw_connection()
+                # Соединение asyncpg в режиме автокоммита: COPY фиксируется сам
+                await raw_connection.driver_connection.copy_records_to_table(
+                    table.name, records=records, columns=columns
+                )
+        else:
+            async with self.engine.begin() as conn:
+                await conn.execute(insert(table), rows)
+
+
+class Progress:
+    """Логирует ход загрузки: строки, процент, скорость."""
+    def __init__(self, name: str, total: int):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.started_at = time.perf_counter()
+
+    def advance(self, count: int) -> None:
+        self.done += count
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.done / elapsed if elapsed > 0 else 0
+        percent = self.done * 100 / self.total if self.total else 100
+        log.info(f"{self.name}: {self.done}/{self.total} ({percent:.0f}%), {rate:,.0f} rows/s")
+
+
+async def count_seeded_users(engine: AsyncEngine) -> int:
+    """Пользователи, ранее созданные генератором (их id снова заняли бы новые пользователи)."""
+    async with engine.connect() as conn:
+        return (await conn.execute(select(func.count()).select_from(User).where(User.id >= USER_ID_BASE))).scalar_one()
+
+async def truncate(engine: AsyncEngine) -> None:
+    """Удаляет пользователей, заявки и статистику по заявкам."""
+    async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            await conn.execute(text(
+                "TRUNCATE requests, users, request_stats_daily, request_latency_stats RESTART IDENTITY CASCADE"
+            ))
+        else:
+            await conn.execute(delete(RequestStatsDaily))
+            await conn.execute(delete(RequestLatencyStats))
+            await conn.execute(delete(Request))
+            await conn.execute(delete(User))
+
+async def seed(
+    engine: AsyncEngine,
+    users: int,
+    requests: int,
+    seed_value: int = 42,
+    days: int = 365,
+    end_date: datetime.date | None = None,
+    batch_size: int = 10000
+) -> None:
+    """Генерирует и загружает users пользователей и requests заявок, добавляет заявки в статистику."""
+    end_date = end_date or datetime.datetime.now(datetime.timezone.utc).date()
+    end = datetime.datetime.combine(end_date, datetime.time(), tzinfo=datetime.timezone.utc)
+    rng = random.Random(seed_value)
+    loader = BulkLoader(engine)
+
+    client_ids, engineer_ids = [], []
+    progress = Progress("users", users)
+    batch = []
+    for user in generate_users(rng, users):
+        (engineer_ids if user["role"] == UserRole.ENGINEER else client_ids).append(user["id"])
+        batch.append(user)
+        if len(batch) >= batch_size:
+            await loader.load(User.__table__, batch)
+            progress.advance(len(batch))
+            batch = []
+    await loader.load(User.__table__, batch)
+    progress.advance(len(batch))
+
+    # Заявки, которые были в базе до загрузки, в статистике уже учтены
+    async with engine.connect() as conn:
+        last_request_id = (await conn.execute(select(func.coalesce(func.max(Request.id), 0)))).scalar_one()
+    progress = Progress("requests", requests)
+    for batch_start in range(0, requests, batch_size):
+        batch_stop = min(batch_start + batch_size, requests)
+        batch = list(generate_requests(
+            rng, requests, client_ids, engineer_ids, end, days, batch_start, batch_stop
+        ))
+        # Внутри пакета порядок вставки = порядок создания (id растет вместе с created_at)
+        batch.sort(key=lambda row: row["created_at"])
+        await loader.load(Request.__table__, batch)
+        progress.advance(len(batch))
+
+    log.info("Filling request statistics...")
+    async with engine.begin() as conn:
+        await conn.run_sync(backfill_stats, last_request_id)
+
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as conn:
+            for table_name in ("users", "requests", "request_stats_daily", "request_latency_stats"):
+                await conn.execute(text(f"ANALYZE {table_name}"))
+            await conn.commit()
+
+
+async def run(args) -> bool:
+    engine = create_async_engine(args.database_url, echo=False)
+    try:
+        current_version, expected_version = await check_schema_version(engine)
+        if current_version < expected_version:
+            log.error(f"Schema version {current_version} < {expected_version}: run `python main.py migrate` first.")
+            return False
+        if args.truncate:
+            log.info("Truncating users and requests...")
+            await truncate(engine)
+        else:
+            # id пользователей фиксированы (USER_ID_BASE + номер): повторная загрузка упала бы
+            # на конфликте ключа после частично зафиксированных пакетов
+            seeded_users = await count_seeded_users(engine)
+            if seeded_users:
+                log.error(f"Database already contains {seeded_users} seeded users: run with --truncate to reseed.")
+                return False
+        await seed(
+            engine, args.users, args.requests, seed_value=args.seed, days=args.days,
+            end_date=args.end_date, batch_size=args.batch_size
+        )
+        return True
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генератор синтетических пользователей и заявок")
+    parser.add_argument("--database-url", default=None, help="По умолчанию - БД из config.py (.env)")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365, help="Период, за который создаются заявки")
+    parser.add_argument(
+        "--end-date", type=datetime.date.fromisoformat, default=None,
+        help="Последний день периода (YYYY-MM-DD), по умолчанию сегодня. Для воспроизводимости задайте явно."
+    )
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--truncate", action="store_true", help="Удалить существующих пользователей, заявки и статистику")
+    args = parser.parse_args()
+    if args.database_url is None:
+        from config import DATABASE_URL
+        args.database_url = DATABASE_URL
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
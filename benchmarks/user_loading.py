@@ -0,0 +1,131 @@
+# benchmarks/user_loading.py
+"""
+Регрессионный бенчмарк загрузки пользователя и заявок.
+
+Проверяет, что количество SQL-запросов и загруженных строк у "горячих" функций
+(get_user, get_user_role, get_request, первая страница истории) не растет
+вместе с историей заявок пользователя.
+
+Запуск:
+    python -m benchmarks.user_loading [--database-url URL] [--sizes 10 100 1000 5000]
+Код возврата 1, если показатели хотя бы одной функции зависят от размера истории.
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+import sys
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from benchmarks.common import DEFAULT_BENCH_DATABASE_URL, QueryCounter
+from db import crud
+from db.cache import user_directory
+from db.database import Base
+from db.models import Request, RequestStatus, User, UserRole
+from db.partitions import archive_partition_key
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger(__name__)
+
+ENGINEER_ID = 900000001
+CLIENT_ID = 900000002
+ARCHIVED_AT = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+async def seed_history(session: AsyncSession, size: int) -> int:
+    """Пересоздает инженера и клиента с `size` архивными заявками. Возвращает ID одной из заявок."""
+    await session.execute(delete(Request).where(Request.engineer_id == ENGINEER_ID))
+    await session.execute(delete(User).where(User.id.in_([ENGINEER_ID, CLIENT_ID])))
+    await session.execute(insert(User), [
+        {"id": ENGINEER_ID, "first_name": "Bench", "last_name": "Engineer", "role": UserRole.ENGINEER},
+        {"id": CLIENT_ID, "first_name": "Bench", "last_name": "Client", "role": UserRole.CLIENT},
+    ])
+    rows = [
+        {
+            "requester_id": CLIENT_ID, "engineer_id": ENGINEER_ID, "building": "B", "room": str(i),
+            "description": f"benchmark request {i}", "status": RequestStatus.ARCHIVED,
+            "archived_at": ARCHIVED_AT - datetime.timedelta(minutes=i),
+            "archived_month": archive_partition_key(ARCHIVED_AT - datetime.timedelta(minutes=i)),
+        }
+        for i in range(size)
+    ]
+    # Одна активная заявка, чтобы get_request всегда было что загружать
+    rows.append({
+        "requester_id": CLIENT_ID, "engineer_id": ENGINEER_ID, "building": "B", "room": "0",
+        "description": "benchmark active request", "status": RequestStatus.IN_PROGRESS,
+    })
+    await session.execute(insert(Request), rows)
+    await session.commit()
+    result = await session.execute(
+        select(Request.id).where(Request.engineer_id == ENGINEER_ID, Request.status == RequestStatus.IN_PROGRESS)
+    )
+    return result.scalar_one()
+
+
+async def measure(session_factory: async_sessionmaker[AsyncSession], counter: QueryCounter, request_id: int) -> dict[str, tuple[int, int]]:
+    """Выполняет каждую функцию в новой сессии и возвращает {имя: (запросов, строк)}."""
+    cases = {
+        "get_user": lambda s: crud.get_user(s, ENGINEER_ID),
+        "get_user_role": lambda s: crud.get_user_role(s, ENGINEER_ID),
+        "get_request": lambda s: crud.get_request(s, request_id),
+        "get_archived_requests(page 0)": lambda s: crud.get_archived_requests(s, limit=5, engineer_id=ENGINEER_ID),
+        "get_engineer_requests(page 0)": lambda s: crud.get_engineer_requests(s, ENGINEER_ID, limit=5),
+    }
+    results = {}
+    for name, call in cases.items():
+        user_directory.clear() # Замеряем путь с промахом кэшей
+        crud.invalidate_request_counts(RequestStatus.ARCHIVED, RequestStatus.IN_PROGRESS, engineer_id=ENGINEER_ID)
+        async with session_factory() as session:
+            counter.reset()
+            await call(session)
+            results[name] = counter.snapshot()
+    return results
+
+
+async def run(database_url: str, sizes: list[int]) -> bool:
+    engine = create_async_engine(database_url, echo=False)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    counter = QueryCounter(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    by_size = {}
+    try:
+        for size in sizes:
+            async with session_factory() as session:
+                request_id = await seed_history(session, size)
+            by_size[size] = await measure(session_factory, counter, request_id)
+    finally:
+        async with session_factory() as session:
+            await session.execute(delete(Request).where(Request.engineer_id == ENGINEER_ID))
+            await session.execute(delete(User).where(User.id.in_([ENGINEER_ID, CLIENT_ID])))
+            await session.commit()
+        await engine.dispose()
+
+    ok = True
+    names = list(by_size[sizes[0]])
+    header = f"{'функция':<32}" + "".join(f"{f'N={size}':>14}" for size in sizes)
+    print(header)
+    print("-" * len(header))
+    for name in names:
+        values = [by_size[size][name] for size in sizes]
+        stable = len(set(values)) == 1
+        ok = ok and stable
+        cells = "".join(f"{f'{q} q / {r} r':>14}" for q, r in values)
+        print(f"{name:<32}{cells}  {'OK' if stable else 'РАСТЕТ!'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк: загрузка пользователя не зависит от размера истории")
+    parser.add_argument("--database-url", default=DEFAULT_BENCH_DATABASE_URL)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    args = parser.parse_args()
+    ok = asyncio.run(run(args.database_url, args.sizes))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ from aiogram.filters import BaseFilter
 from aiogram.types import Message, CallbackQuery
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.crud import get_user 
+from db.crud import get_user_role 
 from db.models import UserRole 
 
 
@@ -30,11 +30,11 @@ class RoleFilter(BaseFilter):
         if not user:
             return False 
 
-        # Получаем пользователя из БД
-        db_user = await get_user(session, user.id)
+        # Получаем роль пользователя (из кэша в памяти, при промахе - из БД)
+        role = await get_user_role(session, user.id)
 
-        if not db_user:
+        if not role:
             return False
 
         # Проверяем, входит ли роль пользователя в список разрешенных
-        return db_user.role in self.allowed_roles
\ No newline at end of file
+        return role in self.allowed_roles
\ No newline at end of file
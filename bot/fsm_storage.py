@@ -0,0 +1,206 @@
+# bot/fsm_storage.py
+"""
+Хранилища состояний FSM (aiogram) вместо MemoryStorage.
+
+DbStorage хранит состояния в таблице fsm_states (db/fsm.py): незаконченная форма заявки не теряется
+при перезапуске и доступна любому экземпляру бота. Чтобы шаг формы (update_data + set_state,
+иногда несколько update_data) не превращался в несколько запросов, изменения за время обработки
+апдейта копятся в памяти и пишутся одной командой после хендлера. Границы апдейта задает
+DbEventIsolation (передается в Dispatcher как events_isolation: aiogram оборачивает им чтение
+состояния и вызов хендлера). Она же выполняет апдейты одного ключа по очереди (в пределах процесса),
+чтобы шаги формы не перемешивались. Итого на апдейт - не больше одного чтения (следующий апдейт
+того же ключа из очереди его не повторяет) и одной записи (без записи, если состояние не изменилось).
+
+Вне апдейта (например, из скрипта) каждое изменение пишется сразу.
+
+BoundedMemoryStorage - хранилище в памяти процесса для одного экземпляра бота (FSM_STORAGE=memory).
+В отличие от MemoryStorage, которая хранит запись каждого написавшего боту пользователя вечно,
+пустые записи не хранятся, брошенные формы удаляются через ttl, а число записей ограничено
+(вытесняются давно не использованные). Удаленная форма для пользователя выглядит как сброс диалога.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, NamedTuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import DEFAULT_DESTINY, BaseEventIsolation, BaseStorage, StateType, StorageKey
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import metrics
+from db.cache import TTLCache
+from db.fsm import delete_expired, read_state, write_state
+
+FSM_READS = metrics.counter("fsm_storage_reads_total", "FSM states read from the database")
+FSM_WRITES = metrics.counter("fsm_storage_writes_total", "FSM states written to (or deleted from) the database")
+FSM_EXPIRED = metrics.counter("fsm_storage_expired_total", "Expired FSM states deleted from the database")
+FSM_MEMORY_EVICTIONS = metrics.counter(
+    "fsm_memory_evictions_total", "FSM states evicted from memory, by reason (expired, lru)", label="reason"
+)
+
+# Значение по умолчанию аргументов _change: "не менять" (None - допустимое состояние)
+_UNCHANGED: Any = object()
+
+
+def storage_key(key: StorageKey) -> str:
+    """Компактный строковый ключ: "bot:chat:user", для тем, бизнес-чатов и других destiny - с их полями."""
+    parts: list[Any] = [key.bot_id, key.chat_id, key.user_id]
+    if key.thread_id or key.business_connection_id or key.destiny != DEFAULT_DESTINY:
+        parts += [key.thread_id or "", key.business_connection_id or "", key.destiny]
+    return ":".join(map(str, parts))
+
+
+class _Record:
+    """Состояние ключа на время обработки апдейта."""
+    __slots__ = ("state", "data", "loaded", "dirty", "users", "lock")
+
+    def __init__(self):
+        self.state: str | None = None
+        self.data: dict[str, Any] = {}
+        self.loaded = False   # Прочитано из БД
+        self.dirty = False    # Изменено, но не записано
+        self.users = 0        # Апдейтов этого ключа в обработке и в очереди
+        self.lock = asyncio.Lock()
+
+
+class DbStorage(BaseStorage):
+    """Хранилище FSM в БД с объединением записей в пределах апдейта и сроком жизни ttl секунд."""
+    def __init__(self, engine: AsyncEngine, ttl: float):
+        self.engine = engine
+        self.ttl = ttl
+        # Ключи апдейтов в обработке (апдейты одного ключа в очереди делят одну запись)
+        self._open: dict[StorageKey, _Record] = {}
+
+    async def _load(self, key: StorageKey, record: _Record) -> _Record:
+        if not record.loaded:
+            state, data = await read_state(self.engine, storage_key(key))
+            FSM_READS.inc()
+            # Пока шло чтение, запись могли загрузить (и изменить) параллельным апдейтом
+            if not record.loaded:
+                record.state, record.data, record.loaded = state, data, True
+        return record
+
+    async def _write(self, key: StorageKey, record: _Record) -> None:
+        await write_state(self.engine, storage_key(key), record.state, record.data, self.ttl)
+        FSM_WRITES.inc()
+        record.dirty = False
+
+    async def _change(self, key: StorageKey, state: str | None = _UNCHANGED, data: dict[str, Any] = _UNCHANGED) -> None:
+        opened = self._open.get(key)
+        record = await self._load(key, opened or _Record())
+        if state is not _UNCHANGED and state != record.state:
+            record.state, record.dirty = state, True
+        if data is not _UNCHANGED and data != record.data:
+            record.data, record.dirty = data.copy(), True
+        if opened is None and record.dirty:
+            await self._write(key, record)
+
+    @asynccontextmanager
+    async def coalesce(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        """Выполняет блоки одного key по очереди; изменения внутри блока записываются одной командой при выходе."""
+        record = self._open.setdefault(key, _Record())
+        record.users += 1
+        try:
+            async with record.lock:
+                try:
+                    yield
+                finally:
+                    if record.dirty:
+                        await self._write(key, record)
+        finally:
+            record.users -= 1
+            if record.users == 0:
+                del self._open[key]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._change(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._load(key, self._open.get(key) or _Record())).state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        await self._change(key, data=data)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return (await self._load(key, self._open.get(key) or _Record())).data.copy()
+
+    async def close(self) -> None:
+        pass
+
+    async def cleanup_loop(self, interval: float) -> None:
+        """Фоновая задача бота: раз в interval секунд удаляет просроченные состояния."""
+        while True:
+            try:
+                deleted = await delete_expired(self.engine)
+                if deleted:
+                    FSM_EXPIRED.inc(deleted)
+                    logging.info(f"Deleted {deleted} expired FSM states.")
+            except Exception as e:
+                logging.error(f"Failed to delete expired FSM states: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+
+class DbEventIsolation(BaseEventIsolation):
+    """Границы апдейта для DbStorage: апдейты ключа по очереди, все изменения состояния за апдейт - одна запись в БД."""
+    def __init__(self, storage: DbStorage):
+        self.storage = storage
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        async with self.storage.coalesce(key):
+            yield
+
+    async def close(self) -> None:
+        pass
+
+
+class _MemoryRecord(NamedTuple):
+    state: str | None
+    data: dict[str, Any]
+
+_EMPTY_RECORD = _MemoryRecord(None, {})
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """
+    Хранилище FSM в памяти процесса: не больше maxsize записей (LRU), запись живет ttl секунд
+    после последнего изменения. Устаревшие записи удаляются при обращении и не реже раза
+    в sweep_interval секунд (при очередном изменении).
+    """
+    def __init__(self, maxsize: int, ttl: float, sweep_interval: float):
+        self.sweep_interval = sweep_interval
+        self._records = TTLCache(
+            maxsize=maxsize, ttl=ttl,
+            on_evict=lambda reason, count: FSM_MEMORY_EVICTIONS.inc(count, label_value=reason)
+        )
+        self._next_sweep_at = time.monotonic() + sweep_interval
+        metrics.gauge("fsm_memory_states", "FSM states held in memory", lambda: len(self._records))
+
+    def _get(self, key: StorageKey) -> _MemoryRecord:
+        return self._records.get(key, _EMPTY_RECORD)
+
+    def _put(self, key: StorageKey, record: _MemoryRecord) -> None:
+        now = time.monotonic()
+        if now >= self._next_sweep_at:
+            self._records.expire()
+            self._next_sweep_at = now + self.sweep_interval
+        if record.state is None and not record.data:
+            self._records.pop(key)
+        else:
+            self._records.set(key, record)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._put(key, self._get(key)._replace(state=state.state if isinstance(state, State) else state))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return self._get(key).state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        self._put(key, self._get(key)._replace(data=data.copy()))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return self._get(key).data.copy()
+
+    async def close(self) -> None:
+        self._records.clear()
@@ -13,11 +13,14 @@ from db.models import UserRole, User, Request, RequestStatus
 # Импорты для показа списков
 from db.crud import (
     get_all_in_progress_requests, get_all_users, get_archived_requests,
-    get_request, get_user, set_user_role 
+    get_request, get_user, get_user_role, get_users_by_role, set_user_role 
 )
+from db.stats import get_period_stats
+from bot.handlers.engineer.manage_requests import build_timeline_text
 from bot.keyboards.inline.admin_inline import (
     get_admin_main_menu, AdminActiveNavCallback, create_admin_active_requests_keyboard,
-    AdminUserManageCallback, create_admin_users_list_keyboard, create_admin_user_profile_keyboard
+    AdminUserManageCallback, create_admin_users_list_keyboard, create_admin_user_profile_keyboard,
+    AdminStatsCallback, create_admin_stats_keyboard
 )
 from bot.keyboards.reply import ADMIN_PANEL_BTN_TEXT
 from bot.keyboards.inline.requests_inline import (
@@ -50,15 +53,21 @@ async def cq_admin_users_list(callback: types.CallbackQuery, callback_data: Admi
     user_id = callback.from_user.id
     logging.info(f"Admin {user_id} requested users list page {current_page}.")
     if current_page < 0: await callback.answer(); return
-    offset = current_page * ADMIN_USERS_PAGE_SIZE
-    users, total_count = await get_all_users(session, limit=ADMIN_USERS_PAGE_SIZE, offset=offset)
+    # Первая страница всегда выбирается с начала списка, остальные - по курсору соседней страницы
+    # (пустой курсор с back=True - последняя страница, выбранная с конца списка)
+    cursor = callback_data.cursor if current_page > 0 else ""
+    backward = callback_data.back and current_page > 0
+    users, total_count = await get_all_users(
+        session, limit=ADMIN_USERS_PAGE_SIZE, cursor=cursor, backward=backward
+    )
     total_pages = math.ceil(total_count / ADMIN_USERS_PAGE_SIZE) if total_count > 0 else 0
-    if current_page >= total_pages and current_page > 0:
+    if not users and current_page > 0:
+        # Страница опустела - показываем последнюю страницу
         current_page = max(0, total_pages - 1)
-        offset = current_page * ADMIN_USERS_PAGE_SIZE
-        users, total_count = await get_all_users(session, limit=ADMIN_USERS_PAGE_SIZE, offset=offset)
+        cursor, backward = "", current_page > 0
+        users, total_count = await get_all_users(session, limit=ADMIN_USERS_PAGE_SIZE, backward=backward)
         total_pages = math.ceil(total_count / ADMIN_USERS_PAGE_SIZE) if total_count > 0 else 0
-    keyboard = create_admin_users_list_keyboard(users, current_page, total_pages)
+    keyboard = create_admin_users_list_keyboard(users, current_page, total_pages, cursor, backward)
     text = f"👥 Пользователи (Всего: {total_count}):"
     await callback.answer()
     try:
@@ -78,17 +87,18 @@ async def cq_admin_active_page(callback: types.CallbackQuery, callback_data: Adm
 
     if current_page < 0: await callback.answer(); return
 
-    offset = current_page * ADMIN_ACTIVE_PAGE_SIZE
+    cursor = callback_data.cursor if current_page > 0 else ""
+    backward = callback_data.back and current_page > 0
     active_requests, total_count = await get_all_in_progress_requests(
-        session, limit=ADMIN_ACTIVE_PAGE_SIZE, offset=offset, sort_by=current_sort
+        session, limit=ADMIN_ACTIVE_PAGE_SIZE, sort_by=current_sort, cursor=cursor, backward=backward
     )
     total_pages = math.ceil(total_count / ADMIN_ACTIVE_PAGE_SIZE) if total_count > 0 else 0
 
-    if current_page >= total_pages and current_page > 0:
+    if not active_requests and current_page > 0:
+        # Страница опустела - показываем последнюю страницу (выборка с конца списка)
         current_page = max(0, total_pages - 1)
-        offset = current_page * ADMIN_ACTIVE_PAGE_SIZE
         active_requests, total_count = await get_all_in_progress_requests(
-             session, limit=ADMIN_ACTIVE_PAGE_SIZE, offset=offset, sort_by=current_sort
+             session, limit=ADMIN_ACTIVE_PAGE_SIZE, sort_by=current_sort, backward=current_page > 0
         )
         total_pages = math.ceil(total_count / ADMIN_ACTIVE_PAGE_SIZE) if total_count > 0 else 0
 
@@ -123,8 +133,7 @@ async def cq_admin_history_page(callback: types.CallbackQuery, callback_data: Hi
     user_id = callback.from_user.id
     current_page = callback_data.page
     current_sort = callback_data.sort_by
-    db_user = await get_user(session, user_id)
-    is_admin = db_user and db_user.role == UserRole.ADMIN
+    is_admin = await get_user_role(session, user_id) == UserRole.ADMIN
 
     if not is_admin:
          logging.warning(f"Non-admin user {user_id} tried to access admin history view.")
@@ -134,20 +143,20 @@ async def cq_admin_history_page(callback: types.CallbackQuery, callback_data: Hi
     logging.info(f"Admin {user_id} requested ALL history page {current_page} (sort: {current_sort}).")
 
     if current_page < 0: await callback.answer(); return
-    offset = current_page * ADMIN_HISTORY_PAGE_SIZE
+    cursor = callback_data.cursor if current_page > 0 else ""
+    backward = callback_data.back and current_page > 0
 
     # Вызываем CRUD для ВСЕХ архивных заявок
     archived_requests, total_count = await get_archived_requests(
-        session=session, limit=ADMIN_HISTORY_PAGE_SIZE,
-        offset=offset, sort_by=current_sort
+        session=session, limit=ADMIN_HISTORY_PAGE_SIZE, sort_by=current_sort,
+        cursor=cursor, backward=backward
     )
     total_pages = math.ceil(total_count / ADMIN_HISTORY_PAGE_SIZE) if total_count > 0 else 0
 
-    if current_page >= total_pages and current_page > 0:
+    if not archived_requests and current_page > 0:
         current_page = max(0, total_pages - 1)
-        offset = current_page * ADMIN_HISTORY_PAGE_SIZE
         archived_requests, total_count = await get_archived_requests(
-             session, ADMIN_HISTORY_PAGE_SIZE, offset, current_sort
+             session, limit=ADMIN_HISTORY_PAGE_SIZE, sort_by=current_sort, backward=current_page > 0
         )
         total_pages = math.ceil(total_count / ADMIN_HISTORY_PAGE_SIZE) if total_count > 0 else 0
 
@@ -200,7 +209,9 @@ async def cq_admin_view_user(callback: types.CallbackQuery, callback_data: Admin
         f"<b>Дата регистрации:</b> {reg_date}\n\n"
         f"Выберите действие:"
     )
-    keyboard = create_admin_user_profile_keyboard(user, current_list_page)
+    keyboard = create_admin_user_profile_keyboard(
+        user, current_list_page, callback_data.cursor, callback_data.back
+    )
     await callback.answer()
     try:
         if callback.message and (callback.message.text != profile_text or callback.message.reply_markup != keyboard):
@@ -226,11 +237,14 @@ async def cq_admin_set_role(callback: types.CallbackQuery, callback_data: AdminU
         await callback.answer("❌ Нельзя изменить свою роль с админа на другую через кнопки.", show_alert=True)
         return
     logging.info(f"Admin {admin_id} trying to set role {new_role_enum.value} for user {target_user_id}.")
-    updated_user = await set_user_role(session, target_user_id, new_role_enum)
+    updated_user = await set_user_role(session, target_user_id, new_role_enum, actor_id=admin_id)
     if updated_user:
         logging.info(f"Role for user {target_user_id} set to {new_role_enum.value} by admin {admin_id}.")
         await callback.answer(f"✅ Роль пользователя обновлена на '{new_role_enum.value}'!", show_alert=False)
-        view_callback_data = AdminUserManageCallback(action="view", user_id=target_user_id, page=current_list_page)
+        view_callback_data = AdminUserManageCallback(
+            action="view", user_id=target_user_id, page=current_list_page,
+            cursor=callback_data.cursor, back=callback_data.back
+        )
         await cq_admin_view_user(callback, view_callback_data, session) # Обновляем профиль
     else:
         logging.error(f"Failed to set role {new_role_enum.value} for user {target_user_id}.")
@@ -272,6 +286,8 @@ async def cq_admin_view_active_request(callback: types.CallbackQuery, callback_d
         f"<b>Принята:</b> {accepted_at}\n\n"
         f"<b>Описание:</b>\n{escape(request.description or 'Нет описания')}"
     )
+    timeline_text = await build_timeline_text(session, request_id)
+    if timeline_text: details_text += f"\n{timeline_text}"
 
     # Клавиатура для админа при просмотре активной заявки
     builder = InlineKeyboardBuilder()
@@ -325,6 +341,8 @@ async def cq_admin_view_archive_request(callback: types.CallbackQuery, callback_
         f"<b>Архивирована:</b> {archived_at}\n\n"
         f"<b>Описание:</b>\n{escape(request.description or 'Нет описания')}"
     )
+    timeline_text = await build_timeline_text(session, request_id)
+    if timeline_text: details_text += f"\n{timeline_text}"
 
     # Клавиатура для админа при просмотре архивной заявки
     builder = InlineKeyboardBuilder()
@@ -339,6 +357,63 @@ async def cq_admin_view_archive_request(callback: types.CallbackQuery, callback_
     except TelegramBadRequest: pass
     except Exception as e: logging.error(f"Error editing message for admin view archive request {request_id}: {e}", exc_info=True)
 
+# --- Статистика (из предагрегированных таблиц, db/stats.py) ---
+def _format_duration(seconds: float | None) -> str:
+    """Длительность в виде '2 ч 15 мин' / '3 д 4 ч'; inf - больше последней корзины гистограммы."""
+    if seconds is None:
+        return "-"
+    if math.isinf(seconds):
+        return "> 14 д"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} мин"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours} ч {minutes} мин" if minutes else f"{hours} ч"
+    days, hours = divmod(hours, 24)
+    return f"{days} д {hours} ч" if hours else f"{days} д"
+
+@router.callback_query(AdminStatsCallback.filter())
+async def cq_admin_stats(callback: types.CallbackQuery, callback_data: AdminStatsCallback, session: AsyncSession):
+    days = max(1, callback_data.days)
+    logging.info(f"Admin {callback.from_user.id} requested statistics for {days} days.")
+    stats = await get_period_stats(session, days)
+    engineers = {engineer.id: engineer for engineer in await get_users_by_role(session, UserRole.ENGINEER)}
+
+    period_text = "сегодня" if days == 1 else f"последние {days} дн."
+    lines = [
+        f"📊 <b>Статистика за {period_text}</b> (UTC)\n",
+        f"🆕 Создано: {stats.created}",
+        f"🛠️ Принято в работу: {stats.accepted}",
+        f"✅ Выполнено: {stats.completed}",
+        f"❌ Отменено: {stats.canceled}\n",
+        "<b>Время до принятия:</b>",
+        f"  среднее {_format_duration(stats.accept_avg)}, медиана ≤ {_format_duration(stats.accept_p50)}, "
+        f"90% ≤ {_format_duration(stats.accept_p90)}",
+        "<b>Время выполнения:</b>",
+        f"  среднее {_format_duration(stats.complete_avg)}, медиана ≤ {_format_duration(stats.complete_p50)}, "
+        f"90% ≤ {_format_duration(stats.complete_p90)}",
+    ]
+    if stats.top_engineers:
+        lines.append("\n<b>Инженеры (выполнено, среднее время):</b>")
+        for engineer_id, completed, average in stats.top_engineers:
+            engineer = engineers.get(engineer_id)
+            name = escape(f"{engineer.first_name or ''} {engineer.last_name or ''}".strip()) if engineer else ""
+            lines.append(f"  {name or f'ID {engineer_id}'}: {completed}, {_format_duration(average)}")
+    if stats.top_buildings:
+        lines.append("\n<b>Корпуса (создано заявок):</b>")
+        for building, created in stats.top_buildings:
+            lines.append(f"  {escape(building)}: {created}")
+    text = "\n".join(lines)
+    keyboard = create_admin_stats_keyboard(days)
+
+    await callback.answer()
+    try:
+        if callback.message:
+            await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest: pass
+    except Exception as e: logging.error(f"Error editing message for admin statistics: {e}", exc_info=True)
+
 # --- Возврат в главное меню админки  ---
 @router.callback_query(F.data == "admin_back_to_main")
 async def cq_admin_back_to_main(callback: types.CallbackQuery):
@@ -357,8 +432,3 @@ async def cq_admin_back_to_main(callback: types.CallbackQuery):
         pass
     except Exception as e:
         logging.error(f"Error editing message to admin main menu: {e}", exc_info=True)
-
-# --- Игнорируемые колбэки  ---
-@router.callback_query(F.data.startswith("ignore_"))
-async def cq_admin_ignore(callback: types.CallbackQuery):
-    await callback.answer()
\ No newline at end of file
@@ -0,0 +1,206 @@
+# bot/handlers/admin/bulk_operations.py
+import datetime
+import logging
+from html import escape
+from aiogram import Router, types, F
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.filters.role import RoleFilter
+from bot.keyboards.inline.admin_inline import (
+    AdminBulkCallback, create_admin_bulk_confirm_keyboard, create_admin_bulk_engineers_keyboard,
+    create_admin_bulk_menu_keyboard
+)
+from bot.keyboards.reply import CANCEL_BTN_TEXT, get_cancel_keyboard, get_main_menu_keyboard
+from bot.states.request_states import AdminBulkOperations
+from db.cache import UserSnapshot
+from db.crud import (
+    bulk_archive_requests_created_before, bulk_cancel_building_requests, bulk_reassign_requests,
+    count_reassignable_requests, count_requests_created_before, count_waiting_building_requests,
+    get_in_progress_engineers, get_user_snapshots, get_users_by_role, get_waiting_buildings
+)
+from db.models import UserRole
+
+# Формат даты для архивации старых заявок
+BULK_DATE_FORMAT = "%d.%m.%Y"
+
+BULK_MENU_TEXT = (
+    "🧰 <b>Массовые операции</b>\n\n"
+    "Перед выполнением будет показано, сколько заявок затронет операция."
+)
+
+router = Router()
+router.message.filter(RoleFilter(UserRole.ADMIN))
+router.callback_query.filter(RoleFilter(UserRole.ADMIN))
+
+
+def _user_name(user: UserSnapshot | None, user_id: int) -> str:
+    name = f"{user.first_name or ''} {user.last_name or ''}".strip() if user else ""
+    return name or f"ID:{user_id}"
+
+async def _edit(callback: types.CallbackQuery, text: str, reply_markup: types.InlineKeyboardMarkup | None = None):
+    try:
+        if callback.message:
+            await callback.message.edit_text(text, reply_markup=reply_markup)
+    except TelegramBadRequest: pass
+    except Exception as e: logging.error(f"Error editing message for admin bulk operations: {e}", exc_info=True)
+
+async def _show_preview(message: types.Message, state: FSMContext, operation: dict, count: int, text: str):
+    """Сохраняет операцию в данных FSM и показывает предпросмотр с кнопкой подтверждения."""
+    if count == 0:
+        await state.update_data(bulk_operation=None)
+        await message.answer("Подходящих заявок нет.", reply_markup=create_admin_bulk_menu_keyboard())
+        return
+    await state.update_data(bulk_operation=operation)
+    await message.answer(f"{text}\n\nЗаявок будет изменено: <b>{count}</b>", reply_markup=create_admin_bulk_confirm_keyboard())
+
+
+# --- Меню массовых операций ---
+@router.callback_query(AdminBulkCallback.filter(F.action == "menu"))
+async def cq_bulk_menu(callback: types.CallbackQuery, state: FSMContext):
+    await state.update_data(bulk_operation=None)
+    await callback.answer()
+    await _edit(callback, BULK_MENU_TEXT, create_admin_bulk_menu_keyboard())
+
+# --- Передача заявок другому инженеру ---
+@router.callback_query(AdminBulkCallback.filter(F.action == "reassign"))
+async def cq_bulk_reassign_from(callback: types.CallbackQuery, session: AsyncSession):
+    engineers = await get_in_progress_engineers(session)
+    users = await get_user_snapshots(session, {engineer_id for engineer_id, _ in engineers})
+    buttons = [
+        (engineer_id, f"{_user_name(users.get(engineer_id), engineer_id)} — {count}")
+        for engineer_id, count in engineers
+    ]
+    await callback.answer()
+    await _edit(
+        callback, "🔁 Чьи заявки в работе передать? (в скобках - число заявок)",
+        create_admin_bulk_engineers_keyboard(buttons, action="reassign_from")
+    )
+
+@router.callback_query(AdminBulkCallback.filter(F.action == "reassign_from"))
+async def cq_bulk_reassign_to(callback: types.CallbackQuery, callback_data: AdminBulkCallback, session: AsyncSession):
+    from_id = callback_data.from_id
+    engineers = await get_users_by_role(session, UserRole.ENGINEER)
+    buttons = [(engineer.id, _user_name(engineer, engineer.id)) for engineer in engineers if engineer.id != from_id]
+    from_user = (await get_user_snapshots(session, {from_id})).get(from_id)
+    await callback.answer()
+    await _edit(
+        callback, f"🔁 Кому передать заявки инженера {escape(_user_name(from_user, from_id))}?",
+        create_admin_bulk_engineers_keyboard(buttons, action="reassign_to", from_id=from_id)
+    )
+
+@router.callback_query(AdminBulkCallback.filter(F.action == "reassign_to"))
+async def cq_bulk_reassign_preview(callback: types.CallbackQuery, callback_data: AdminBulkCallback, session: AsyncSession, state: FSMContext):
+    from_id, to_id = callback_data.from_id, callback_data.to_id
+    users = await get_user_snapshots(session, {from_id, to_id})
+    count = await count_reassignable_requests(session, from_id)
+    await callback.answer()
+    if callback.message:
+        await _show_preview(
+            callback.message, state, {"op": "reassign", "from_id": from_id, "to_id": to_id}, count,
+            f"🔁 Передать все заявки в работе от {escape(_user_name(users.get(from_id), from_id))} "
+            f"инженеру {escape(_user_name(users.get(to_id), to_id))}?"
+        )
+
+# --- Отмена новых заявок корпуса ---
+@router.callback_query(AdminBulkCallback.filter(F.action == "cancel_building"))
+async def cq_bulk_cancel_building(callback: types.CallbackQuery, session: AsyncSession, state: FSMContext):
+    buildings = await get_waiting_buildings(session)
+    lines = ["❌ Введите корпус, новые заявки которого нужно отменить (название - точно как в заявках)."]
+    if buildings:
+        lines.append("\nКорпуса с новыми заявками:")
+        lines.extend(f"<code>{escape(building)}</code> — {count}" for building, count in buildings)
+    await state.set_state(AdminBulkOperations.waiting_for_building)
+    await callback.answer()
+    if callback.message:
+        await callback.message.answer("\n".join(lines), reply_markup=get_cancel_keyboard())
+
+# Название корпуса (кнопка "Отмена" обрабатывается общим cancel_handler)
+@router.message(StateFilter(AdminBulkOperations.waiting_for_building), F.text, F.text != CANCEL_BTN_TEXT)
+async def process_bulk_building(message: types.Message, session: AsyncSession, state: FSMContext):
+    building = message.text.strip()
+    count = await count_waiting_building_requests(session, building)
+    logging.info(f"Admin {message.from_user.id} previewing cancel of {count} waiting requests in building '{building}'.")
+    await state.set_state(None)
+    await message.answer("Проверяю заявки...", reply_markup=get_main_menu_keyboard(UserRole.ADMIN))
+    await _show_preview(
+        message, state, {"op": "cancel_building", "building": building}, count,
+        f"❌ Отменить все новые заявки корпуса «{escape(building)}»?"
+    )
+
+# --- Архивация старых заявок ---
+@router.callback_query(AdminBulkCallback.filter(F.action == "archive_before"))
+async def cq_bulk_archive_before(callback: types.CallbackQuery, state: FSMContext):
+    await state.set_state(AdminBulkOperations.waiting_for_date)
+    await callback.answer()
+    if callback.message:
+        await callback.message.answer(
+            "🗄️ Введите дату в формате ДД.ММ.ГГГГ: новые и находящиеся в работе заявки, "
+            "созданные раньше этой даты (UTC), будут перенесены в архив.",
+            reply_markup=get_cancel_keyboard()
+        )
+
+@router.message(StateFilter(AdminBulkOperations.waiting_for_date), F.text, F.text != CANCEL_BTN_TEXT)
+async def process_bulk_date(message: types.Message, session: AsyncSession, state: FSMContext):
+    try:
+        before_date = datetime.datetime.strptime(message.text.strip(), BULK_DATE_FORMAT).date()
+    except ValueError:
+        await message.answer("Неверный формат даты. Введите дату как ДД.ММ.ГГГГ, например 01.09.2024.")
+        return
+    if before_date > datetime.datetime.now(datetime.timezone.utc).date():
+        await message.answer("Дата не может быть в будущем. Введите другую дату.")
+        return
+    before = datetime.datetime.combine(before_date, datetime.time.min, tzinfo=datetime.timezone.utc)
+    count = await count_requests_created_before(session, before)
+    logging.info(f"Admin {message.from_user.id} previewing archive of {count} requests created before {before_date}.")
+    await state.set_state(None)
+    await message.answer("Проверяю заявки...", reply_markup=get_main_menu_keyboard(UserRole.ADMIN))
+    await _show_preview(
+        message, state, {"op": "archive_before", "before": before_date.isoformat()}, count,
+        f"🗄️ Перенести в архив все новые и находящиеся в работе заявки, созданные до {before_date:%d.%m.%Y}?"
+    )
+
+# --- Подтверждение и выполнение ---
+@router.callback_query(AdminBulkCallback.filter(F.action == "confirm"))
+async def cq_bulk_confirm(callback: types.CallbackQuery, session: AsyncSession, state: FSMContext):
+    admin_id = callback.from_user.id
+    operation = (await state.get_data()).get("bulk_operation")
+    if not operation:
+        await callback.answer("Операция устарела, начните заново.", show_alert=True)
+        return
+    # Сбрасываем до выполнения: повторное нажатие не запустит операцию второй раз
+    await state.update_data(bulk_operation=None)
+    await callback.answer()
+    await _edit(callback, "⏳ Выполняется...")
+    logging.info(f"Admin {admin_id} started bulk operation {operation}.")
+
+    try:
+        if operation["op"] == "reassign":
+            count = await bulk_reassign_requests(session, operation["from_id"], operation["to_id"], actor_id=admin_id)
+            result_text = f"✅ Передано заявок: {count}"
+        elif operation["op"] == "cancel_building":
+            count = await bulk_cancel_building_requests(session, operation["building"], actor_id=admin_id)
+            result_text = f"✅ Отменено заявок: {count}"
+        else:
+            before_date = datetime.date.fromisoformat(operation["before"])
+            before = datetime.datetime.combine(before_date, datetime.time.min, tzinfo=datetime.timezone.utc)
+            count = await bulk_archive_requests_created_before(session, before, actor_id=admin_id)
+            result_text = f"✅ Архивировано заявок: {count}"
+    except Exception as e:
+        # Уже выполненные порции зафиксированы - операцию можно запустить повторно для остатка
+        logging.error(f"Bulk operation {operation} by admin {admin_id} failed: {e}", exc_info=True)
+        await session.rollback()
+        await _edit(callback, "⚠️ Ошибка при выполнении операции. Часть заявок могла быть изменена - проверьте и повторите.",
+                    create_admin_bulk_menu_keyboard())
+        return
+
+    logging.info(f"Admin {admin_id} finished bulk operation {operation}: {count} requests.")
+    await _edit(callback, result_text, create_admin_bulk_menu_keyboard())
+
+@router.callback_query(AdminBulkCallback.filter(F.action == "abort"))
+async def cq_bulk_abort(callback: types.CallbackQuery, state: FSMContext):
+    await state.update_data(bulk_operation=None)
+    await callback.answer("Операция отменена.")
+    await _edit(callback, BULK_MENU_TEXT, create_admin_bulk_menu_keyboard())
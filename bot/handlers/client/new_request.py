@@ -2,13 +2,14 @@
 import logging
 from html import escape
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram import Router, types, F, Bot
+from aiogram import Router, types, F
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 from aiogram.types import  InlineKeyboardButton
 
 from bot.keyboards.inline.requests_inline import RequestActionCallback
+from bot.notifications import outgoing
 from bot.states.request_states import CreateRequest # Импортируем обновленные состояния
 # Импортируем нужные клавиатуры и тексты
 from bot.keyboards.reply import (
@@ -16,8 +17,9 @@ from bot.keyboards.reply import (
     NEW_REQUEST_BTN_TEXT, SKIP_BTN_TEXT, CANCEL_BTN_TEXT
 )
 # Импортируем CRUD и модели
-from db.crud import create_request, get_user, get_users_by_role
-from db.models import UserRole
+from db.crud import create_request, get_user, get_user_role, get_users_by_role
+from db.models import Request, UserRole
+from db.outbox import OutgoingMessage
 
 router = Router()
 
@@ -39,8 +41,7 @@ async def cancel_request_creation(message: types.Message, state: FSMContext, ses
     if current_state is not None and current_state in all_create_request_states:
         logging.info(f"User {user_id} cancelled request creation from state {current_state}")
         await state.clear()
-        db_user = await get_user(session, user_id)
-        user_role = db_user.role if db_user else UserRole.CLIENT 
+        user_role = await get_user_role(session, user_id) or UserRole.CLIENT
         await message.answer(
             "Действие отменено. Создание заявки прервано.",
             reply_markup=get_main_menu_keyboard(user_role)
@@ -151,7 +152,7 @@ async def process_pc_number(message: types.Message, state: FSMContext):
 
 # --- Шаг 7: Получение Телефона -> Сохранение заявки и Уведомление ---
 @router.message(CreateRequest.waiting_for_phone, F.text, F.text != CANCEL_BTN_TEXT)
-async def process_phone_and_finish(message: types.Message, state: FSMContext, session: AsyncSession, bot: Bot):
+async def process_phone_and_finish(message: types.Message, state: FSMContext, session: AsyncSession):
     phone_number = message.text.strip()
     if not phone_number or len(phone_number) <= 3:
         await message.answer("Пожалуйста, введите корректный номер телефона (хотя бы 3 символa):")
@@ -172,8 +173,29 @@ async def process_phone_and_finish(message: types.Message, state: FSMContext, se
     user_role = db_user.role
     user_mention = f"@{db_user.username}" if db_user.username else f"ID: {db_user.id}"
 
+    def engineer_notifications(new_request: Request) -> list[OutgoingMessage]:
+        """Уведомления инженерам о новой заявке (пишутся в outbox вместе с заявкой)."""
+        view_button_callback_data = RequestActionCallback(action="view", request_id=new_request.id).pack()
+        view_button = InlineKeyboardButton(text="👀 Посмотреть детали", callback_data=view_button_callback_data)
+        notification_keyboard = InlineKeyboardBuilder().add(view_button).as_markup()
+
+        pc_notify_text = f"\n<b>ПК/Инв.:</b> {escape(new_request.pc_number)}" if new_request.pc_number else ""
+        notification_text = (
+            f"🔔 Новая заявка №{new_request.id} от {user_mention}\n\n"
+            f"<b>ФИО:</b> {escape(new_request.full_name or 'Не указано')}\n"
+            f"<b>Корпус:</b> {escape(new_request.building)}, <b>Каб:</b> {escape(new_request.room)}{pc_notify_text}\n"
+            f"<b>Телефон:</b> {escape(new_request.contact_phone or 'Не указан')}\n" 
+            f"<b>Описание:</b> {escape(new_request.description[:200])}..."
+        )
+        return [outgoing(engineer.id, notification_text, notification_keyboard) for engineer in engineers]
+
     try:
-        # --- Сохранение заявки в БД ---
+        # --- Инженеры, которых нужно уведомить ---
+        engineers = await get_users_by_role(session, UserRole.ENGINEER)
+        if not engineers:
+            logging.warning("No engineers found to notify about new request.")
+
+        # --- Сохранение заявки в БД (вместе с уведомлениями инженерам в outbox) ---
         new_request = await create_request(
             session=session,
             requester_id=requester_id,
@@ -182,9 +204,10 @@ async def process_phone_and_finish(message: types.Message, state: FSMContext, se
             room=user_data.get('room', 'Не указан'),
             description=user_data.get('description', 'Описание отсутствует'),
             pc_number=user_data.get('pc_number'),
-            contact_phone=user_data.get('contact_phone') 
+            contact_phone=user_data.get('contact_phone'),
+            notifications=engineer_notifications if engineers else None
         )
-        logging.info(f"Request {new_request.id} created for user {requester_id}")
+        logging.info(f"Request {new_request.id} created for user {requester_id}, {len(engineers)} engineer notifications queued")
 
         # --- Отправляем подтверждение клиенту с новыми данными ---
         pc_text = f"ПК/Инв. номер: {escape(new_request.pc_number)}\n" if new_request.pc_number else ""
@@ -200,40 +223,6 @@ async def process_phone_and_finish(message: types.Message, state: FSMContext, se
         )
         await message.answer(confirmation_text, reply_markup=get_main_menu_keyboard(user_role))
 
-        # --- Уведомление инженеров с новыми данными ---
-        engineers = await get_users_by_role(session, UserRole.ENGINEER)
-        if not engineers:
-            logging.warning("No engineers found to notify about new request.")
-        else:
-            logging.info(f"Found {len(engineers)} engineers to notify.")
-            view_button_callback_data = RequestActionCallback(action="view", request_id=new_request.id).pack()
-            view_button = InlineKeyboardButton(text="👀 Посмотреть детали", callback_data=view_button_callback_data)
-            notification_keyboard = InlineKeyboardBuilder().add(view_button).as_markup()
-
-            pc_notify_text = f"\n<b>ПК/Инв.:</b> {escape(new_request.pc_number)}" if new_request.pc_number else ""
-            notification_text = (
-                f"🔔 Новая заявка №{new_request.id} от {user_mention}\n\n"
-                f"<b>ФИО:</b> {escape(new_request.full_name or 'Не указано')}\n"
-                f"<b>Корпус:</b> {escape(new_request.building)}, <b>Каб:</b> {escape(new_request.room)}{pc_notify_text}\n"
-                f"<b>Телефон:</b> {escape(new_request.contact_phone or 'Не указан')}\n" 
-                f"<b>Описание:</b> {escape(new_request.description[:200])}..."
-            )
-
-            sent_count = 0
-            failed_count = 0
-            for engineer in engineers:
-                try:
-                    await bot.send_message(
-                        chat_id=engineer.id,
-                        text=notification_text,
-                        reply_markup=notification_keyboard
-                    )
-                    sent_count += 1
-                except Exception as e:
-                    failed_count += 1
-                    logging.error(f"Failed to send new request notification to engineer {engineer.id}: {e}")
-            logging.info(f"Notifications sent: {sent_count}, failed: {failed_count}")
-
     except Exception as e:
         logging.error(f"Error creating request or notifying for user {requester_id}: {e}", exc_info=True)
         await message.answer(
@@ -5,7 +5,7 @@ from aiogram import Router, types, F
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.crud import get_or_create_user, get_user
+from db.crud import get_or_create_user, get_user_role
 from bot.keyboards.reply import (
     get_main_menu_keyboard,
     get_cancel_keyboard,
@@ -15,7 +15,7 @@ from bot.keyboards.reply import (
 from bot.keyboards.reply import (
     NEW_REQUEST_BTN_TEXT, MY_REQUESTS_BTN_TEXT,
     VIEW_NEW_REQUESTS_BTN_TEXT, MY_ASSIGNED_REQUESTS_BTN_TEXT,
-    HISTORY_BTN_TEXT, ADMIN_PANEL_BTN_TEXT, CANCEL_BTN_TEXT
+    HISTORY_BTN_TEXT, ADMIN_PANEL_BTN_TEXT, CANCEL_BTN_TEXT, SEARCH_BTN_TEXT
 )
 from db.models import UserRole # Для определения роли в help
 
@@ -100,7 +100,7 @@ async def cmd_help(message: types.Message, session: AsyncSession):
     Обработчик команды /help. Показывает разную справку в зависимости от роли.
     """
     user_id = message.from_user.id
-    db_user = await get_user(session, user_id)
+    db_role = await get_user_role(session, user_id)
 
     # Базовый текст
     help_text_lines = [
@@ -108,7 +108,7 @@ async def cmd_help(message: types.Message, session: AsyncSession):
         "" # Пустая строка для разделения
     ]
 
-    user_role = db_user.role if db_user else UserRole.CLIENT 
+    user_role = db_role or UserRole.CLIENT 
 
     # --- Справка для Клиента ---
     if user_role == UserRole.CLIENT:
@@ -133,6 +133,7 @@ async def cmd_help(message: types.Message, session: AsyncSession):
             f"- {MY_ASSIGNED_REQUESTS_BTN_TEXT} или /my_requests - Посмотреть список заявок, которые вы уже приняли в работу.",
             f"   - Нажмите на заявку, чтобы увидеть детали и кнопку 'Завершить (Выполнено)'. При завершении заявка уходит в историю.",
             f"- {HISTORY_BTN_TEXT} или /archive - Просмотреть историю выполненных вами заявок (с пагинацией).",
+            f"- {SEARCH_BTN_TEXT} или /search - Найти заявку по словам из описания, корпусу, кабинету, ПК или телефону.",
             f"- /start - Показать главное меню инженера.",
             f"- /help - Показать это справочное сообщение.",
         ])
@@ -145,6 +146,7 @@ async def cmd_help(message: types.Message, session: AsyncSession):
             f"   - Управление пользователями",
             f"   - Активные заявки",
             f"   - История выполненных",
+            f"- {SEARCH_BTN_TEXT} или /search - Поиск заявок по описанию, корпусу, кабинету, ПК или телефону.",
             "",
             "   Функции инженера также доступны.",
             f"- /start - Главное меню.",
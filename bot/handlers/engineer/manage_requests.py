@@ -4,14 +4,17 @@ import math
 from html import escape
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram import Router, types, F, Bot
+from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.exceptions import TelegramBadRequest
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Фильтр ролей и модель роли
 from bot.filters.role import RoleFilter
-from db.models import UserRole, RequestStatus
+from bot.notifications import outgoing
+from db.outbox import OutgoingMessage
+from db.events import TimelineEntry, as_utc
+from db.models import Request, RequestEventType, UserRole, RequestStatus
 
 # Текст кнопок из reply клавиатуры
 from bot.keyboards.reply import (
@@ -21,7 +24,8 @@ from bot.keyboards.reply import (
 # CRUD функции
 from db.crud import (
     get_new_requests, get_request, accept_request, get_user,
-    get_engineer_requests, complete_request, get_archived_requests
+    get_engineer_requests, complete_request, get_archived_requests,
+    get_request_timeline, get_user_snapshots
 )
 
 # Клавиатуры и CallbackData
@@ -29,13 +33,27 @@ from bot.keyboards.inline.requests_inline import (
     create_new_requests_keyboard, create_view_request_keyboard,
     create_complete_request_keyboard, RequestActionCallback,
     create_archive_requests_keyboard, HistoryNavigationCallback,
-    create_engineer_active_requests_keyboard, EngActiveNavCallback
+    create_engineer_active_requests_keyboard, EngActiveNavCallback,
+    NewRequestsNavCallback, SearchNavCallback
 )
 # Импорт главного меню инженера
 from bot.keyboards.inline.engineer_inline import get_engineer_main_menu
 
 # Константы пагинации
+ENG_NEW_PAGE_SIZE = 8 # Бюджет строк очереди новых заявок на одну страницу клавиатуры
 ENG_ACTIVE_PAGE_SIZE = 5 
+# Сколько последних событий хронологии показывать в карточке заявки
+TIMELINE_SHOWN = 10
+
+# Подписи событий журнала заявок
+EVENT_LABELS = {
+    RequestEventType.CREATED: "🆕 Создана",
+    RequestEventType.ACCEPTED: "🛠️ Принята в работу",
+    RequestEventType.COMPLETED: "✅ Выполнена",
+    RequestEventType.REASSIGNED: "🔁 Передана другому инженеру",
+    RequestEventType.CANCELED: "❌ Отменена",
+    RequestEventType.ARCHIVED: "🗄️ Архивирована администратором",
+}
 ENG_HISTORY_PAGE_SIZE = 5 
 
 router = Router()
@@ -68,18 +86,16 @@ async def back_to_main_menu_eng(callback: types.CallbackQuery):
 @router.message(Command('view_new_requests'))
 @router.callback_query(F.data == "eng_view_new") # Для кнопки "Назад к новым"
 async def view_new_requests(event: types.Message | types.CallbackQuery, session: AsyncSession):
-    """Показывает список новых заявок (без пагинации)."""
+    """Показывает первую страницу очереди новых заявок."""
     user_id = event.from_user.id
     logging.info(f"Engineer {user_id} requested new requests list.")
-    new_requests = await get_new_requests(session)
+    new_requests, total_count = await get_new_requests(session, limit=ENG_NEW_PAGE_SIZE)
+    total_pages = math.ceil(total_count / ENG_NEW_PAGE_SIZE) if total_count > 0 else 0
 
-    text = "📝 Новые заявки, ожидающие принятия:"
-    keyboard = create_new_requests_keyboard(new_requests)
-    if not new_requests:
+    text = f"📝 Новые заявки, ожидающие принятия (Всего: {total_count}):"
+    if total_count == 0:
         text = "✅ Новых заявок нет."
-        builder = InlineKeyboardBuilder()
-        builder.row(InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu_eng"))
-        keyboard = builder.as_markup()
+    keyboard = create_new_requests_keyboard(new_requests, 0, total_pages)
 
     if isinstance(event, types.Message):
         await event.answer(text, reply_markup=keyboard)
@@ -90,6 +106,42 @@ async def view_new_requests(event: types.Message | types.CallbackQuery, session:
         except TelegramBadRequest: pass
         except Exception as e: logging.error(f"Error editing message for new requests view: {e}", exc_info=True)
 
+# Обработчик для пагинации очереди новых заявок
+@router.callback_query(NewRequestsNavCallback.filter(F.action == "page"))
+async def view_new_requests_page(callback: types.CallbackQuery, callback_data: NewRequestsNavCallback, session: AsyncSession):
+    """Обрабатывает пагинацию очереди новых заявок."""
+    current_page = callback_data.page
+    logging.info(f"Engineer {callback.from_user.id} requested new requests page {current_page}.")
+
+    if current_page < 0: await callback.answer(); return
+
+    cursor = callback_data.cursor if current_page > 0 else ""
+    backward = callback_data.back and current_page > 0
+    new_requests, total_count = await get_new_requests(
+        session, limit=ENG_NEW_PAGE_SIZE, cursor=cursor, backward=backward
+    )
+    total_pages = math.ceil(total_count / ENG_NEW_PAGE_SIZE) if total_count > 0 else 0
+
+    # Коррекция страницы (заявки из очереди разобрали - показываем последнюю, выбирая с конца списка)
+    if not new_requests and current_page > 0:
+        current_page = max(0, total_pages - 1)
+        new_requests, total_count = await get_new_requests(
+            session, limit=ENG_NEW_PAGE_SIZE, backward=current_page > 0
+        )
+        total_pages = math.ceil(total_count / ENG_NEW_PAGE_SIZE) if total_count > 0 else 0
+
+    text = f"📝 Новые заявки, ожидающие принятия (Всего: {total_count}):"
+    if total_count == 0:
+        text = "✅ Новых заявок нет."
+    keyboard = create_new_requests_keyboard(new_requests, current_page, total_pages)
+
+    await callback.answer()
+    try:
+        if callback.message:
+            await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest: pass
+    except Exception as e: logging.error(f"Error editing message for new requests pagination: {e}", exc_info=True)
+
 
 @router.message(F.text == MY_ASSIGNED_REQUESTS_BTN_TEXT)
 @router.message(Command('my_requests'))
@@ -99,12 +151,11 @@ async def view_my_active_requests_first(message: types.Message, session: AsyncSe
     logging.info(f"Engineer {engineer_id} requested own active requests FIRST page (default sort).")
     current_page = 0
     current_sort = 'accepted_asc' # Сортировка по умолчанию
-    offset = current_page * ENG_ACTIVE_PAGE_SIZE
 
-    # Используем обновленный CRUD с пагинацией
+    # Используем CRUD с курсорной пагинацией (первая страница - без курсора)
     active_requests, total_count = await get_engineer_requests(
         session=session, engineer_id=engineer_id, limit=ENG_ACTIVE_PAGE_SIZE,
-        offset=offset, sort_by=current_sort
+        sort_by=current_sort
     )
     total_pages = math.ceil(total_count / ENG_ACTIVE_PAGE_SIZE) if total_count > 0 else 0
 
@@ -129,19 +180,19 @@ async def view_my_active_requests_page(callback: types.CallbackQuery, callback_d
 
     if current_page < 0: await callback.answer(); return
 
-    offset = current_page * ENG_ACTIVE_PAGE_SIZE
+    cursor = callback_data.cursor if current_page > 0 else ""
+    backward = callback_data.back and current_page > 0
     active_requests, total_count = await get_engineer_requests(
         session=session, engineer_id=engineer_id, limit=ENG_ACTIVE_PAGE_SIZE,
-        offset=offset, sort_by=current_sort
+        sort_by=current_sort, cursor=cursor, backward=backward
     )
     total_pages = math.ceil(total_count / ENG_ACTIVE_PAGE_SIZE) if total_count > 0 else 0
 
-    # Коррекция страницы (если последняя страница опустела)
-    if current_page >= total_pages and current_page > 0:
+    # Коррекция страницы (если страница опустела - показываем последнюю, выбирая с конца списка)
+    if not active_requests and current_page > 0:
         current_page = max(0, total_pages - 1)
-        offset = current_page * ENG_ACTIVE_PAGE_SIZE
         active_requests, total_count = await get_engineer_requests(
-             session, engineer_id, ENG_ACTIVE_PAGE_SIZE, offset, current_sort
+             session, engineer_id, ENG_ACTIVE_PAGE_SIZE, current_sort, backward=current_page > 0
         )
         # Пересчитываем total_pages после коррекции
         total_pages = math.ceil(total_count / ENG_ACTIVE_PAGE_SIZE) if total_count > 0 else 0
@@ -176,12 +227,11 @@ async def view_history_first(message: types.Message, session: AsyncSession):
     logging.info(f"Engineer {engineer_id} requested THEIR history FIRST page (default sort).")
     current_page = 0
     current_sort = 'date_desc' # Сортировка по умолчанию
-    offset = current_page * ENG_HISTORY_PAGE_SIZE
 
-    # Используем CRUD с пагинацией и фильтром по инженеру
+    # Используем CRUD с курсорной пагинацией и фильтром по инженеру
     archived_requests, total_count = await get_archived_requests(
         session=session, engineer_id=engineer_id, # Передаем ID инженера
-        limit=ENG_HISTORY_PAGE_SIZE, offset=offset, sort_by=current_sort
+        limit=ENG_HISTORY_PAGE_SIZE, sort_by=current_sort
     )
     total_pages = math.ceil(total_count / ENG_HISTORY_PAGE_SIZE) if total_count > 0 else 0
 
@@ -207,19 +257,20 @@ async def view_history_page(callback: types.CallbackQuery, callback_data: Histor
 
     if current_page < 0: await callback.answer(); return
 
-    offset = current_page * ENG_HISTORY_PAGE_SIZE
+    cursor = callback_data.cursor if current_page > 0 else ""
+    backward = callback_data.back and current_page > 0
     archived_requests, total_count = await get_archived_requests(
         session=session, engineer_id=engineer_id, # Передаем ID инженера
-        limit=ENG_HISTORY_PAGE_SIZE, offset=offset, sort_by=current_sort
+        limit=ENG_HISTORY_PAGE_SIZE, sort_by=current_sort, cursor=cursor, backward=backward
     )
     total_pages = math.ceil(total_count / ENG_HISTORY_PAGE_SIZE) if total_count > 0 else 0
 
     # Коррекция страницы
-    if current_page >= total_pages and current_page > 0:
+    if not archived_requests and current_page > 0:
         current_page = max(0, total_pages - 1)
-        offset = current_page * ENG_HISTORY_PAGE_SIZE
         archived_requests, total_count = await get_archived_requests(
-             session, engineer_id=engineer_id, limit=ENG_HISTORY_PAGE_SIZE, offset=offset, sort_by=current_sort
+             session, engineer_id=engineer_id, limit=ENG_HISTORY_PAGE_SIZE, sort_by=current_sort,
+             backward=current_page > 0
         )
         total_pages = math.ceil(total_count / ENG_HISTORY_PAGE_SIZE) if total_count > 0 else 0
 
@@ -242,18 +293,54 @@ async def view_history_page(callback: types.CallbackQuery, callback_data: Histor
     except Exception as e: logging.error(f"Error editing message for engineer history pagination: {e}", exc_info=True)
 
 
+def _format_timeline(entries: list[TimelineEntry], actors: dict) -> str:
+    """Блок "История" из событий; actors - пользователи (снимки или модели User) по ID."""
+    lines = ["\n<b>История:</b>"]
+    for entry in entries:
+        label = EVENT_LABELS.get(entry.event_type, entry.event_type.value)
+        actor = actors.get(entry.actor_id)
+        actor_name = f"{actor.first_name or ''} {actor.last_name or ''}".strip() if actor else ""
+        actor_text = f" ({escape(actor_name)})" if actor_name else ""
+        lines.append(f"{entry.created_at.strftime('%d.%m.%y %H:%M')} {label}{actor_text}")
+    return "\n".join(lines)
+
+async def build_timeline_text(session: AsyncSession, request_id: int) -> str:
+    """Блок "История" для карточки заявки: последние события журнала с авторами (пустая строка, если событий нет)."""
+    entries = (await get_request_timeline(session, request_id))[-TIMELINE_SHOWN:]
+    if not entries:
+        return ""
+    actors = await get_user_snapshots(session, {entry.actor_id for entry in entries if entry.actor_id is not None})
+    return _format_timeline(entries, actors)
+
+def accepted_timeline_text(request: Request) -> str:
+    """
+    Блок "История" только что принятой заявки без запросов к БД: у ожидавшей заявки нет других событий,
+    кроме создания, а клиент и инженер уже загружены вместе с результатом accept_request.
+    """
+    entries = [
+        TimelineEntry(RequestEventType.CREATED, request.requester_id, None, as_utc(request.created_at)),
+        TimelineEntry(RequestEventType.ACCEPTED, request.engineer_id, None, as_utc(request.accepted_at)),
+    ]
+    return _format_timeline(entries, {request.requester_id: request.requester, request.engineer_id: request.engineer})
 
 async def show_request_details(
     callback: types.CallbackQuery,
     request_id: int,
     session: AsyncSession,
-    view_mode: str 
+    view_mode: str,
+    request: Request | None = None,
+    timeline_text: str | None = None
 ):
-    """Отображает детали заявки и соответствующие кнопки."""
+    """
+    Отображает детали заявки и соответствующие кнопки.
+    request - уже загруженная заявка с клиентом и инженером (например, результат accept_request),
+    чтобы не выбирать ее из БД повторно; timeline_text - готовый блок "История" (иначе читается журнал).
+    """
     user_id = callback.from_user.id
     logging.info(f"Engineer {user_id} viewing request {request_id} in mode '{view_mode}'")
 
-    request = await get_request(session, request_id)
+    if request is None:
+        request = await get_request(session, request_id)
     if not request:
         await callback.answer("❌ Заявка не найдена.", show_alert=True)
         # Пытаемся обновить список, из которого пришел пользователь
@@ -301,6 +388,10 @@ async def show_request_details(
         details_text_lines.append(f"<b>Архивирована:</b> {archived_at}")
 
     details_text_lines.append(f"\n<b>Описание:</b>\n{escape(request.description or 'Нет описания')}")
+    if timeline_text is None:
+        timeline_text = await build_timeline_text(session, request_id)
+    if timeline_text:
+        details_text_lines.append(timeline_text)
 
     text = "\n".join(details_text_lines)
 
@@ -321,6 +412,13 @@ async def show_request_details(
         builder = InlineKeyboardBuilder()
         builder.row(InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu_eng"))
         keyboard = builder.as_markup()
+    elif view_mode == 'search':
+        # Из результатов поиска - возврат к открытой странице результатов
+        builder = InlineKeyboardBuilder()
+        builder.row(InlineKeyboardButton(
+            text="⬅️ К результатам поиска", callback_data=SearchNavCallback(action="back").pack()
+        ))
+        keyboard = builder.as_markup()
 
 
     # Редактируем сообщение
@@ -340,28 +438,32 @@ async def show_request_details(
 async def cq_view_request(callback: types.CallbackQuery, callback_data: RequestActionCallback, session: AsyncSession):
     await show_request_details(callback, callback_data.request_id, session, view_mode='new')
 
+# Уведомления клиента о смене статуса заявки (записываются в outbox в транзакции перехода)
+def _accepted_notifications(request: Request) -> list[OutgoingMessage]:
+    engineer_name = escape(request.engineer.first_name or '') if request.engineer else ''
+    return [outgoing(request.requester_id, f"✅ Ваша заявка #{request.id} принята в работу инженером {engineer_name}.")]
+
+def _completed_notifications(request: Request) -> list[OutgoingMessage]:
+    return [outgoing(request.requester_id, f"✅ Ваша заявка #{request.id} была успешно выполнена.\nСпасибо за обращение!")]
+
 # Принятие заявки в работу
 @router.callback_query(RequestActionCallback.filter(F.action == "accept"))
-async def cq_accept_request(callback: types.CallbackQuery, callback_data: RequestActionCallback, session: AsyncSession, bot: Bot):
+async def cq_accept_request(callback: types.CallbackQuery, callback_data: RequestActionCallback, session: AsyncSession):
     engineer_id = callback.from_user.id
     request_id = callback_data.request_id
     logging.info(f"Engineer {engineer_id} trying to accept request {request_id}")
 
-    updated_request = await accept_request(session, request_id, engineer_id)
+    # Уведомление клиента пишется в outbox вместе с принятием заявки и отправляется в фоне
+    updated_request = await accept_request(session, request_id, engineer_id, notifications=_accepted_notifications)
 
     if updated_request:
         await callback.answer("✅ Заявка принята в работу!", show_alert=False)
-        # Показываем обновленные детали заявки с кнопкой Завершить
-        await show_request_details(callback, request_id, session, view_mode='active_eng')
-
-        # Уведомление клиента
-        try:
-            client_text = (f"✅ Ваша заявка #{request_id} принята в работу инженером "
-                           f"{updated_request.engineer.first_name if updated_request.engineer else ''}.")
-            await bot.send_message(updated_request.requester_id, client_text)
-            logging.info(f"Sent notification to client {updated_request.requester_id} about request {request_id} acceptance.")
-        except Exception as e:
-            logging.error(f"Failed to send acceptance notification to client {updated_request.requester_id}: {e}")
+        # Показываем обновленные детали заявки с кнопкой Завершить (без запросов к БД: история - из результата принятия)
+        await show_request_details(
+            callback, request_id, session, view_mode='active_eng', request=updated_request,
+            timeline_text=accepted_timeline_text(updated_request)
+        )
+        logging.info(f"Queued notification to client {updated_request.requester_id} about request {request_id} acceptance.")
     else:
         await callback.answer("⚠️ Не удалось принять заявку (возможно, уже принята).", show_alert=True)
         # Обновляем список новых заявок
@@ -379,26 +481,19 @@ async def cq_view_my_request(callback: types.CallbackQuery, callback_data: Reque
 
 # Завершение заявки
 @router.callback_query(RequestActionCallback.filter(F.action == "complete"))
-async def cq_complete_request(callback: types.CallbackQuery, callback_data: RequestActionCallback, session: AsyncSession, bot: Bot):
+async def cq_complete_request(callback: types.CallbackQuery, callback_data: RequestActionCallback, session: AsyncSession):
     engineer_id = callback.from_user.id
     request_id = callback_data.request_id
     logging.info(f"Engineer {engineer_id} trying to complete request {request_id}")
 
-    completed_request = await complete_request(session, request_id, engineer_id)
+    # Уведомление клиента пишется в outbox вместе с завершением заявки и отправляется в фоне
+    completed_request = await complete_request(session, request_id, engineer_id, notifications=_completed_notifications)
 
     if completed_request:
         await callback.answer("🏁 Заявка успешно завершена и архивирована!", show_alert=False)
         # Показываем детали завершенной/архивированной заявки
-        await show_request_details(callback, request_id, session, view_mode='archive')
-
-        # Уведомление клиента
-        try:
-            client_text = (f"✅ Ваша заявка #{request_id} была успешно выполнена.\n"
-                           "Спасибо за обращение!")
-            await bot.send_message(completed_request.requester_id, client_text)
-            logging.info(f"Sent notification to client {completed_request.requester_id} about request {request_id} completion.")
-        except Exception as e:
-            logging.error(f"Failed to send completion notification to client {completed_request.requester_id}: {e}")
+        await show_request_details(callback, request_id, session, view_mode='archive', request=completed_request)
+        logging.info(f"Queued notification to client {completed_request.requester_id} about request {request_id} completion.")
     else:
         await callback.answer("⚠️ Не удалось завершить заявку (проверьте статус).", show_alert=True)
         try:
@@ -411,10 +506,3 @@ async def cq_complete_request(callback: types.CallbackQuery, callback_data: Requ
 @router.callback_query(RequestActionCallback.filter(F.action == "view_archive"))
 async def cq_view_archive_request(callback: types.CallbackQuery, callback_data: RequestActionCallback, session: AsyncSession):
     await show_request_details(callback, callback_data.request_id, session, view_mode='archive')
-
-
-# --- Обработчики для игнорируемых кнопок пагинации ---
-@router.callback_query(F.data.startswith("ignore_"))
-async def cq_ignore_pagination(callback: types.CallbackQuery):
-    """Отвечает на колбэки от неактивных кнопок пагинации."""
-    await callback.answer()
\ No newline at end of file
@@ -0,0 +1,151 @@
+# bot/handlers/search.py
+import logging
+import math
+from aiogram import Router, types, F
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.filters.role import RoleFilter
+from bot.handlers.engineer.manage_requests import show_request_details
+from bot.keyboards.inline.requests_inline import (
+    RequestActionCallback, SearchNavCallback, create_search_results_keyboard
+)
+from bot.keyboards.reply import SEARCH_BTN_TEXT, CANCEL_BTN_TEXT, get_cancel_keyboard, get_main_menu_keyboard
+from bot.states.request_states import SearchRequests
+from db.crud import SEARCH_RESULTS_LIMIT, get_user_role, search_requests
+from db.models import UserRole
+
+# Константы пагинации
+SEARCH_PAGE_SIZE = 8
+
+# Префиксы фильтров в поисковом запросе -> параметр search_requests
+SEARCH_FILTER_PREFIXES = {
+    "корп:": "building",
+    "каб:": "room",
+    "пк:": "pc_number",
+    "тел:": "contact_phone",
+}
+
+SEARCH_HELP_TEXT = (
+    "🔎 Введите поисковый запрос.\n\n"
+    "Слова ищутся в описании заявок (с учетом словоформ), фразу можно взять в кавычки, "
+    "слово исключить минусом: <code>-принтер</code>.\n"
+    "Фильтры по началу значения: <code>корп:5</code>, <code>каб:101</code>, "
+    "<code>пк:INV-12</code>, <code>тел:+7900</code>.\n\n"
+    "Например: <code>не печатает корп:2 каб:3</code>"
+)
+
+router = Router()
+
+router.message.filter(RoleFilter([UserRole.ENGINEER, UserRole.ADMIN]))
+router.callback_query.filter(RoleFilter([UserRole.ENGINEER, UserRole.ADMIN]))
+
+
+def parse_search_query(query: str) -> dict[str, str]:
+    """Разбирает запрос на текст для полнотекстового поиска и фильтры (корп:, каб:, пк:, тел:)."""
+    params: dict[str, str] = {}
+    words = []
+    for word in query.split():
+        for prefix, param in SEARCH_FILTER_PREFIXES.items():
+            if word.lower().startswith(prefix) and len(word) > len(prefix):
+                params[param] = word[len(prefix):]
+                break
+        else:
+            words.append(word)
+    if words:
+        params["text"] = " ".join(words)
+    return params
+
+
+async def show_search_page(
+    event: types.Message | types.CallbackQuery,
+    session: AsyncSession,
+    state: FSMContext,
+    page: int
+):
+    """Показывает страницу результатов поиска по запросу, сохраненному в данных FSM."""
+    data = await state.get_data()
+    params = data.get("search_params")
+    if params is None:
+        if isinstance(event, types.CallbackQuery):
+            await event.answer("Поиск устарел, начните новый.", show_alert=True)
+        return
+
+    found, total_count = await search_requests(
+        session, **params, limit=SEARCH_PAGE_SIZE, offset=page * SEARCH_PAGE_SIZE
+    )
+    shown_count = min(total_count, SEARCH_RESULTS_LIMIT)
+    total_pages = math.ceil(shown_count / SEARCH_PAGE_SIZE) if shown_count > 0 else 0
+    # Запоминаем страницу для кнопки "К результатам поиска"
+    await state.update_data(search_page=page)
+
+    user_role = await get_user_role(session, event.from_user.id)
+    keyboard = create_search_results_keyboard(found, page, total_pages, user_role)
+    query = data.get("search_query", "")
+    if total_count == 0:
+        text = f"🔎 По запросу «{query}» ничего не найдено."
+    elif total_count > SEARCH_RESULTS_LIMIT:
+        text = f"🔎 Результаты по запросу «{query}» (показаны лучшие {SEARCH_RESULTS_LIMIT}, уточните запрос):"
+    else:
+        text = f"🔎 Результаты по запросу «{query}» (Найдено: {total_count}):"
+
+    if isinstance(event, types.Message):
+        # Запрос пользователя может содержать символы HTML - отправляем без разметки
+        await event.answer(text, reply_markup=keyboard, parse_mode=None)
+    elif event.message:
+        await event.answer()
+        try:
+            await event.message.edit_text(text, reply_markup=keyboard, parse_mode=None)
+        except TelegramBadRequest: pass
+        except Exception as e: logging.error(f"Error editing message for search results: {e}", exc_info=True)
+
+
+# --- Начало поиска ---
+@router.message(F.text == SEARCH_BTN_TEXT)
+@router.message(Command('search'))
+@router.callback_query(F.data == "search_start")
+async def start_search(event: types.Message | types.CallbackQuery, state: FSMContext):
+    logging.info(f"User {event.from_user.id} started request search.")
+    await state.set_state(SearchRequests.waiting_for_query)
+    if isinstance(event, types.CallbackQuery):
+        await event.answer()
+        if event.message:
+            await event.message.answer(SEARCH_HELP_TEXT, reply_markup=get_cancel_keyboard())
+    else:
+        await event.answer(SEARCH_HELP_TEXT, reply_markup=get_cancel_keyboard())
+
+# Текст запроса (кнопка "Отмена" обрабатывается общим cancel_handler)
+@router.message(StateFilter(SearchRequests.waiting_for_query), F.text, F.text != CANCEL_BTN_TEXT)
+async def process_search_query(message: types.Message, session: AsyncSession, state: FSMContext):
+    query = message.text.strip()
+    params = parse_search_query(query)
+    if not params:
+        await message.answer("Запрос пуст. Введите слова для поиска или фильтры.")
+        return
+    logging.info(f"User {message.from_user.id} searching requests: {params}")
+    # Выходим из состояния ввода, но сохраняем запрос для пагинации
+    await state.set_state(None)
+    await state.update_data(search_query=query, search_params=params)
+    # Возвращаем главное меню вместо клавиатуры "Отмена"
+    user_role = await get_user_role(session, message.from_user.id)
+    await message.answer("Ищу заявки...", reply_markup=get_main_menu_keyboard(user_role))
+    await show_search_page(message, session, state, page=0)
+
+# --- Пагинация результатов ---
+@router.callback_query(SearchNavCallback.filter(F.action == "page"))
+async def cq_search_page(callback: types.CallbackQuery, callback_data: SearchNavCallback, session: AsyncSession, state: FSMContext):
+    if callback_data.page < 0: await callback.answer(); return
+    await show_search_page(callback, session, state, page=callback_data.page)
+
+# Возврат к результатам из карточки заявки
+@router.callback_query(SearchNavCallback.filter(F.action == "back"))
+async def cq_search_back(callback: types.CallbackQuery, session: AsyncSession, state: FSMContext):
+    data = await state.get_data()
+    await show_search_page(callback, session, state, page=data.get("search_page", 0))
+
+# --- Просмотр найденной заявки ---
+@router.callback_query(RequestActionCallback.filter(F.action == "view_found"))
+async def cq_view_found_request(callback: types.CallbackQuery, callback_data: RequestActionCallback, session: AsyncSession):
+    await show_request_details(callback, callback_data.request_id, session, view_mode='search')
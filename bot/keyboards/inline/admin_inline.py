@@ -5,19 +5,40 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 # Импортируем колбэки для заявок, чтобы использовать их в главном меню
 from .requests_inline import RequestActionCallback, HistoryNavigationCallback
 from db.models import Request, User, UserRole  # Для клавиатуры активных заявок
+from db.pagination import USERS_SORT_KEY, active_sort_key, encode_cursor
 
 # --- CallbackData для навигации по АКТИВНЫМ заявкам админа ---
+# cursor/back - курсор соседней страницы (db/pagination.py): back=True - листаем назад
 class AdminActiveNavCallback(CallbackData, prefix="adm_act"):
     action: str # 'page', 'sort'
     page: int
     sort_by: str
+    cursor: str = ""
+    back: bool = False
 
 # --- CallbackData для управления пользователями админом ---
+# page/cursor/back описывают страницу списка пользователей (для возврата к ней из профиля)
 class AdminUserManageCallback(CallbackData, prefix="adm_usr"):
     action: str 
     page: int = 0 
     user_id: int = 0
     new_role: str = "" 
+    cursor: str = ""
+    back: bool = False
+
+# --- CallbackData для статистики: период в днях ---
+class AdminStatsCallback(CallbackData, prefix="adm_stats"):
+    days: int = 7
+
+# Периоды статистики, доступные кнопками: (дней, подпись)
+ADMIN_STATS_PERIODS = ((1, "Сегодня"), (7, "7 дней"), (30, "30 дней"), (90, "90 дней"))
+
+# --- CallbackData для массовых операций ---
+# action: 'menu', 'reassign', 'reassign_from', 'reassign_to', 'cancel_building', 'archive_before', 'confirm', 'abort'
+class AdminBulkCallback(CallbackData, prefix="adm_bulk"):
+    action: str
+    from_id: int = 0
+    to_id: int = 0
 
 # --- Главное меню админки ---
 def get_admin_main_menu() -> InlineKeyboardMarkup:
@@ -41,16 +62,87 @@ def get_admin_main_menu() -> InlineKeyboardMarkup:
             callback_data=HistoryNavigationCallback(action="page", page=0, sort_by='date_desc').pack()
         )
     )
+    builder.row(
+        InlineKeyboardButton(text="📊 Статистика", callback_data=AdminStatsCallback(days=7).pack())
+    )
+    builder.row(
+        InlineKeyboardButton(text="🧰 Массовые операции", callback_data=AdminBulkCallback(action="menu").pack())
+    )
+    builder.row(
+        InlineKeyboardButton(text="🔎 Поиск заявок", callback_data="search_start")
+    )
+
+    return builder.as_markup()
 
+# --- Клавиатура статистики ---
+def create_admin_stats_keyboard(current_days: int) -> InlineKeyboardMarkup:
+    """Кнопки выбора периода (текущий отмечен) и возврат в меню."""
+    builder = InlineKeyboardBuilder()
+    builder.row(*[
+        InlineKeyboardButton(
+            text=f"• {label} •" if days == current_days else label,
+            callback_data=AdminStatsCallback(days=days).pack()
+        )
+        for days, label in ADMIN_STATS_PERIODS
+    ])
+    builder.row(InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="admin_back_to_main"))
+    return builder.as_markup()
+
+# --- Клавиатуры массовых операций ---
+def create_admin_bulk_menu_keyboard() -> InlineKeyboardMarkup:
+    """Выбор массовой операции."""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="🔁 Передать заявки инженера", callback_data=AdminBulkCallback(action="reassign").pack())
+    builder.button(text="❌ Отменить новые заявки корпуса", callback_data=AdminBulkCallback(action="cancel_building").pack())
+    builder.button(text="🗄️ Архивировать заявки старше даты", callback_data=AdminBulkCallback(action="archive_before").pack())
+    builder.adjust(1)
+    builder.row(InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="admin_back_to_main"))
+    return builder.as_markup()
+
+def create_admin_bulk_engineers_keyboard(
+    engineers: list[tuple[int, str]],
+    action: str,
+    from_id: int = 0
+) -> InlineKeyboardMarkup:
+    """
+    Список инженеров (id, подпись кнопки) для выбора в передаче заявок:
+    action='reassign_from' - чьи заявки передать, 'reassign_to' - кому (from_id уже выбран).
+    """
+    builder = InlineKeyboardBuilder()
+    if not engineers:
+        builder.button(text="Нет подходящих инженеров", callback_data="ignore_empty_list")
+    for engineer_id, label in engineers:
+        max_len = 50
+        button_text = label[:max_len] + "..." if len(label) > max_len else label
+        if action == "reassign_from":
+            callback_data = AdminBulkCallback(action=action, from_id=engineer_id)
+        else:
+            callback_data = AdminBulkCallback(action=action, from_id=from_id, to_id=engineer_id)
+        builder.button(text=button_text, callback_data=callback_data.pack())
+    builder.adjust(1)
+    builder.row(InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminBulkCallback(action="menu").pack()))
+    return builder.as_markup()
+
+def create_admin_bulk_confirm_keyboard() -> InlineKeyboardMarkup:
+    """Подтверждение массовой операции (параметры хранятся в данных FSM)."""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="✅ Выполнить", callback_data=AdminBulkCallback(action="confirm").pack())
+    builder.button(text="✖️ Отмена", callback_data=AdminBulkCallback(action="abort").pack())
     return builder.as_markup()
 
 # --- Клавиатура для списка пользователей ---
 def create_admin_users_list_keyboard(
     users: list[User],
     current_page: int,
-    total_pages: int
+    total_pages: int,
+    page_cursor: str = "",
+    page_back: bool = False
 ) -> InlineKeyboardMarkup:
-    """Создает клавиатуру со списком пользователей и пагинацией для админа."""
+    """
+    Создает клавиатуру со списком пользователей и пагинацией для админа.
+    page_cursor/page_back - курсор, по которому была выбрана текущая страница
+    (передается в профиль, чтобы вернуться на эту же страницу).
+    """
     builder = InlineKeyboardBuilder()
     if not users and current_page == 0:
         builder.button(text="Пользователи не найдены", callback_data="ignore_empty_list")
@@ -74,7 +166,9 @@ def create_admin_users_list_keyboard(
             builder.button(
                 text=button_text,
                 # Передаем текущую страницу в CallbackData для возврата
-                callback_data=AdminUserManageCallback(action="view", user_id=user.id, page=current_page).pack()
+                callback_data=AdminUserManageCallback(
+                    action="view", user_id=user.id, page=current_page, cursor=page_cursor, back=page_back
+                ).pack()
             )
         builder.adjust(1) # По одному пользователю в строке
 
@@ -82,9 +176,12 @@ def create_admin_users_list_keyboard(
         pagination_row = []
         # 1. Кнопка "Назад" или заполнитель
         if current_page > 0:
+            prev_cursor = encode_cursor(users[0], USERS_SORT_KEY) if users and current_page > 1 else ""
             pagination_row.append(InlineKeyboardButton(
                 text="< Назад",
-                callback_data=AdminUserManageCallback(action="list_page", page=current_page - 1).pack()
+                callback_data=AdminUserManageCallback(
+                    action="list_page", page=current_page - 1, cursor=prev_cursor, back=True
+                ).pack()
             ))
         else:
             pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_prev")) # Заполнитель
@@ -96,10 +193,12 @@ def create_admin_users_list_keyboard(
         ))
 
         # 3. Кнопка "Вперед" или заполнитель
-        if current_page < total_pages - 1:
+        if current_page < total_pages - 1 and users:
             pagination_row.append(InlineKeyboardButton(
                 text="Вперед >",
-                callback_data=AdminUserManageCallback(action="list_page", page=current_page + 1).pack()
+                callback_data=AdminUserManageCallback(
+                    action="list_page", page=current_page + 1, cursor=encode_cursor(users[-1], USERS_SORT_KEY)
+                ).pack()
             ))
         else:
             pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_next")) # Заполнитель
@@ -114,13 +213,18 @@ def create_admin_users_list_keyboard(
     return builder.as_markup()
 
 # --- Клавиатура для профиля пользователя (смена роли) ---
-def create_admin_user_profile_keyboard(user: User, current_list_page: int) -> InlineKeyboardMarkup:
+def create_admin_user_profile_keyboard(
+    user: User,
+    current_list_page: int,
+    list_cursor: str = "",
+    list_back: bool = False
+) -> InlineKeyboardMarkup:
     """Создает клавиатуру для профиля пользователя с кнопками смены роли."""
     builder = InlineKeyboardBuilder()
     user_id = user.id
-    # Передаем текущую страницу списка пользователей (current_list_page) во все колбэки,
+    # Передаем текущую страницу списка пользователей (номер и курсор) во все колбэки,
     # чтобы знать, на какую страницу возвращаться после смены роли
-    callback_params = {"user_id": user_id, "page": current_list_page}
+    callback_params = {"user_id": user_id, "page": current_list_page, "cursor": list_cursor, "back": list_back}
 
     # Добавляем кнопки для назначения каждой роли, кроме текущей
     if user.role != UserRole.ADMIN:
@@ -138,7 +242,9 @@ def create_admin_user_profile_keyboard(user: User, current_list_page: int) -> In
     builder.row(InlineKeyboardButton(
         text="⬅️ Назад к списку",
         # Возвращаемся на ту страницу списка, с которой пришли
-        callback_data=AdminUserManageCallback(action="list_page", page=current_list_page).pack()
+        callback_data=AdminUserManageCallback(
+            action="list_page", page=current_list_page, cursor=list_cursor, back=list_back
+        ).pack()
     ))
 
     return builder.as_markup()
@@ -178,11 +284,15 @@ def create_admin_active_requests_keyboard(
 
     if total_pages > 0:
         pagination_row = []
+        sort_key = active_sort_key(current_sort)
         # 1. Кнопка "Назад"
         if current_page > 0:
+            prev_cursor = encode_cursor(requests[0], sort_key) if requests and current_page > 1 else ""
             pagination_row.append(InlineKeyboardButton(
                 text="< Назад",
-                callback_data=AdminActiveNavCallback(action="page", page=current_page - 1, sort_by=current_sort).pack()
+                callback_data=AdminActiveNavCallback(
+                    action="page", page=current_page - 1, sort_by=current_sort, cursor=prev_cursor, back=True
+                ).pack()
             ))
         else:
             pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_prev")) # Заполнитель
@@ -194,10 +304,13 @@ def create_admin_active_requests_keyboard(
         ))
 
         # 3. Кнопка "Вперед"
-        if current_page < total_pages - 1:
+        if current_page < total_pages - 1 and requests:
             pagination_row.append(InlineKeyboardButton(
                 text="Вперед >",
-                callback_data=AdminActiveNavCallback(action="page", page=current_page + 1, sort_by=current_sort).pack()
+                callback_data=AdminActiveNavCallback(
+                    action="page", page=current_page + 1, sort_by=current_sort,
+                    cursor=encode_cursor(requests[-1], sort_key)
+                ).pack()
             ))
         else:
             pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_next")) # Заполнитель
@@ -21,5 +21,8 @@ def get_engineer_main_menu() -> InlineKeyboardMarkup:
             callback_data=HistoryNavigationCallback(action="page", page=0, sort_by='date_desc').pack()
         )
     )
+    builder.row(
+        InlineKeyboardButton(text="🔎 Поиск заявок", callback_data="search_start")
+    )
 
     return builder.as_markup()
\ No newline at end of file
@@ -2,7 +2,8 @@
 from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from db.models import Request, UserRole
+from db.models import Request, RequestStatus, UserRole
+from db.pagination import WAITING_SORT_KEY, active_sort_key, archive_sort_key, encode_cursor
 
 # --- CallbackData для действий с заявками ---
 class RequestActionCallback(CallbackData, prefix="req"):
@@ -10,30 +11,80 @@ class RequestActionCallback(CallbackData, prefix="req"):
     request_id: int
 
 # --- CallbackData для навигации по ИСТОРИИ заявок (для инженера и админа) ---
+# cursor/back - курсор соседней страницы (db/pagination.py): back=True - листаем назад
 class HistoryNavigationCallback(CallbackData, prefix="hist"):
     action: str 
     page: int
     sort_by: str
+    cursor: str = ""
+    back: bool = False
+
+# --- CallbackData для навигации по очереди НОВЫХ заявок ---
+class NewRequestsNavCallback(CallbackData, prefix="eng_new"):
+    action: str
+    page: int
+    cursor: str = ""
+    back: bool = False
+
+# --- CallbackData для навигации по результатам ПОИСКА ---
+# Сам запрос хранится в данных FSM, в колбэке только номер страницы
+class SearchNavCallback(CallbackData, prefix="srch"):
+    action: str # 'page', 'back' (вернуться к последней открытой странице)
+    page: int = 0
 
 # --- CallbackData для навигации по АКТИВНЫМ заявкам ИНЖЕНЕРА ---
 class EngActiveNavCallback(CallbackData, prefix="eng_act"):
     action: str 
     page: int
     sort_by: str
+    cursor: str = ""
+    back: bool = False
 
 
-# --- Клавиатура для списка НОВЫХ заявок  ---
-def create_new_requests_keyboard(requests: list[Request]) -> InlineKeyboardMarkup:
+# --- Клавиатура для очереди НОВЫХ заявок (постранично) ---
+def create_new_requests_keyboard(
+    requests: list[Request],
+    current_page: int = 0,
+    total_pages: int = 0
+) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    if not requests:
+    if not requests and current_page == 0:
         builder.button(text="Нет новых заявок", callback_data="ignore_empty_new")
     else:
         for req in requests:
+            desc_text = req.description or "Без описания"
             builder.button(
-                text=f"#{req.id} - {req.description[:30]}...",
+                text=f"#{req.id} - {desc_text[:30]}...",
                 callback_data=RequestActionCallback(action="view", request_id=req.id).pack()
             )
     builder.adjust(1)
+    if total_pages > 1:
+        pagination_row = []
+        if current_page > 0:
+            prev_cursor = encode_cursor(requests[0], WAITING_SORT_KEY) if requests and current_page > 1 else ""
+            pagination_row.append(InlineKeyboardButton(
+                text="< Назад",
+                callback_data=NewRequestsNavCallback(
+                    action="page", page=current_page - 1, cursor=prev_cursor, back=True
+                ).pack()
+            ))
+        else:
+            pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_prev"))
+        pagination_row.append(InlineKeyboardButton(
+            text=f"{current_page + 1}/{total_pages}",
+            callback_data="ignore_page_indicator"
+        ))
+        if current_page < total_pages - 1 and requests:
+            pagination_row.append(InlineKeyboardButton(
+                text="Вперед >",
+                callback_data=NewRequestsNavCallback(
+                    action="page", page=current_page + 1, cursor=encode_cursor(requests[-1], WAITING_SORT_KEY)
+                ).pack()
+            ))
+        else:
+            pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_next"))
+        builder.row(*pagination_row)
+    builder.row(InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu_eng"))
     return builder.as_markup()
 
 # --- Клавиатура для списка активных заявок ИНЖЕНЕРА  ---
@@ -61,10 +112,15 @@ def create_engineer_active_requests_keyboard(
         builder.adjust(1)
     if total_pages > 0:
         pagination_row = []
+        sort_key = active_sort_key(current_sort)
         if current_page > 0:
+            # На первую страницу курсор не нужен - она всегда выбирается с начала списка
+            prev_cursor = encode_cursor(requests[0], sort_key) if requests and current_page > 1 else ""
             pagination_row.append(InlineKeyboardButton(
                 text="< Назад",
-                callback_data=EngActiveNavCallback(action="page", page=current_page - 1, sort_by=current_sort).pack()
+                callback_data=EngActiveNavCallback(
+                    action="page", page=current_page - 1, sort_by=current_sort, cursor=prev_cursor, back=True
+                ).pack()
             ))
         else:
             pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_prev"))
@@ -72,10 +128,13 @@ def create_engineer_active_requests_keyboard(
             text=f"{current_page + 1}/{total_pages}",
             callback_data="ignore_page_indicator"
         ))
-        if current_page < total_pages - 1:
+        if current_page < total_pages - 1 and requests:
             pagination_row.append(InlineKeyboardButton(
                 text="Вперед >",
-                callback_data=EngActiveNavCallback(action="page", page=current_page + 1, sort_by=current_sort).pack()
+                callback_data=EngActiveNavCallback(
+                    action="page", page=current_page + 1, sort_by=current_sort,
+                    cursor=encode_cursor(requests[-1], sort_key)
+                ).pack()
             ))
         else:
             pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_next"))
@@ -139,11 +198,15 @@ def create_archive_requests_keyboard(
 
     if total_pages > 0:
         pagination_row = []
+        sort_key = archive_sort_key(current_sort)
         # 1. Кнопка "Назад"
         if current_page > 0:
+            prev_cursor = encode_cursor(requests[0], sort_key) if requests and current_page > 1 else ""
             pagination_row.append(InlineKeyboardButton(
                 text="< Назад",
-                callback_data=HistoryNavigationCallback(action="page", page=current_page - 1, sort_by=current_sort).pack()
+                callback_data=HistoryNavigationCallback(
+                    action="page", page=current_page - 1, sort_by=current_sort, cursor=prev_cursor, back=True
+                ).pack()
             ))
         else:
             pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_prev")) # Заполнитель
@@ -155,10 +218,13 @@ def create_archive_requests_keyboard(
         ))
 
         # 3. Кнопка "Вперед"
-        if current_page < total_pages - 1:
+        if current_page < total_pages - 1 and requests:
             pagination_row.append(InlineKeyboardButton(
                 text="Вперед >",
-                callback_data=HistoryNavigationCallback(action="page", page=current_page + 1, sort_by=current_sort).pack()
+                callback_data=HistoryNavigationCallback(
+                    action="page", page=current_page + 1, sort_by=current_sort,
+                    cursor=encode_cursor(requests[-1], sort_key)
+                ).pack()
             ))
         else:
             pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_next")) # Заполнитель
@@ -174,179 +240,57 @@ def create_archive_requests_keyboard(
         builder.row(InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu_eng"))
 
     return builder.as_markup()
-from aiogram.filters.callback_data import CallbackData
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.utils.keyboard import InlineKeyboardBuilder
-from db.models import Request, UserRole
-
-# --- CallbackData для действий с заявками ---
-class RequestActionCallback(CallbackData, prefix="req"):
-    action: str 
-    request_id: int
-
-# --- CallbackData для навигации по ИСТОРИИ заявок (для инженера и админа) ---
-class HistoryNavigationCallback(CallbackData, prefix="hist"):
-    action: str 
-    page: int
-    sort_by: str
-
-class EngActiveNavCallback(CallbackData, prefix="eng_act"):
-    action: str # 'page', 'sort'
-    page: int
-    sort_by: str # Поле сортировки (например, 'accepted_asc', 'created_desc')
-
-
-def create_new_requests_keyboard(requests: list[Request]) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    if not requests:
-        builder.button(text="Нет новых заявок", callback_data="ignore_empty_new")
-    else:
-        for req in requests:
-            builder.button(
-                text=f"#{req.id} - {req.description[:30]}...",
-                callback_data=RequestActionCallback(action="view", request_id=req.id).pack()
-            )
-    builder.adjust(1)
-    return builder.as_markup()
 
-def create_engineer_active_requests_keyboard(
+# --- Клавиатура для результатов ПОИСКА заявок ---
+def create_search_results_keyboard(
     requests: list[Request],
     current_page: int,
     total_pages: int,
-    current_sort: str
+    user_role: UserRole | None = None
 ) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
+    status_emoji = {
+        RequestStatus.WAITING: "⏳", RequestStatus.IN_PROGRESS: "🛠️",
+        RequestStatus.ARCHIVED: "✅", RequestStatus.CANCELED: "❌"
+    }
     if not requests and current_page == 0:
-        builder.button(text="Нет заявок в работе", callback_data="ignore_empty_inprogress")
+        builder.button(text="Ничего не найдено", callback_data="ignore_empty_search")
     else:
         for req in requests:
-            client_name = req.requester.first_name if req.requester and req.requester.first_name else f"ID:{req.requester_id}"
-            accepted_date_str = req.accepted_at.strftime('%d.%m') if req.accepted_at else '??.??'
+            date_str = req.created_at.strftime('%d.%m.%y') if req.created_at else '??.??'
             desc_text = req.description or "Без описания"
-            button_text = f"#{req.id} ({accepted_date_str}) {client_name} - {desc_text[:20]}..."
+            button_text = f"{status_emoji.get(req.status, '❓')} #{req.id} ({date_str}) {desc_text[:20]}..."
             max_len = 50
             button_text = button_text[:max_len] + "..." if len(button_text) > max_len else button_text
-
             builder.button(
                 text=button_text,
-                callback_data=RequestActionCallback(action="view_my", request_id=req.id).pack()
+                callback_data=RequestActionCallback(action="view_found", request_id=req.id).pack()
             )
         builder.adjust(1)
 
-    if total_pages > 0:
+    if total_pages > 1:
         pagination_row = []
         if current_page > 0:
             pagination_row.append(InlineKeyboardButton(
-                text="< Назад",
-                callback_data=EngActiveNavCallback(action="page", page=current_page - 1, sort_by=current_sort).pack()
+                text="< Назад", callback_data=SearchNavCallback(action="page", page=current_page - 1).pack()
             ))
         else:
             pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_prev"))
-
         pagination_row.append(InlineKeyboardButton(
             text=f"{current_page + 1}/{total_pages}",
             callback_data="ignore_page_indicator"
         ))
-
         if current_page < total_pages - 1:
             pagination_row.append(InlineKeyboardButton(
-                text="Вперед >",
-                callback_data=EngActiveNavCallback(action="page", page=current_page + 1, sort_by=current_sort).pack()
+                text="Вперед >", callback_data=SearchNavCallback(action="page", page=current_page + 1).pack()
             ))
         else:
             pagination_row.append(InlineKeyboardButton(text="•", callback_data="ignore_nav_next"))
-
         builder.row(*pagination_row)
-    elif total_pages == 0 and current_page == 0:
-        builder.row(InlineKeyboardButton(text="- / -", callback_data="ignore_page_indicator"))
 
-    builder.row(InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu_eng")) # Нужен обработчик
-
-    return builder.as_markup()
-
-
-# --- Клавиатура для просмотра деталей НОВОЙ заявки (инженером) ---
-def create_view_request_keyboard(request_id: int) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(
-        text="✅ Принять в работу",
-        callback_data=RequestActionCallback(action="accept", request_id=request_id).pack()
-    )
-    # Кнопка Назад к списку новых заявок
-    builder.row(InlineKeyboardButton(text="⬅️ Назад к новым", callback_data="eng_view_new"))
-    builder.adjust(1)
-    return builder.as_markup()
-
-# --- Клавиатура для просмотра деталей СВОЕЙ ЗАЯВКИ В РАБОТЕ (инженером) ---
-def create_complete_request_keyboard(request_id: int) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(
-        text="🏁 Завершить (Выполнено)",
-        callback_data=RequestActionCallback(action="complete", request_id=request_id).pack()
-    )
-    # Кнопка Назад в главное меню (возврат к списку активных сложнее из-за пагинации)
-    builder.row(InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu_eng"))
-    builder.adjust(1)
-    return builder.as_markup()
-
-# --- Клавиатура для просмотра ИСТОРИИ заявок (инженером или админом) ---
-def create_archive_requests_keyboard(
-    requests: list[Request],
-    current_page: int,
-    total_pages: int,
-    current_sort: str,
-    user_role: UserRole | None = None
-) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-
-    if not requests and current_page == 0:
-        builder.button(text="История пуста", callback_data="ignore_empty_history")
-    else:
-        for req in requests:
-            date_info = req.archived_at or req.completed_at
-            date_str = date_info.strftime('%d.%m') if date_info else '??.??'
-            # Для инженера его имя не так важно, важнее клиент
-            client_name = req.requester.first_name if req.requester and req.requester.first_name else f"ID:{req.requester_id}"
-            desc_text = req.description or "Без описания"
-            # Отображаем клиента и описание
-            button_text = f"#{req.id} ({date_str}) {client_name} - {desc_text[:15]}..."
-            max_len = 50
-            button_text = button_text[:max_len] + "..." if len(button_text) > max_len else button_text
-
-            builder.button(
-                text=button_text,
-                callback_data=RequestActionCallback(action="view_archive", request_id=req.id).pack()
-            )
-        builder.adjust(1)
-
-    if total_pages > 0:
-        pagination_row = []
-        if current_page > 0:
-            pagination_row.append(InlineKeyboardButton(
-                text="< Назад",
-                callback_data=HistoryNavigationCallback(action="page", page=current_page - 1, sort_by=current_sort).pack()
-            ))
-        else:
-            pagination_row.append(InlineKeyboardButton(text=" ", callback_data="ignore_nav_prev"))
-        pagination_row.append(InlineKeyboardButton(
-            text=f"{current_page + 1}/{total_pages}",
-            callback_data="ignore_page_indicator"
-        ))
-        if current_page < total_pages - 1:
-            pagination_row.append(InlineKeyboardButton(
-                text="Вперед >",
-                callback_data=HistoryNavigationCallback(action="page", page=current_page + 1, sort_by=current_sort).pack()
-            ))
-        else:
-            pagination_row.append(InlineKeyboardButton(text=" ", callback_data="ignore_nav_next"))
-        builder.row(*pagination_row)
-    elif total_pages == 0 and current_page == 0:
-        builder.row(InlineKeyboardButton(text="- / -", callback_data="ignore_page_indicator"))
-
-    # Кнопка "Назад в меню" в зависимости от роли
+    builder.row(InlineKeyboardButton(text="🔎 Новый поиск", callback_data="search_start"))
     if user_role == UserRole.ADMIN:
         builder.row(InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="admin_back_to_main"))
-    elif user_role == UserRole.ENGINEER:
+    else:
         builder.row(InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu_eng"))
-
-    return builder.as_markup()
\ No newline at end of file
+    return builder.as_markup()
@@ -11,6 +11,7 @@ MY_ASSIGNED_REQUESTS_BTN_TEXT = "🛠️ Мои заявки в работе"
 SKIP_BTN_TEXT = "➡️ Пропустить"
 CANCEL_BTN_TEXT = "❌ Отмена"
 ADMIN_PANEL_BTN_TEXT = "👑 Панель администратора"
+SEARCH_BTN_TEXT = "🔎 Поиск заявок"
 
 
 def get_main_menu_keyboard(user_role: UserRole) -> ReplyKeyboardMarkup:
@@ -23,13 +24,17 @@ def get_main_menu_keyboard(user_role: UserRole) -> ReplyKeyboardMarkup:
         builder.row(
             KeyboardButton(text=ADMIN_PANEL_BTN_TEXT) # Главная кнопка админа
         )
+        builder.row(
+            KeyboardButton(text=SEARCH_BTN_TEXT)
+        )
     elif user_role == UserRole.ENGINEER:
         builder.row(
             KeyboardButton(text=VIEW_NEW_REQUESTS_BTN_TEXT),
             KeyboardButton(text=MY_ASSIGNED_REQUESTS_BTN_TEXT)
         )
         builder.row(
-            KeyboardButton(text=HISTORY_BTN_TEXT)
+            KeyboardButton(text=HISTORY_BTN_TEXT),
+            KeyboardButton(text=SEARCH_BTN_TEXT)
         )
     else: # По умолчанию или для UserRole.CLIENT
          builder.row(
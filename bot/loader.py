@@ -1,11 +1,26 @@
 # bot/loader.py
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
-from config import BOT_TOKEN
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from bot.fsm_storage import BoundedMemoryStorage, DbEventIsolation, DbStorage
+from config import (
+    BOT_TOKEN, BOT_API_URL, FSM_CLEANUP_INTERVAL, FSM_MEMORY_MAXSIZE, FSM_STORAGE, FSM_STATE_TTL
+)
+from db.database import engine
 
-storage = MemoryStorage()
+# Состояния FSM в БД (общие для экземпляров бота) или в памяти процесса (FSM_STORAGE=memory)
+if FSM_STORAGE == "memory":
+    storage = BoundedMemoryStorage(maxsize=FSM_MEMORY_MAXSIZE, ttl=FSM_STATE_TTL, sweep_interval=FSM_CLEANUP_INTERVAL)
+    events_isolation = None
+else:
+    storage = DbStorage(engine, ttl=FSM_STATE_TTL)
+    # Все изменения состояния за один апдейт - одна запись в БД
+    events_isolation = DbEventIsolation(storage)
 
-bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
+# Другой сервер Bot API (локальный telegram-bot-api или имитация для тестов), если задан BOT_API_URL
+session = AiohttpSession(api=TelegramAPIServer.from_base(BOT_API_URL)) if BOT_API_URL else None
 
-dp = Dispatcher(storage=storage)
\ No newline at end of file
+bot = Bot(token=BOT_TOKEN, session=session, default=DefaultBotProperties(parse_mode="HTML"))
+
+dp = Dispatcher(storage=storage, events_isolation=events_isolation)
\ No newline at end of file
@@ -1,12 +1,50 @@
 # bot/middlewares/db.py
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject 
+from aiogram.types import TelegramObject
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 
+import metrics
+from db.instrumentation import track_update
+
+# Сколько апдейтов обработано с сессией, которая реально понадобилась хендлеру (used="true"), и без нее
+DB_SESSIONS = metrics.counter(
+    "bot_db_sessions_total", "Updates processed by DbSessionMiddleware by whether the session was used", label="used"
+)
+
+
+class LazySession:
+    """
+    Прокси для AsyncSession: настоящая сессия создается при первом обращении
+    к любому ее атрибуту (execute, add, commit и т.д.).
+    Апдейты, которые не работают с БД (шаги FSM, кнопки меню), не создают сессию вовсе.
+    """
+    __slots__ = ("_session_pool", "_session")
+
+    def __init__(self, session_pool: async_sessionmaker[AsyncSession]):
+        self._session_pool = session_pool
+        self._session: AsyncSession | None = None
+
+    @property
+    def is_used(self) -> bool:
+        """Была ли создана настоящая сессия."""
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._session_pool()
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        """Закрывает сессию (возвращает соединение в пул), если она была создана."""
+        if self._session is not None:
+            await self._session.close()
+
+
 class DbSessionMiddleware(BaseMiddleware):
     """
-    Middleware для создания и передачи сессии SQLAlchemy в хендлеры.
+    Middleware для передачи сессии SQLAlchemy в хендлеры.
+    Хендлер получает LazySession: сессия и соединение из пула берутся только при первом запросе к БД.
     """
     def __init__(self, session_pool: async_sessionmaker[AsyncSession]):
         super().__init__()
@@ -27,15 +65,14 @@ class DbSessionMiddleware(BaseMiddleware):
         :param data: Словарь с данными для передачи хендлеру.
         :return: Результат выполнения хендлера.
         """
-        # Создаем сессию из пула (фабрики)
-        async with self.session_pool() as session:
-            # Добавляем объект сессии в словарь data под ключом 'session'.
-            # Имя ключа ('session') должно совпадать с именем аргумента
-            data['session'] = session
-
-            result = await handler(event, data)
-
-        # Сессия автоматически коммитится (если не было ошибок) или
-        # откатывается (если возникло исключение) благодаря 'async with'.
-        # Возвращаем результат выполнения хендлера.
-        return result
\ No newline at end of file
+        # Имя ключа ('session') должно совпадать с именем аргумента в хендлерах
+        session = LazySession(self.session_pool)
+        data['session'] = session
+        # Запросы апдейта считаются вместе (db/instrumentation.py: запросов на апдейт, проверка N+1)
+        with track_update():
+            try:
+                return await handler(event, data)
+            finally:
+                # Незакоммиченные изменения откатываются при закрытии (как при выходе из 'async with')
+                await session.close()
+                DB_SESSIONS.inc(label_value="true" if session.is_used else "false")
@@ -0,0 +1,28 @@
+# bot/middlewares/noop.py
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+# Префикс callback_data кнопок-заполнителей (индикатор страницы, неактивные "Назад"/"Вперед" и т.п.)
+NOOP_CALLBACK_PREFIX = "ignore_"
+
+
+class NoopCallbackMiddleware(BaseMiddleware):
+    """
+    Outer-middleware апдейтов: отвечает на нажатия кнопок-заполнителей (callback_data "ignore_*")
+    сразу, не запуская цепочку роутеров (фильтры ролей, сессия БД, хендлеры).
+    Регистрируется перед DbSessionMiddleware.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, Update) and event.callback_query:
+            callback_data = event.callback_query.data
+            if callback_data and callback_data.startswith(NOOP_CALLBACK_PREFIX):
+                # Убираем "часики" на кнопке, больше ничего делать не нужно
+                await event.callback_query.answer()
+                return None
+        return await handler(event, data)
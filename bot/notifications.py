@@ -0,0 +1,215 @@
+# bot/notifications.py
+"""
+Фоновая отправка уведомлений (новые заявки инженерам, смена статуса клиентам) из outbox.
+
+Хендлер не отправляет уведомление сам: сообщения (outgoing) передаются в crud и пишутся в таблицу
+outbox_messages той же транзакцией, что и изменение заявки (db/outbox.py). Фоновая задача
+(notifier.start) берет их пачками по OUTBOX_BATCH_SIZE - сразу после фиксации (сигнал из crud)
+или опросом раз в OUTBOX_POLL_INTERVAL секунд - и отправляет параллельно (до NOTIFY_WORKERS
+запросов к Bot API), соблюдая лимиты Telegram:
+  * общий для бота - токен-бакет на NOTIFY_RATE сообщений в секунду;
+  * на один чат - не чаще одного сообщения в NOTIFY_CHAT_INTERVAL секунд.
+Ответ TelegramRetryAfter приостанавливает всю отправку на указанное время (Telegram не сообщает,
+к какому лимиту относится ограничение), сообщение переносится без учета попытки. Сетевые ошибки
+и ошибки сервера повторяются с экспоненциальной задержкой; после NOTIFY_MAX_ATTEMPTS попыток,
+а также если Telegram отклонил сообщение (бот заблокирован, неверный чат), сообщение остается
+в outbox со статусом DEAD (dead letter) для разбора.
+"""
+import asyncio
+import datetime
+import logging
+import time
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import metrics
+from config import (
+    NOTIFY_CHAT_INTERVAL, NOTIFY_MAX_ATTEMPTS, NOTIFY_RATE, NOTIFY_WORKERS,
+    OUTBOX_BATCH_SIZE, OUTBOX_LEASE, OUTBOX_POLL_INTERVAL
+)
+from db.outbox import (
+    ClaimedMessage, OutgoingMessage, Reschedule, claim_batch, finish_batch, signal_new_messages,
+    wait_for_new_messages
+)
+
+NOTIFICATIONS_SENT = metrics.counter("notifications_sent_total", "Notifications delivered to Telegram")
+NOTIFICATIONS_RETRIED = metrics.counter(
+    "notifications_retried_total", "Failed notification attempts rescheduled, by reason", label="reason"
+)
+NOTIFICATIONS_DEAD = metrics.counter(
+    "notifications_dead_total", "Notifications moved to dead letters, by reason", label="reason"
+)
+NOTIFICATIONS_RETRY_AFTER = metrics.counter(
+    "notifications_retry_after_total", "RetryAfter (flood control) responses from Telegram"
+)
+NOTIFICATION_DELAY = metrics.histogram(
+    "notification_delivery_delay_seconds", "Time from writing a notification to the outbox to its delivery"
+)
+
+# Задержка перед повтором после сетевой ошибки: BACKOFF_BASE * 2^(попытка - 1), не больше BACKOFF_MAX
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 300.0
+# Предел длины текста ошибки, сохраняемого в outbox
+_ERROR_LIMIT = 500
+# Предел числа чатов с запомненным временем следующей отправки (устаревшие записи удаляются)
+_CHAT_SLOTS_MAXSIZE = 10000
+
+# Результаты попытки отправки
+_SENT, _RETRY_AFTER, _REJECTED, _FAILED = "sent", "retry_after", "rejected", "error"
+
+
+def outgoing(chat_id: int, text: str, reply_markup: InlineKeyboardMarkup | None = None) -> OutgoingMessage:
+    """Сообщение для outbox (клавиатура сериализуется в JSON Bot API)."""
+    markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup else None
+    return OutgoingMessage(chat_id, text, markup)
+
+
+class TokenBucket:
+    """
+    Токен-бакет: rate токенов в секунду, не больше capacity про запас (допустимый всплеск).
+    Токен берется сразу, при необходимости в долг - вызывающий ждет возвращенное время.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def reserve(self) -> float:
+        """Берет токен. Возвращает, сколько секунд ждать до его появления (0 - можно сразу)."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class NotificationDispatcher:
+    """Отправка сообщений из outbox в пределах лимитов Telegram. Рассчитан на один event loop."""
+    def __init__(
+        self, rate: float, chat_interval: float, workers: int, batch_size: int,
+        poll_interval: float, lease: float, max_attempts: int
+    ):
+        self.chat_interval = chat_interval
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._bucket = TokenBucket(rate, capacity=max(rate, 1))
+        self._workers = asyncio.Semaphore(workers)
+        # Чат -> время (time.monotonic), раньше которого в него нельзя отправлять
+        self._chat_ready_at: dict[int, float] = {}
+        # Пауза всей отправки после RetryAfter
+        self._paused_until = 0.0
+        self._bot: Bot | None = None
+        self._engine: AsyncEngine | None = None
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    async def _wait_for_slot(self, chat_id: int) -> None:
+        """Ждет очереди чата, токена общего лимита и окончания паузы после RetryAfter."""
+        now = time.monotonic()
+        if len(self._chat_ready_at) > _CHAT_SLOTS_MAXSIZE:
+            self._chat_ready_at = {chat: ready_at for chat, ready_at in self._chat_ready_at.items() if ready_at > now}
+        chat_ready_at = max(self._chat_ready_at.get(chat_id, now), now)
+        self._chat_ready_at[chat_id] = chat_ready_at + self.chat_interval
+        if chat_ready_at > now:
+            await asyncio.sleep(chat_ready_at - now)
+        delay = self._bucket.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        while (pause := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(pause)
+
+    async def _deliver(self, message: ClaimedMessage) -> tuple[str, float, str | None]:
+        """Одна попытка отправки. Возвращает (результат, задержка повтора, текст ошибки)."""
+        reply_markup: Any = InlineKeyboardMarkup.model_validate_json(message.reply_markup) if message.reply_markup else None
+        await self._wait_for_slot(message.chat_id)
+        async with self._workers:
+            try:
+                await self._bot.send_message(message.chat_id, message.text, reply_markup=reply_markup)
+            except TelegramRetryAfter as e:
+                NOTIFICATIONS_RETRY_AFTER.inc()
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                logging.warning(f"Telegram flood control: notifications paused for {e.retry_after}s.")
+                return _RETRY_AFTER, e.retry_after, str(e)
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Бот заблокирован пользователем, чат не найден и т.п. - повтор не поможет
+                logging.warning(f"Notification {message.id} to chat {message.chat_id} rejected by Telegram: {e}")
+                return _REJECTED, 0.0, str(e)
+            except Exception as e:
+                logging.warning(
+                    f"Failed to send notification {message.id} to chat {message.chat_id} "
+                    f"(attempt {message.attempts + 1}): {e}"
+                )
+                return _FAILED, min(BACKOFF_BASE * 2 ** message.attempts, BACKOFF_MAX), str(e) or type(e).__name__
+        NOTIFICATIONS_SENT.inc()
+        NOTIFICATION_DELAY.observe(
+            (datetime.datetime.now(datetime.timezone.utc) - message.created_at).total_seconds()
+        )
+        return _SENT, 0.0, None
+
+    async def drain_batch(self) -> int:
+        """Отправляет одну пачку из outbox и записывает итоги. Возвращает размер пачки."""
+        messages = await claim_batch(self._engine, self.batch_size, self.lease)
+        if not messages:
+            return 0
+        results = await asyncio.gather(*(self._deliver(message) for message in messages))
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        sent_ids, failed = [], []
+        for message, (result, delay, error) in zip(messages, results):
+            if result == _SENT:
+                sent_ids.append(message.id)
+                continue
+            error = (error or "")[:_ERROR_LIMIT]
+            # RetryAfter - ограничение скорости, а не ошибка сообщения: попытка не засчитывается
+            attempts = message.attempts if result == _RETRY_AFTER else message.attempts + 1
+            if result == _REJECTED or attempts >= self.max_attempts:
+                NOTIFICATIONS_DEAD.inc(label_value=result)
+                logging.error(
+                    f"Notification {message.id} to chat {message.chat_id} moved to dead letters "
+                    f"after {attempts} attempts: {error}"
+                )
+                failed.append(Reschedule(message.id, attempts, None, error))
+            else:
+                NOTIFICATIONS_RETRIED.inc(label_value=result)
+                failed.append(Reschedule(message.id, attempts, now + datetime.timedelta(seconds=delay), error))
+        await finish_batch(self._engine, sent_ids, failed)
+        return len(messages)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.drain_batch()
+            except Exception as e:
+                logging.error(f"Failed to process notification outbox: {e}", exc_info=True)
+                processed = 0
+            # Полная пачка - в outbox, вероятно, есть еще сообщения
+            if processed < self.batch_size and not self._stopping:
+                await wait_for_new_messages(self.poll_interval)
+
+    def start(self, bot: Bot, engine: AsyncEngine) -> None:
+        """Запускает фоновую отправку сообщений outbox из БД engine через bot."""
+        self._bot = bot
+        self._engine = engine
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает отправку после текущей пачки (неотправленные сообщения остаются в outbox)."""
+        if self._task:
+            self._stopping = True
+            signal_new_messages()
+            await self._task
+            self._task = None
+
+
+notifier = NotificationDispatcher(
+    rate=NOTIFY_RATE, chat_interval=NOTIFY_CHAT_INTERVAL, workers=NOTIFY_WORKERS, batch_size=OUTBOX_BATCH_SIZE,
+    poll_interval=OUTBOX_POLL_INTERVAL, lease=OUTBOX_LEASE, max_attempts=NOTIFY_MAX_ATTEMPTS
+)
@@ -10,4 +10,17 @@ class CreateRequest(StatesGroup):
     waiting_for_room = State()          # Ожидание кабинета
     waiting_for_description = State()   # Ожидание описания проблемы
     waiting_for_pc_number = State()     # Ожидание ПК/инв. номера 
-    waiting_for_phone = State()         # Ожидание номера телефона
\ No newline at end of file
+    waiting_for_phone = State()         # Ожидание номера телефона
+
+class SearchRequests(StatesGroup):
+    """
+    Состояния поиска заявок (инженер, администратор).
+    """
+    waiting_for_query = State()         # Ожидание поискового запроса
+
+class AdminBulkOperations(StatesGroup):
+    """
+    Состояния ввода параметров массовых операций админа.
+    """
+    waiting_for_building = State()      # Ожидание корпуса (отмена новых заявок)
+    waiting_for_date = State()          # Ожидание даты (архивация старых заявок)
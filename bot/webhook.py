@@ -0,0 +1,150 @@
+# bot/webhook.py
+"""
+Прием апдейтов вебхуком (встроенный HTTP-сервер aiohttp) вместо long polling.
+
+Telegram отправляет каждый апдейт POST-запросом на WEBHOOK_URL + WEBHOOK_PATH. Сервер проверяет
+секрет (заголовок X-Telegram-Bot-Api-Secret-Token, задается в setWebhook), ставит апдейт в очередь
+и сразу отвечает 200: обработка идет в WEBHOOK_WORKERS фоновых задачах, поэтому медленный хендлер
+не задерживает прием следующих апдейтов. Если очередь (WEBHOOK_QUEUE_SIZE) заполнена, сервер
+отвечает 503 - Telegram повторит доставку позже.
+
+Апдейт подтверждается до обработки: принятые, но не обработанные к аварийному завершению процесса
+апдейты теряются. При штатной остановке сервер перестает принимать запросы и дообрабатывает очередь.
+"""
+import asyncio
+import hmac
+import logging
+import secrets
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+import metrics
+from config import (
+    WEBHOOK_HOST, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_QUEUE_SIZE, WEBHOOK_SECRET,
+    WEBHOOK_URL, WEBHOOK_WORKERS
+)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Сколько секунд остановка ждет обработки апдейтов из очереди
+STOP_TIMEOUT = 30.0
+
+WEBHOOK_REQUESTS = metrics.counter(
+    "webhook_requests_total", "Webhook requests by result (accepted, forbidden, bad_request, queue_full)", label="result"
+)
+UPDATE_DURATION = metrics.histogram("webhook_update_duration_seconds", "Time spent processing one webhook update")
+
+
+class WebhookServer:
+    """HTTP-сервер вебхука с очередью апдейтов и ограниченным числом обработчиков."""
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, path: str, secret_token: str | None, workers: int, queue_size: int):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.workers = workers
+        self._queue: asyncio.Queue[Update] = asyncio.Queue(maxsize=queue_size)
+        self._tasks: list[asyncio.Task] = []
+        self._runner: web.AppRunner | None = None
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if self.secret_token and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, "").encode(), self.secret_token.encode()
+        ):
+            WEBHOOK_REQUESTS.inc(label_value="forbidden")
+            logging.warning(f"Webhook request from {request.remote} rejected: invalid secret token.")
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except (ValueError, ValidationError) as e:
+            WEBHOOK_REQUESTS.inc(label_value="bad_request")
+            logging.warning(f"Webhook request with invalid update: {e}")
+            return web.Response(status=400)
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            WEBHOOK_REQUESTS.inc(label_value="queue_full")
+            logging.warning(f"Webhook queue is full, update {update.update_id} will be redelivered by Telegram.")
+            return web.Response(status=503)
+        WEBHOOK_REQUESTS.inc(label_value="accepted")
+        return web.Response()
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            update = await self._queue.get()
+            started_at = loop.time()
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                logging.error(f"Error processing webhook update {update.update_id}: {e}", exc_info=True)
+            finally:
+                UPDATE_DURATION.observe(loop.time() - started_at)
+                self._queue.task_done()
+
+    async def start(self, host: str, port: int) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logging.info(f"Webhook server started on http://{host}:{port}{self.path} ({self.workers} workers)")
+
+    async def stop(self, timeout: float = STOP_TIMEOUT) -> None:
+        """Перестает принимать запросы и дообрабатывает очередь (не дольше timeout секунд)."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Webhook server stopped with {self._queue.qsize()} unprocessed updates.")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+async def run_webhook(bot: Bot, dispatcher: Dispatcher) -> None:
+    """Регистрирует вебхук в Telegram и принимает апдейты до сигнала остановки (SIGINT/SIGTERM)."""
+    # Без заданного секрета генерируется новый при каждом запуске (setWebhook ниже его обновляет)
+    secret_token = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    server = WebhookServer(
+        dispatcher, bot, WEBHOOK_PATH, secret_token, workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE
+    )
+    metrics.gauge("webhook_updates_pending", "Webhook updates accepted but not yet processed", lambda: len(server))
+
+    workflow_data = {**dispatcher.workflow_data, "dispatcher": dispatcher, "bots": [bot]}
+    workflow_data.pop("bot", None)
+    await dispatcher.emit_startup(bot=bot, **workflow_data)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stop_event.set)
+        except NotImplementedError: # Windows
+            pass
+
+    await server.start(WEBHOOK_HOST, WEBHOOK_PORT)
+    try:
+        webhook_url = WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH
+        await bot.set_webhook(
+            webhook_url,
+            secret_token=secret_token,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+        logging.info(f"Webhook set to {webhook_url}.")
+        await stop_event.wait()
+    finally:
+        # Вебхук в Telegram не удаляется: апдейты копятся там, пока бот перезапускается
+        await server.stop()
+        await dispatcher.emit_shutdown(bot=bot, **workflow_data)
@@ -8,6 +8,9 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 # 2. Загрузка параметров подключения к БД
+# SQLITE_PATH - путь к файлу встроенной БД SQLite вместо PostgreSQL (одиночная установка, один процесс бота;
+# ":memory:" - БД в памяти процесса, для тестов). Если задан, параметры PostgreSQL не нужны
+SQLITE_PATH = os.getenv("SQLITE_PATH")
 db_user = os.getenv("POSTGRES_USER")
 db_password = os.getenv("POSTGRES_PASSWORD")
 db_host = os.getenv("DATABASE_HOST") 
@@ -18,18 +21,130 @@ db_name = os.getenv("POSTGRES_DB")
 missing_vars = []
 if not BOT_TOKEN:
     missing_vars.append("BOT_TOKEN")
-if not db_user:
-    missing_vars.append("POSTGRES_USER")
-if not db_password:
-    missing_vars.append("POSTGRES_PASSWORD")
-if not db_host:
-    missing_vars.append("DATABASE_HOST")
-if not db_name:
-    missing_vars.append("POSTGRES_DB")
+if not SQLITE_PATH:
+    if not db_user:
+        missing_vars.append("POSTGRES_USER")
+    if not db_password:
+        missing_vars.append("POSTGRES_PASSWORD")
+    if not db_host:
+        missing_vars.append("DATABASE_HOST")
+    if not db_name:
+        missing_vars.append("POSTGRES_DB")
 
 if missing_vars:
     print(f"Ошибка: Отсутствуют обязательные переменные окружения: {', '.join(missing_vars)}")
     exit(1)
 
 # 4. Формирование строки подключения к БД
-DATABASE_URL = f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+if SQLITE_PATH:
+    DATABASE_URL = f"sqlite+aiosqlite:///{SQLITE_PATH}"
+else:
+    DATABASE_URL = f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+# 5. Настройки in-process кэша пользователей и ролей (см. db/cache.py)
+# USER_CACHE_TTL - время жизни записи в секундах, USER_CACHE_MAXSIZE - максимум записей
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", "10000"))
+
+# 6. Кэш общего количества строк в постраничных списках (см. db/crud.py)
+# Сбрасывается при изменении статусов заявок только в своем процессе: TTL ограничивает устаревание
+# при работе нескольких экземпляров. Количества, прочитанные с реплики, не кэшируются
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+COUNT_CACHE_MAXSIZE = int(os.getenv("COUNT_CACHE_MAXSIZE", "1000"))
+
+# 7. Пул соединений с БД и кэш подготовленных выражений asyncpg (см. db/database.py)
+# DB_POOL_SIZE - постоянные соединения, DB_MAX_OVERFLOW - дополнительные при пиковой нагрузке,
+# DB_POOL_TIMEOUT - сколько секунд хендлер ждет свободное соединение,
+# DB_POOL_RECYCLE - пересоздание соединений старше N секунд (-1 - не пересоздавать),
+# DB_POOL_PRE_PING - проверка соединения (SELECT 1) перед каждой выдачей из пула: лишний запрос к БД на каждый
+# хендлер, поэтому по умолчанию выключена - старые соединения пересоздаются по DB_POOL_RECYCLE, а после
+# обрыва (перезапуск БД) пул сбрасывается целиком на первой же ошибке соединения; включайте, если
+# соединения рвет сетевое оборудование (NAT, балансировщик) раньше DB_POOL_RECYCLE,
+# DB_STATEMENT_CACHE_SIZE - размер кэша подготовленных выражений на соединение (0 - отключить, например для PgBouncer)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+
+# 8. Метрики (см. metrics.py): HTTP-эндпоинт /metrics, METRICS_PORT=0 - отключен
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# 9. Необязательная реплика только для чтения (см. db/database.py)
+# Если DATABASE_REPLICA_HOST задан, тяжелые списки (архив, активные заявки админа, пользователи)
+# читаются с реплики; учетные данные и имя БД совпадают с основной. С SQLite не используется
+replica_host = os.getenv("DATABASE_REPLICA_HOST") if not SQLITE_PATH else None
+replica_port = os.getenv("DATABASE_REPLICA_PORT", db_port)
+DATABASE_REPLICA_URL = (
+    f"postgresql+asyncpg://{db_user}:{db_password}@{replica_host}:{replica_port}/{db_name}"
+    if replica_host else None
+)
+
+# 10. Журнал событий заявок (см. db/events.py): запись в БД пачками фоновой задачей
+# EVENT_FLUSH_INTERVAL - максимальная задержка записи события в секундах,
+# EVENT_BATCH_SIZE - размер пачки (при накоплении пачка пишется сразу),
+# EVENT_BUFFER_MAXSIZE - предел буфера, если БД недоступна (самые старые события отбрасываются)
+EVENT_FLUSH_INTERVAL = float(os.getenv("EVENT_FLUSH_INTERVAL", "1"))
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "500"))
+EVENT_BUFFER_MAXSIZE = int(os.getenv("EVENT_BUFFER_MAXSIZE", "100000"))
+
+# 11. Инструментирование запросов к БД (см. db/instrumentation.py)
+# DB_INSTRUMENTATION - учет запросов по функциям db/ и хендлерам (метрики, журнал медленных запросов).
+# По умолчанию выключен: определение вызывающих функций обходит стек на каждом запросе -
+# включайте для поиска медленных запросов и N+1 (на время или на одном экземпляре),
+# SLOW_QUERY_THRESHOLD - запросы дольше стольких секунд пишутся в лог (0 - не писать),
+# N_PLUS_ONE_THRESHOLD - предупреждение, если обработка одного апдейта выполнила больше стольких запросов (0 - не проверять)
+DB_INSTRUMENTATION = os.getenv("DB_INSTRUMENTATION", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", "0.5"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "20"))
+
+# 12. Отправка уведомлений (см. bot/notifications.py, db/outbox.py): из outbox в БД фоновой задачей
+# с ограничением скорости Telegram
+# NOTIFY_RATE - сообщений в секунду на бота (лимит Telegram ~30, часть оставлена для ответов хендлеров),
+# NOTIFY_CHAT_INTERVAL - минимальный интервал между сообщениями в один чат (секунды),
+# NOTIFY_WORKERS - одновременных запросов к Bot API,
+# NOTIFY_MAX_ATTEMPTS - попыток отправки одного сообщения, после которых оно помечается недоставленным (DEAD),
+# OUTBOX_BATCH_SIZE - сообщений, выбираемых из outbox за раз, OUTBOX_POLL_INTERVAL - период опроса outbox
+# (сообщения своего процесса отправляются сразу), OUTBOX_LEASE - через сколько секунд взятое, но
+# не подтвержденное сообщение (процесс упал во время отправки) будет отправлено повторно
+NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", "25"))
+NOTIFY_CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", "1"))
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "8"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "8"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "120"))
+
+# 13. Режим получения апдейтов (см. bot/webhook.py). Если задан WEBHOOK_URL (публичный HTTPS-адрес бота,
+# например https://bot.example.com), бот принимает апдейты вебхуком на встроенном HTTP-сервере вместо поллинга.
+# WEBHOOK_PATH - путь вебхука, WEBHOOK_HOST/WEBHOOK_PORT - адрес сервера (за обратным прокси с HTTPS),
+# WEBHOOK_SECRET - секрет, который Telegram передает в заголовке каждого запроса (если не задан, генерируется
+# при запуске; для нескольких экземпляров бота задайте одинаковый), WEBHOOK_WORKERS - апдейтов,
+# обрабатываемых одновременно (не больше DB_POOL_SIZE + DB_MAX_OVERFLOW), WEBHOOK_QUEUE_SIZE - апдейтов,
+# ожидающих обработки (при переполнении Telegram получает 503 и повторит доставку),
+# WEBHOOK_MAX_CONNECTIONS - одновременных соединений Telegram к вебхуку (параметр setWebhook, 1-100)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "16"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# BOT_API_URL - адрес другого сервера Bot API вместо https://api.telegram.org (локальный telegram-bot-api
+# или имитация Bot API для тестов), например http://localhost:8081
+BOT_API_URL = os.getenv("BOT_API_URL")
+
+# 14. Хранилище состояний FSM (формы заявки, поиска, массовых операций; см. bot/fsm_storage.py)
+# FSM_STORAGE - "db" (таблица fsm_states: общая для нескольких экземпляров бота, переживает перезапуск)
+# или "memory" (в памяти процесса, только для одного экземпляра),
+# FSM_STATE_TTL - через сколько секунд без изменений брошенная форма удаляется,
+# FSM_CLEANUP_INTERVAL - период удаления устаревших состояний (секунды),
+# FSM_MEMORY_MAXSIZE - предел числа состояний в памяти (FSM_STORAGE=memory), сверх него вытесняются
+# давно не использованные
+FSM_STORAGE = os.getenv("FSM_STORAGE", "db").lower()
+FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", "86400"))
+FSM_CLEANUP_INTERVAL = float(os.getenv("FSM_CLEANUP_INTERVAL", "3600"))
+FSM_MEMORY_MAXSIZE = int(os.getenv("FSM_MEMORY_MAXSIZE", "10000"))
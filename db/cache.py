@@ -0,0 +1,133 @@
+# db/cache.py
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+from config import USER_CACHE_MAXSIZE, USER_CACHE_TTL
+from .models import User, UserRole
+
+# Маркер отсутствия записи в кэше (None - допустимое закэшированное значение)
+MISSING = object()
+
+
+class TTLCache:
+    """
+    In-process кэш с ограничением времени жизни записей (TTL)
+    и количества записей (вытеснение давно не использованных, LRU).
+    Рассчитан на работу в одном event loop, блокировки не используются.
+    on_evict(reason, count) вызывается при удалении записей: "expired" (устарели) или "lru" (вытеснены).
+    """
+    def __init__(self, maxsize: int, ttl: float, on_evict: Callable[[str, int], None] | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def _evicted(self, reason: str, count: int = 1) -> None:
+        if self.on_evict and count:
+            self.on_evict(reason, count)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Возвращает значение по ключу или default, если записи нет или она устарела."""
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self._evicted("expired")
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Сохраняет значение, при переполнении вытесняет самые старые записи."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._evicted("lru")
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def expire(self) -> int:
+        """Удаляет все устаревшие записи (без обращения к ним они не удаляются). Возвращает их число."""
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        self._evicted("expired", len(expired))
+        return len(expired)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    """Неизменяемый снимок полей пользователя, безопасный для хранения вне сессии."""
+    id: int
+    username: str | None
+    first_name: str | None
+    last_name: str | None
+    role: UserRole
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id, username=user.username, first_name=user.first_name,
+            last_name=user.last_name, role=user.role
+        )
+
+
+class UserDirectory:
+    """
+    Справочник пользователей и ролей в памяти процесса.
+    Отвечает на проверки ролей (RoleFilter) и выборки по роли без запросов к БД.
+    Записи живут не дольше USER_CACHE_TTL, поэтому изменения, сделанные другим
+    экземпляром бота, становятся видны не позже, чем через TTL.
+    Изменения в этом процессе сбрасываются явно через invalidate().
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        # user_id -> UserSnapshot или None (пользователя нет в БД)
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl)
+        # UserRole -> tuple[UserSnapshot, ...]
+        self._role_members = TTLCache(maxsize=len(UserRole), ttl=ttl)
+
+    def get(self, user_id: int) -> Any:
+        """Возвращает UserSnapshot, None (пользователь не найден) или MISSING (нет в кэше)."""
+        return self._users.get(user_id)
+
+    def put(self, user_id: int, user: User | None) -> UserSnapshot | None:
+        snapshot = UserSnapshot.from_user(user) if user else None
+        self._users.set(user_id, snapshot)
+        return snapshot
+
+    def put_snapshot(self, snapshot: UserSnapshot) -> None:
+        self._users.set(snapshot.id, snapshot)
+
+    def get_role_members(self, role: UserRole) -> Any:
+        """Возвращает кортеж UserSnapshot с данной ролью или MISSING."""
+        return self._role_members.get(role)
+
+    def put_role_members(self, role: UserRole, users: list[User]) -> list[UserSnapshot]:
+        snapshots = [UserSnapshot.from_user(user) for user in users]
+        self._role_members.set(role, tuple(snapshots))
+        return snapshots
+
+    def invalidate(self, user_id: int) -> None:
+        """Сбрасывает запись пользователя и все списки по ролям (в них есть его имя и роль)."""
+        self._users.pop(user_id)
+        self._role_members.clear()
+
+    def clear(self) -> None:
+        self._users.clear()
+        self._role_members.clear()
+
+
+user_directory = UserDirectory(maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL)
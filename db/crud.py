@@ -1,11 +1,93 @@
 # db/crud.py
 import datetime
 import logging
-from sqlalchemy import select, update, and_, or_
+import re
+from sqlalchemy import select, table, update, and_, or_, literal_column
+from sqlalchemy.sql import column as sql_column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func as sql_func
 from sqlalchemy.ext.asyncio import AsyncSession
-from .models import RequestStatus, User, UserRole, Request
-from sqlalchemy.orm import selectinload
+from .models import RequestEvent, RequestEventType, RequestStatus, User, UserRole, Request
+from config import COUNT_CACHE_MAXSIZE, COUNT_CACHE_TTL
+from .cache import MISSING, TTLCache, UserSnapshot, user_directory
+from .database import on_replica, reads_from_replica
+from .events import TimelineEntry, as_utc, event_log
+from .outbox import OutgoingMessage, add_messages, signal_new_messages
+from .partitions import ACTIVE_PARTITION_KEY, archive_partition_key
+from .stats import METRIC_ACCEPT, METRIC_COMPLETE, StatsDelta, apply_delta, transition_stats_ctes
+from .pagination import USERS_SORT_KEY, WAITING_SORT_KEY, active_sort_key, apply_keyset, archive_sort_key, ordered_page
+from sqlalchemy.orm import aliased, contains_eager, joinedload, selectinload
+from typing import Callable, Iterable
+
+# Уведомления о переходе заявки: по заявке (уже измененной, с id) возвращает сообщения,
+# которые пишутся в outbox в той же транзакции (db/outbox.py)
+RequestNotifications = Callable[[Request], Iterable[OutgoingMessage]]
+
+# --- Явные опции загрузки связей ---
+# Все связи в моделях объявлены с lazy="raise", поэтому каждая выборка
+# сама перечисляет, какие связанные объекты ей нужны.
+
+def _request_users(requester: bool = True, engineer: bool = True) -> list:
+    """
+    Опции для подгрузки клиента и/или инженера заявки.
+    joinedload для связей "многие к одному" укладывается в тот же SELECT (без доп. запросов).
+    """
+    options = []
+    if requester:
+        options.append(joinedload(Request.requester))
+    if engineer:
+        options.append(joinedload(Request.engineer))
+    return options
+
+# --- Секции таблицы заявок (db/partitions.py) ---
+# Условия на ключ секционирования: PostgreSQL читает только подходящие секции.
+# Неархивированные заявки (очередь, в работе) - только активная секция
+_IN_ACTIVE_PARTITION = Request.archived_month == ACTIVE_PARTITION_KEY
+# Архив - только секции архива (активная секция исключается)
+_IN_ARCHIVE_PARTITIONS = Request.archived_month < ACTIVE_PARTITION_KEY
+
+# --- Постраничные выборки с общим количеством ---
+# Кэш общего количества строк в списках: ключ (статус, engineer_id или None), для пользователей - _USERS_COUNT_KEY.
+# Сбрасывается явно при смене статусов заявок (create/accept/complete) и регистрации пользователей,
+# TTL ограничивает устаревание при изменениях из других процессов.
+_count_cache = TTLCache(maxsize=COUNT_CACHE_MAXSIZE, ttl=COUNT_CACHE_TTL)
+_USERS_COUNT_KEY = ("users", None)
+
+def invalidate_request_counts(*statuses: RequestStatus, engineer_id: int | None = None) -> None:
+    """Сбрасывает закэшированные количества заявок в статусах (общие и, если указан, конкретного инженера)."""
+    for status in statuses:
+        _count_cache.pop((status, None))
+        if engineer_id is not None:
+            _count_cache.pop((status, engineer_id))
+
+async def _fetch_page(session: AsyncSession, page_stmt, count_stmt, count_key, backward: bool) -> tuple[list, int]:
+    """
+    Выбирает страницу и общее количество строк за один запрос к БД.
+    Если количество есть в кэше, выполняется только выборка страницы; иначе оно
+    добавляется к ней скалярным подзапросом (вычисляется PostgreSQL один раз).
+    Отдельный COUNT выполняется только для пустой страницы.
+    count_key=None - количество не кэшируется (например, для результатов поиска).
+    Количество, прочитанное с реплики, тоже не кэшируется: реплика может отставать, а сброс кэша
+    при изменениях ее не дожидается - устаревшее значение жило бы в кэше весь TTL.
+    """
+    total_count = _count_cache.get(count_key) if count_key is not None else MISSING
+    if total_count is not MISSING:
+        result = await session.execute(page_stmt)
+        return ordered_page(list(result.scalars().all()), backward), total_count
+
+    if count_key is not None and reads_from_replica(session, page_stmt):
+        count_key = None
+    result = await session.execute(page_stmt.add_columns(count_stmt.scalar_subquery().label("total_count")))
+    rows = result.all()
+    items = [row[0] for row in rows]
+    if rows:
+        total_count = rows[0].total_count
+    else:
+        total_count = (await session.execute(count_stmt)).scalar_one_or_none() or 0
+    if count_key is not None:
+        _count_cache.set(count_key, total_count)
+    return ordered_page(items, backward), total_count
 
 # --- Функции для пользователей (get_user, set_user_role, get_all_users, etc.) ---
 
@@ -14,85 +96,152 @@ async def get_user(session: AsyncSession, user_id: int) -> User | None:
     result = await session.execute(select(User).filter(User.id == user_id))
     return result.scalar_one_or_none()
 
-async def get_users_by_role(session: AsyncSession, role: UserRole) -> list[User]:
-    """Получает список пользователей с указанной ролью."""
+async def get_user_with_requests(session: AsyncSession, user_id: int) -> User | None:
+    """
+    Получает пользователя вместе с созданными и назначенными ему заявками.
+    Тяжелый запрос (вся история пользователя) - использовать только там, где история действительно нужна.
+    """
+    stmt = (
+        select(User)
+        .where(User.id == user_id)
+        .options(
+            selectinload(User.created_requests),
+            selectinload(User.assigned_requests)
+        )
+    )
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none()
+
+async def get_user_role(session: AsyncSession, user_id: int) -> UserRole | None:
+    """
+    Возвращает роль пользователя или None, если он не зарегистрирован.
+    Сначала смотрит в справочник пользователей в памяти (db/cache.py), в БД идет только при промахе.
+    """
+    snapshot = user_directory.get(user_id)
+    if snapshot is MISSING:
+        snapshot = user_directory.put(user_id, await get_user(session, user_id))
+    return snapshot.role if snapshot else None
+
+async def get_user_snapshots(session: AsyncSession, user_ids: set[int]) -> dict[int, UserSnapshot]:
+    """Снимки пользователей по ID: из справочника в памяти, недостающие - одним запросом."""
+    snapshots = {}
+    missing = set()
+    for user_id in user_ids:
+        snapshot = user_directory.get(user_id)
+        if snapshot is MISSING:
+            missing.add(user_id)
+        elif snapshot is not None:
+            snapshots[user_id] = snapshot
+    if missing:
+        result = await session.execute(select(User).where(User.id.in_(missing)))
+        found = {user.id: user for user in result.scalars().all()}
+        for user_id in missing:
+            snapshot = user_directory.put(user_id, found.get(user_id))
+            if snapshot is not None:
+                snapshots[user_id] = snapshot
+    return snapshots
+
+async def get_users_by_role(session: AsyncSession, role: UserRole) -> list[UserSnapshot]:
+    """Получает список пользователей с указанной ролью (с кэшированием в памяти)."""
+    cached = user_directory.get_role_members(role)
+    if cached is not MISSING:
+        return list(cached)
     stmt = select(User).where(User.role == role)
     result = await session.execute(stmt)
-    return list(result.scalars().all())
+    return user_directory.put_role_members(role, list(result.scalars().all()))
 
-async def set_user_role(session: AsyncSession, user_id: int, role: UserRole) -> User | None:
-    """Устанавливает указанную роль пользователю. Возвращает обновленного пользователя или None."""
+async def set_user_role(session: AsyncSession, user_id: int, role: UserRole, actor_id: int | None = None) -> User | None:
+    """
+    Устанавливает указанную роль пользователю. Возвращает обновленного пользователя или None.
+    actor_id - кто меняет роль (для журнала событий; None - консольная команда).
+    """
     user = await get_user(session, user_id)
     if not user:
         return None
+    old_role = user.role
     user.role = role
     try:
         await session.commit()
+        event_log.record(
+            RequestEventType.ROLE_CHANGED, user_id=user_id, actor_id=actor_id,
+            details=f"{old_role.value} -> {role.value}"
+        )
         await session.refresh(user)
         return user
     except Exception as e:
         logging.error(f"Error setting role {role.value} for user {user_id}: {e}")
         await session.rollback()
         return None
+    finally:
+        user_directory.invalidate(user_id)
 
-async def get_or_create_user(session: AsyncSession, user_id: int, username: str | None, first_name: str | None, last_name: str | None) -> tuple[User, bool]:
+async def get_or_create_user(session: AsyncSession, user_id: int, username: str | None, first_name: str | None, last_name: str | None) -> tuple[UserSnapshot, bool]:
     """
-    Получает пользователя по ID или создает нового, если он не найден.
-    Возвращает кортеж: (объект User, был ли создан новый пользователь True/False).
-    Также обновляет username/first_name/last_name, если они изменились.
+    Регистрирует пользователя или обновляет его username/first_name/last_name, если они изменились.
+    Возвращает кортеж: (снимок пользователя, был ли создан новый пользователь True/False).
+    Если данные совпадают со снимком в справочнике (user_directory, живет USER_CACHE_TTL секунд),
+    к БД не обращается: повторные /start и "Отмена" ничего не стоят.
+    PostgreSQL: одна команда INSERT ... ON CONFLICT DO UPDATE ... WHERE <данные отличаются> RETURNING
+    (неизменившаяся строка не перезаписывается). SQLite: INSERT ... ON CONFLICT DO NOTHING и UPDATE.
     """
-    user = await get_user(session, user_id)
-    created = False
-    if user:
-        updated = False
-        if user.username != username: user.username = username; updated = True
-        if user.first_name != first_name: user.first_name = first_name; updated = True
-        if user.last_name != last_name: user.last_name = last_name; updated = True
-        if updated:
-            try:
-                await session.commit()
-            except Exception as e:
-                 logging.error(f"Error updating user {user_id} data: {e}")
-                 await session.rollback()
-    else:
-        user = User(id=user_id, username=username, first_name=first_name, last_name=last_name, role=UserRole.CLIENT)
-        session.add(user)
-        try:
-            await session.commit()
-            await session.refresh(user)
-            created = True
-        except Exception as e:
-            logging.error(f"Error creating user {user_id}: {e}")
-            await session.rollback()
-            user = None
-
-    return user, created
+    snapshot = user_directory.get(user_id)
+    if isinstance(snapshot, UserSnapshot) and (snapshot.username, snapshot.first_name, snapshot.last_name) == (username, first_name, last_name):
+        return snapshot, False
+
+    profile = {"username": username, "first_name": first_name, "last_name": last_name}
+    returned_columns = (User.id, User.username, User.first_name, User.last_name, User.role)
+    profile_differs = or_(*(User.__table__.c[name].is_distinct_from(value) for name, value in profile.items()))
+    dialect_name = session.bind.dialect.name
+    try:
+        if dialect_name == "postgresql":
+            stmt = postgresql.insert(User).values(id=user_id, role=UserRole.CLIENT, **profile)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.id], set_=profile, where=profile_differs
+            ).returning(*returned_columns, literal_column("xmax = 0").label("created"))
+            row = (await session.execute(stmt)).one_or_none()
+            created = bool(row and row.created)
+        elif dialect_name == "sqlite":
+            stmt = sqlite.insert(User).values(id=user_id, role=UserRole.CLIENT, **profile)
+            row = (await session.execute(stmt.on_conflict_do_nothing().returning(*returned_columns))).one_or_none()
+            created = row is not None
+            if not created:
+                stmt = update(User).where(User.id == user_id, profile_differs).values(**profile)
+                row = (await session.execute(stmt.returning(*returned_columns))).one_or_none()
+        else:
+            raise NotImplementedError(f"User upsert is not supported for dialect {dialect_name}")
+        await session.commit()
+    except Exception as e:
+        logging.error(f"Error creating or updating user {user_id}: {e}")
+        await session.rollback()
+        raise
+
+    if created:
+        _count_cache.pop(_USERS_COUNT_KEY)
+    if row is None:
+        # Данные не изменились (в справочнике снимка не было или он устарел)
+        return user_directory.put(user_id, await get_user(session, user_id)), False
+    # Сбрасываем списки по ролям (в них есть имя пользователя) и запоминаем новый снимок
+    user_directory.invalidate(user_id)
+    snapshot = UserSnapshot(
+        id=row.id, username=row.username, first_name=row.first_name, last_name=row.last_name, role=row.role
+    )
+    user_directory.put_snapshot(snapshot)
+    return snapshot, created
 
 async def get_all_users(
     session: AsyncSession,
     limit: int = 10,
-    offset: int = 0,
+    cursor: str | None = None,
+    backward: bool = False,
 ) -> tuple[list[User], int]:
     """
-    Получает список ВСЕХ пользователей с пагинацией.
+    Получает страницу списка ВСЕХ пользователей (курсорная пагинация по ID, см. db/pagination.py).
+    cursor - курсор последнего (или первого при backward=True) пользователя предыдущей страницы.
     Возвращает кортеж: (список пользователей, общее количество).
-    Сортировка по ID.
     """
-    select_stmt = (
-        select(User)
-        .order_by(User.id.asc())
-        .limit(limit)
-        .offset(offset)
-    )
-    count_stmt = select(sql_func.count(User.id))
-
-    users_result = await session.execute(select_stmt)
-    users_list = list(users_result.scalars().all())
-
-    total_count_result = await session.execute(count_stmt)
-    total_count = total_count_result.scalar_one_or_none() or 0
-
-    return users_list, total_count
+    select_stmt = on_replica(apply_keyset(select(User), USERS_SORT_KEY, cursor, backward).limit(limit))
+    count_stmt = on_replica(select(sql_func.count(User.id)))
+    return await _fetch_page(session, select_stmt, count_stmt, _USERS_COUNT_KEY, backward)
 
 # --- Функции для заявок ---
 
@@ -104,17 +253,33 @@ async def create_request(
     room: str,
     description: str,
     pc_number: str | None = None,
-    contact_phone: str | None = None
+    contact_phone: str | None = None,
+    notifications: RequestNotifications | None = None
 ) -> Request:
-    """Создает новую заявку в БД с детальной информацией."""
+    """
+    Создает новую заявку в БД с детальной информацией.
+    notifications - сообщения о новой заявке, записываемые в outbox вместе с ней.
+    """
     new_request = Request(
         requester_id=requester_id, full_name=full_name, building=building, room=room,
         description=description, pc_number=pc_number, contact_phone=contact_phone,
         status=RequestStatus.WAITING
     )
     session.add(new_request)
+    # Статистика пишется в той же транзакции; день события - по времени приложения (created_at ставит БД)
+    delta = StatsDelta()
+    delta.created(building, datetime.datetime.now(datetime.timezone.utc))
+    await apply_delta(session, delta)
+    queued = 0
+    if notifications:
+        await session.flush() # id заявки нужен для текста и кнопок уведомлений
+        queued = await add_messages(session, notifications(new_request))
     await session.commit()
+    invalidate_request_counts(RequestStatus.WAITING)
+    if queued:
+        signal_new_messages()
     await session.refresh(new_request)
+    event_log.record(RequestEventType.CREATED, request_id=new_request.id, actor_id=requester_id, at=new_request.created_at)
     return new_request
 
 async def get_request(session: AsyncSession, request_id: int) -> Request | None:
@@ -122,73 +287,139 @@ async def get_request(session: AsyncSession, request_id: int) -> Request | None:
     stmt = (
         select(Request)
         .where(Request.id == request_id)
-        .options(
-            selectinload(Request.requester),
-            selectinload(Request.engineer)
-        )
+        .options(*_request_users())
     )
     result = await session.execute(stmt)
     return result.scalar_one_or_none()
 
-async def get_new_requests(session: AsyncSession) -> list[Request]:
-    """Получает список новых заявок (статус WAITING), отсортированных по дате создания."""
-    stmt = (
-        select(Request)
-        .where(Request.status == RequestStatus.WAITING)
-        .order_by(Request.created_at.asc())
-    )
-    result = await session.execute(stmt)
-    return list(result.scalars().all())
+async def get_new_requests(
+    session: AsyncSession,
+    limit: int = 10,
+    cursor: str | None = None,
+    backward: bool = False
+) -> tuple[list[Request], int]:
+    """
+    Получает страницу очереди новых заявок (статус WAITING), сначала самые старые
+    (курсорная пагинация по (created_at, id)).
+    Возвращает кортеж: (список заявок на странице, общее количество новых заявок).
+    """
+    select_stmt = select(Request).where(_IN_ACTIVE_PARTITION, Request.status == RequestStatus.WAITING)
+    count_stmt = select(sql_func.count(Request.id)).where(_IN_ACTIVE_PARTITION, Request.status == RequestStatus.WAITING)
+
+    paginated_stmt = apply_keyset(select_stmt, WAITING_SORT_KEY, cursor, backward).limit(limit)
+    return await _fetch_page(session, paginated_stmt, count_stmt, (RequestStatus.WAITING, None), backward)
+
+async def _run_transition(session: AsyncSession, request_id: int, stmt, metric: str) -> Request | None:
+    """
+    Выполняет UPDATE перехода статуса заявки request_id вместе с обновлением статистики
+    и возвращает заявку с загруженными клиентом и инженером (None, если условие UPDATE не выполнено).
+    PostgreSQL: одна команда - UPDATE в CTE, upsert'ы статистики в CTE и выборка измененной строки
+    с JOIN пользователей. Другие СУБД (SQLite): UPDATE, выборка заявки с JOIN пользователей и upsert'ы
+    отдельными запросами (в SQLite команда с UPDATE не может быть подзапросом или CTE для выборки).
+    Транзакцию фиксирует вызывающая функция.
+    """
+    if session.bind.dialect.name == "postgresql":
+        updated = stmt.returning(*Request.__table__.c).cte("updated")
+        updated_request = aliased(Request, updated)
+        requester, engineer = aliased(User), aliased(User)
+        select_stmt = (
+            select(updated_request)
+            .outerjoin(requester, requester.id == updated_request.requester_id)
+            .outerjoin(engineer, engineer.id == updated_request.engineer_id)
+            .options(
+                contains_eager(updated_request.requester.of_type(requester)),
+                contains_eager(updated_request.engineer.of_type(engineer))
+            )
+            .add_cte(*transition_stats_ctes(updated, metric))
+            # Заявка могла быть загружена в сессию раньше - перезаписываем ее новыми значениями
+            .execution_options(populate_existing=True)
+        )
+        result = await session.execute(select_stmt)
+        return result.scalar_one_or_none()
+
+    result = await session.execute(stmt.execution_options(synchronize_session=False))
+    if result.rowcount != 1:
+        return None
+    # Выборка после UPDATE в той же транзакции видит новые значения (в том числе вычисленные БД)
+    request = (await session.execute(
+        select(Request).where(Request.id == request_id).options(*_request_users())
+        .execution_options(populate_existing=True)
+    )).scalar_one()
+    delta = StatsDelta()
+    if metric == METRIC_ACCEPT:
+        delta.accepted(request.building, request.engineer_id, request.created_at, request.accepted_at)
+    else:
+        delta.completed(request.building, request.engineer_id, request.accepted_at, request.completed_at)
+    await apply_delta(session, delta)
+    return request
 
-async def accept_request(session: AsyncSession, request_id: int, engineer_id: int) -> Request | None:
+async def accept_request(
+    session: AsyncSession, request_id: int, engineer_id: int, notifications: RequestNotifications | None = None
+) -> Request | None:
     """
     Назначает инженера на заявку и меняет статус на IN_PROGRESS.
-    Возвращает обновленную заявку или None, если заявка не найдена или уже принята.
+    Возвращает обновленную заявку (с клиентом и инженером) или None, если заявка не найдена или уже принята.
+    notifications - сообщения о принятии, записываемые в outbox в той же транзакции.
     """
     stmt = (
         update(Request)
         .where(Request.id == request_id)
-        .where(Request.status == RequestStatus.WAITING)
+        .where(_IN_ACTIVE_PARTITION, Request.status == RequestStatus.WAITING)
         .values(
             engineer_id=engineer_id,
             status=RequestStatus.IN_PROGRESS,
             accepted_at=sql_func.now(),
             last_updated_at=sql_func.now()
         )
-        .returning(Request.id)
     )
-    result = await session.execute(stmt)
-    updated_request_id = result.scalar_one_or_none()
+    request = await _run_transition(session, request_id, stmt, METRIC_ACCEPT)
 
-    if updated_request_id:
+    if request:
+        queued = await add_messages(session, notifications(request)) if notifications else 0
         await session.commit()
-        return await get_request(session, updated_request_id)
+        invalidate_request_counts(RequestStatus.WAITING, RequestStatus.IN_PROGRESS, engineer_id=engineer_id)
+        if queued:
+            signal_new_messages()
+        event_log.record(RequestEventType.ACCEPTED, request_id=request.id, actor_id=engineer_id, at=request.accepted_at)
+        return request
     else:
         await session.rollback()
         return None
 
-async def complete_request(session: AsyncSession, request_id: int, engineer_id: int) -> Request | None:
+async def complete_request(
+    session: AsyncSession, request_id: int, engineer_id: int, notifications: RequestNotifications | None = None
+) -> Request | None:
     """
     Меняет статус заявки на ARCHIVED и устанавливает время выполнения и архивации,
-    если она IN_PROGRESS и назначена на этого инженера.
-    Возвращает обновленную заявку или None, если условия не выполнены.
+    если она IN_PROGRESS и назначена на этого инженера. Строка переносится из активной
+    секции в секцию месяца архивации.
+    Возвращает обновленную заявку (с клиентом и инженером) или None, если условия не выполнены.
+    notifications - сообщения о выполнении, записываемые в outbox в той же транзакции.
     """
     stmt = (
         update(Request)
-        .where(and_(Request.id == request_id, Request.engineer_id == engineer_id, Request.status == RequestStatus.IN_PROGRESS))
+        .where(and_(
+            _IN_ACTIVE_PARTITION, Request.id == request_id,
+            Request.engineer_id == engineer_id, Request.status == RequestStatus.IN_PROGRESS
+        ))
         .values(
             status=RequestStatus.ARCHIVED,
             completed_at=sql_func.now(),
             archived_at=sql_func.now(),
+            archived_month=archive_partition_key(datetime.datetime.now(datetime.timezone.utc)),
             last_updated_at=sql_func.now()
-        ).returning(Request.id)
+        )
     )
-    result = await session.execute(stmt)
-    updated_request_id = result.scalar_one_or_none()
+    request = await _run_transition(session, request_id, stmt, METRIC_COMPLETE)
 
-    if updated_request_id:
+    if request:
+        queued = await add_messages(session, notifications(request)) if notifications else 0
         await session.commit()
-        return await get_request(session, updated_request_id)
+        invalidate_request_counts(RequestStatus.IN_PROGRESS, RequestStatus.ARCHIVED, engineer_id=engineer_id)
+        if queued:
+            signal_new_messages()
+        event_log.record(RequestEventType.COMPLETED, request_id=request.id, actor_id=engineer_id, at=request.completed_at)
+        return request
     else:
         await session.rollback()
         return None
@@ -197,92 +428,73 @@ async def complete_request(session: AsyncSession, request_id: int, engineer_id:
 async def get_all_in_progress_requests(
     session: AsyncSession,
     limit: int = 10,
-    offset: int = 0,
-    sort_by: str = 'accepted_asc'
+    sort_by: str = 'accepted_asc',
+    cursor: str | None = None,
+    backward: bool = False
 ) -> tuple[list[Request], int]:
     """
-    Получает ВСЕ заявки со статусом IN_PROGRESS с пагинацией и сортировкой.
-    Используется админом.
+    Получает страницу ВСЕХ заявок со статусом IN_PROGRESS (курсорная пагинация по (accepted_at, id)
+    или (created_at, id) в зависимости от sort_by). Используется админом.
     Возвращает кортеж: (список заявок, общее количество).
     """
     base_query = (
         select(Request)
-        .where(Request.status == RequestStatus.IN_PROGRESS)
-        .options(selectinload(Request.requester))
-        .options(selectinload(Request.engineer)) # Загружаем инженера
+        .where(_IN_ACTIVE_PARTITION, Request.status == RequestStatus.IN_PROGRESS)
+        .options(*_request_users()) # Загружаем клиента и инженера
     )
-    if sort_by == 'created_asc':
-        base_query = base_query.order_by(Request.created_at.asc())
-    elif sort_by == 'created_desc':
-         base_query = base_query.order_by(Request.created_at.desc())
-    else: 
-        base_query = base_query.order_by(Request.accepted_at.asc())
-
-    # Запрос для количества
-    count_stmt = select(sql_func.count(Request.id)).where(Request.status == RequestStatus.IN_PROGRESS)
-    total_count_res = await session.execute(count_stmt)
-    total_count = total_count_res.scalar_one_or_none() or 0
 
-    # Запрос для данных с пагинацией
-    paginated_stmt = base_query.limit(limit).offset(offset)
-    requests_res = await session.execute(paginated_stmt)
-    requests_list = list(requests_res.scalars().all())
-
-    return requests_list, total_count
+    count_stmt = on_replica(
+        select(sql_func.count(Request.id)).where(_IN_ACTIVE_PARTITION, Request.status == RequestStatus.IN_PROGRESS)
+    )
+    paginated_stmt = on_replica(apply_keyset(base_query, active_sort_key(sort_by), cursor, backward).limit(limit))
+    return await _fetch_page(session, paginated_stmt, count_stmt, (RequestStatus.IN_PROGRESS, None), backward)
 
 # --- Пагинация активных заявок (для инженера) ---
 async def get_engineer_requests(
     session: AsyncSession,
     engineer_id: int,
     limit: int = 10,
-    offset: int = 0,
-    sort_by: str = 'accepted_asc'
+    sort_by: str = 'accepted_asc',
+    cursor: str | None = None,
+    backward: bool = False
 ) -> tuple[list[Request], int]:
     """
-    Получает список заявок со статусом IN_PROGRESS, назначенных на данного инженера,
-    с пагинацией и сортировкой.
+    Получает страницу заявок со статусом IN_PROGRESS, назначенных на данного инженера
+    (курсорная пагинация, см. get_all_in_progress_requests).
     Возвращает кортеж: (список заявок на странице, общее количество таких заявок).
     """
     base_where_conditions = [
+        _IN_ACTIVE_PARTITION,
         Request.engineer_id == engineer_id,
         Request.status == RequestStatus.IN_PROGRESS
     ]
 
-    count_stmt = select(sql_func.count(Request.id)).where(and_(*base_where_conditions))
-    total_count_res = await session.execute(count_stmt)
-    total_count = total_count_res.scalar_one_or_none() or 0
-
     select_stmt = (
         select(Request)
         .where(and_(*base_where_conditions))
-        .options(selectinload(Request.requester))
+        .options(*_request_users(engineer=False))
     )
+    count_stmt = select(sql_func.count(Request.id)).where(and_(*base_where_conditions))
 
-    if sort_by == 'created_desc':
-         select_stmt = select_stmt.order_by(Request.created_at.desc())
-    else: 
-        select_stmt = select_stmt.order_by(Request.accepted_at.asc())
-
-    paginated_stmt = select_stmt.limit(limit).offset(offset)
-    requests_result = await session.execute(paginated_stmt)
-    requests_list = list(requests_result.scalars().all())
-
-    return requests_list, total_count
+    paginated_stmt = apply_keyset(select_stmt, active_sort_key(sort_by), cursor, backward).limit(limit)
+    return await _fetch_page(session, paginated_stmt, count_stmt, (RequestStatus.IN_PROGRESS, engineer_id), backward)
 
 # --- Пагинация архивных заявок (для админа и инженера) ---
 async def get_archived_requests(
     session: AsyncSession,
     limit: int = 10,
-    offset: int = 0,
     sort_by: str = 'date_desc',
-    engineer_id: int | None = None # Фильтр по инженеру (None для админа)
+    engineer_id: int | None = None, # Фильтр по инженеру (None для админа)
+    cursor: str | None = None,
+    backward: bool = False
 ) -> tuple[list[Request], int]:
     """
-    Получает список архивных заявок (статус ARCHIVED) с пагинацией и сортировкой.
+    Получает страницу архивных заявок (статус ARCHIVED) с курсорной пагинацией
+    по (archived_at, id) или id в зависимости от sort_by.
     Если указан engineer_id, фильтрует по нему.
     Возвращает кортеж: (список заявок на странице, общее количество найденных заявок).
     """
-    base_where_conditions = [Request.status == RequestStatus.ARCHIVED]
+    base_where_conditions = [_IN_ARCHIVE_PARTITIONS, Request.status == RequestStatus.ARCHIVED]
     if engineer_id is not None:
         base_where_conditions.append(Request.engineer_id == engineer_id)
 
@@ -290,31 +502,15 @@ async def get_archived_requests(
     select_stmt = (
         select(Request)
         .where(and_(*base_where_conditions))
-        .options(selectinload(Request.requester))
-        .options(selectinload(Request.engineer))
+        .options(*_request_users())
     )
 
-    # Сортировка
-    if sort_by == 'date_asc':
-        select_stmt = select_stmt.order_by(Request.archived_at.asc())
-    elif sort_by == 'id_asc':
-        select_stmt = select_stmt.order_by(Request.id.asc())
-    elif sort_by == 'id_desc':
-        select_stmt = select_stmt.order_by(Request.id.desc())
-    else: # По умолчанию 'date_desc' (сначала самые новые в архиве)
-        select_stmt = select_stmt.order_by(Request.archived_at.desc())
-
-    # Запрос для количества
-    count_stmt = select(sql_func.count(Request.id)).where(and_(*base_where_conditions))
-    total_count_result = await session.execute(count_stmt)
-    total_count = total_count_result.scalar_one_or_none() or 0
-
-    # Пагинация
-    paginated_stmt = select_stmt.limit(limit).offset(offset)
-    requests_result = await session.execute(paginated_stmt)
-    requests_list = list(requests_result.scalars().all())
+    # Запрос для количества (выполняется вместе с выборкой страницы или берется из кэша)
+    count_stmt = on_replica(select(sql_func.count(Request.id)).where(and_(*base_where_conditions)))
 
-    return requests_list, total_count
+    # Сортировка и пагинация по курсору (архив читается с реплики, если она настроена)
+    paginated_stmt = on_replica(apply_keyset(select_stmt, archive_sort_key(sort_by), cursor, backward).limit(limit))
+    return await _fetch_page(session, paginated_stmt, count_stmt, (RequestStatus.ARCHIVED, engineer_id), backward)
 
 async def get_client_requests(session: AsyncSession, requester_id: int) -> list[Request]:
     """
@@ -323,10 +519,328 @@ async def get_client_requests(session: AsyncSession, requester_id: int) -> list[
     """
     stmt = (
         select(Request)
-        .where(Request.requester_id == requester_id)
+        .where(_IN_ACTIVE_PARTITION, Request.requester_id == requester_id)
         .where(Request.status.not_in([RequestStatus.ARCHIVED, RequestStatus.CANCELED]))
         .order_by(Request.created_at.desc())
-        .options(selectinload(Request.engineer))
+        .options(*_request_users(requester=False))
+    )
+    result = await session.execute(on_replica(stmt))
+    return list(result.scalars().all())
+
+# --- Массовые операции админа ---
+# Заявки меняются UPDATE по условию, без загрузки строк в приложение. Большие наборы
+# обрабатываются порциями по BULK_CHUNK_SIZE строк (порядок по id), каждая порция - в своей
+# короткой транзакции: блокировки не держатся на весь набор сразу, а параллельные
+# accept/complete не ждут окончания всей операции.
+BULK_CHUNK_SIZE = 5000
+
+def _reassign_conditions(from_engineer_id: int) -> list:
+    return [_IN_ACTIVE_PARTITION, Request.status == RequestStatus.IN_PROGRESS, Request.engineer_id == from_engineer_id]
+
+def _building_waiting_conditions(building: str) -> list:
+    return [_IN_ACTIVE_PARTITION, Request.status == RequestStatus.WAITING, Request.building == building]
+
+def _created_before_conditions(before: datetime.datetime) -> list:
+    return [
+        _IN_ACTIVE_PARTITION,
+        Request.status.in_([RequestStatus.WAITING, RequestStatus.IN_PROGRESS]),
+        Request.created_at < before
+    ]
+
+async def _count_requests(session: AsyncSession, conditions: list) -> int:
+    result = await session.execute(select(sql_func.count(Request.id)).where(*conditions))
+    return result.scalar_one()
+
+async def _bulk_update(session: AsyncSession, conditions: list, values: dict, on_chunk, chunk_size: int) -> int:
+    """
+    Применяет values ко всем заявкам, подходящим под conditions, порциями по chunk_size.
+    Значения обязаны выводить строку из-под условий (иначе порции не закончатся).
+    on_chunk(rows) получает строки порции (id, building, engineer_id после изменения) и
+    вызывается до фиксации ее транзакции (статистика пишется в той же транзакции).
+    Он возвращает события журнала порции (аргументы event_log.record) - они добавляются в журнал
+    только после успешной фиксации, чтобы не появились события изменений, которых не было.
+    Возвращает число измененных заявок.
+    """
+    total = 0
+    while True:
+        chunk_ids = select(Request.id).where(*conditions).order_by(Request.id).limit(chunk_size)
+        # Условия повторяются во внешнем UPDATE: строка, измененная параллельно после выборки id, пропускается
+        stmt = (
+            update(Request)
+            .where(Request.id.in_(chunk_ids), *conditions)
+            .values(**values)
+            .returning(Request.id, Request.building, Request.engineer_id)
+            .execution_options(synchronize_session=False)
+        )
+        rows = (await session.execute(stmt)).all()
+        if not rows:
+            await session.rollback()
+            return total
+        events = await on_chunk(rows)
+        await session.commit()
+        total += len(rows)
+        for event in events:
+            event_log.record(**event)
+        # События порции пишутся сразу, чтобы большой набор не переполнил буфер журнала
+        await event_log.flush()
+        logging.info(f"Bulk update: {total} requests updated so far.")
+
+async def get_in_progress_engineers(session: AsyncSession) -> list[tuple[int, int]]:
+    """
+    Инженеры с заявками в работе и число таких заявок, по убыванию количества
+    (включая пользователей, у которых роль инженера уже снята).
+    """
+    stmt = (
+        select(Request.engineer_id, sql_func.count(Request.id).label("requests_count"))
+        .where(_IN_ACTIVE_PARTITION, Request.status == RequestStatus.IN_PROGRESS, Request.engineer_id.is_not(None))
+        .group_by(Request.engineer_id)
+        .order_by(literal_column("requests_count").desc(), Request.engineer_id)
     )
     result = await session.execute(stmt)
-    return list(result.scalars().all())
\ No newline at end of file
+    return [(engineer_id, count) for engineer_id, count in result]
+
+async def count_reassignable_requests(session: AsyncSession, from_engineer_id: int) -> int:
+    """Предпросмотр bulk_reassign_requests: число заявок в работе у инженера."""
+    return await _count_requests(session, _reassign_conditions(from_engineer_id))
+
+async def bulk_reassign_requests(
+    session: AsyncSession,
+    from_engineer_id: int,
+    to_engineer_id: int,
+    actor_id: int,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> int:
+    """Передает все заявки в работе (IN_PROGRESS) от одного инженера другому. Возвращает их число."""
+    if from_engineer_id == to_engineer_id:
+        return 0
+
+    async def on_chunk(rows) -> list[dict]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        details = f"{from_engineer_id} -> {to_engineer_id}"
+        return [
+            dict(event_type=RequestEventType.REASSIGNED, request_id=row.id, actor_id=actor_id, details=details, at=now)
+            for row in rows
+        ]
+
+    count = await _bulk_update(
+        session, _reassign_conditions(from_engineer_id),
+        {"engineer_id": to_engineer_id, "last_updated_at": sql_func.now()},
+        on_chunk, chunk_size
+    )
+    invalidate_request_counts(RequestStatus.IN_PROGRESS, engineer_id=from_engineer_id)
+    invalidate_request_counts(RequestStatus.IN_PROGRESS, engineer_id=to_engineer_id)
+    return count
+
+async def get_waiting_buildings(session: AsyncSession, limit: int = 20) -> list[tuple[str, int]]:
+    """Корпуса с новыми заявками (WAITING) и их количество, по убыванию количества."""
+    stmt = (
+        select(Request.building, sql_func.count(Request.id).label("requests_count"))
+        .where(_IN_ACTIVE_PARTITION, Request.status == RequestStatus.WAITING)
+        .group_by(Request.building)
+        .order_by(literal_column("requests_count").desc(), Request.building)
+        .limit(limit)
+    )
+    result = await session.execute(stmt)
+    return [(building, count) for building, count in result]
+
+async def count_waiting_building_requests(session: AsyncSession, building: str) -> int:
+    """Предпросмотр bulk_cancel_building_requests: число новых заявок корпуса."""
+    return await _count_requests(session, _building_waiting_conditions(building))
+
+async def bulk_cancel_building_requests(
+    session: AsyncSession,
+    building: str,
+    actor_id: int,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> int:
+    """
+    Отменяет все новые заявки (WAITING) корпуса (точное совпадение названия).
+    Отмененные заявки переносятся из активной секции в секцию текущего месяца.
+    Возвращает число отмененных заявок.
+    """
+    async def on_chunk(rows) -> list[dict]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        delta = StatsDelta()
+        for row in rows:
+            delta.canceled(row.building, row.engineer_id, now)
+        await apply_delta(session, delta)
+        return [
+            dict(event_type=RequestEventType.CANCELED, request_id=row.id, actor_id=actor_id, at=now)
+            for row in rows
+        ]
+
+    count = await _bulk_update(
+        session, _building_waiting_conditions(building),
+        {
+            "status": RequestStatus.CANCELED,
+            "archived_at": sql_func.now(),
+            "archived_month": archive_partition_key(datetime.datetime.now(datetime.timezone.utc)),
+            "last_updated_at": sql_func.now(),
+        },
+        on_chunk, chunk_size
+    )
+    invalidate_request_counts(RequestStatus.WAITING)
+    return count
+
+async def count_requests_created_before(session: AsyncSession, before: datetime.datetime) -> int:
+    """Предпросмотр bulk_archive_requests_created_before: число незавершенных заявок, созданных до before."""
+    return await _count_requests(session, _created_before_conditions(before))
+
+async def bulk_archive_requests_created_before(
+    session: AsyncSession,
+    before: datetime.datetime,
+    actor_id: int,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> int:
+    """
+    Переводит в архив (ARCHIVED, без времени выполнения) все новые и находящиеся в работе
+    заявки, созданные раньше before. Возвращает число архивированных заявок.
+    """
+    engineer_ids: set[int] = set()
+
+    async def on_chunk(rows) -> list[dict]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        engineer_ids.update(row.engineer_id for row in rows if row.engineer_id is not None)
+        return [
+            dict(event_type=RequestEventType.ARCHIVED, request_id=row.id, actor_id=actor_id, at=now)
+            for row in rows
+        ]
+
+    count = await _bulk_update(
+        session, _created_before_conditions(before),
+        {
+            "status": RequestStatus.ARCHIVED,
+            "archived_at": sql_func.now(),
+            "archived_month": archive_partition_key(datetime.datetime.now(datetime.timezone.utc)),
+            "last_updated_at": sql_func.now(),
+        },
+        on_chunk, chunk_size
+    )
+    invalidate_request_counts(RequestStatus.WAITING, RequestStatus.IN_PROGRESS, RequestStatus.ARCHIVED)
+    for engineer_id in engineer_ids:
+        invalidate_request_counts(RequestStatus.IN_PROGRESS, RequestStatus.ARCHIVED, engineer_id=engineer_id)
+    return count
+
+# --- Журнал событий заявок ---
+# Ограничение длины хронологии в карточке заявки
+TIMELINE_LIMIT = 50
+
+async def get_request_timeline(session: AsyncSession, request_id: int) -> list[TimelineEntry]:
+    """
+    Хронология событий заявки (по индексу (request_id, created_at, id)), сначала ранние.
+    Дополняется событиями из буфера, которые еще не записаны в БД.
+    """
+    stmt = (
+        select(RequestEvent.event_type, RequestEvent.actor_id, RequestEvent.details, RequestEvent.created_at)
+        .where(RequestEvent.request_id == request_id)
+        .order_by(RequestEvent.created_at, RequestEvent.id)
+        .limit(TIMELINE_LIMIT)
+    )
+    result = await session.execute(stmt)
+    entries = [
+        TimelineEntry(RequestEventType(event_type), actor_id, details, as_utc(created_at))
+        for event_type, actor_id, details, created_at in result
+    ]
+    # Пачка, зафиксированная между чтением и этой проверкой, может оказаться и в выборке, и в буфере
+    seen = set(entries)
+    entries.extend(entry for entry in event_log.pending_for_request(request_id) if entry not in seen)
+    entries.sort(key=lambda entry: entry.created_at)
+    return entries[:TIMELINE_LIMIT]
+
+# --- Поиск заявок ---
+# Словарь полнотекстового поиска: должен совпадать с выражением колонки search_vector (миграция m0003)
+SEARCH_TS_CONFIG = "russian"
+# Поиск возвращает не больше стольких лучших совпадений (ранжирование требует оценить все совпадения,
+# поэтому выдача ограничена, а страницы внутри нее выбираются через OFFSET)
+SEARCH_RESULTS_LIMIT = 200
+
+# Генерируемая колонка есть только в БД (миграция m0003), в модели Request ее нет
+_search_vector = literal_column("requests.search_vector", type_=TSVECTOR)
+
+# SQLite: индекс FTS5 по описанию (миграция m0008)
+_requests_fts = table("requests_fts", sql_column("rowid"), sql_column("rank"))
+# Элемент запроса: "фраза" или слово, с необязательным минусом (исключение)
+_FTS_TERM = re.compile(r'(-?)"([^"]*)"|(-?)(\S+)')
+
+def _fts5_query(text: str) -> str | None:
+    """
+    Запрос FTS5 по правилам websearch_to_tsquery: слова через И, "фраза" в кавычках, -слово исключается.
+    Слова ищутся по префиксу (словоформы FTS5 не учитывает). None - в запросе нет искомых слов.
+    """
+    include, exclude = [], []
+    for match in _FTS_TERM.finditer(text):
+        if match.group(2) is not None:
+            negative, term, suffix = match.group(1), match.group(2), ""
+        else:
+            negative, term, suffix = match.group(3), match.group(4), "*"
+        if not any(char.isalnum() for char in term):
+            continue
+        quoted = '"' + term.replace('"', '""') + '"' + suffix
+        (exclude if negative else include).append(quoted)
+    if not include:
+        return None
+    return " ".join(include) + "".join(f" NOT {term}" for term in exclude)
+
+def _prefix_pattern(value: str) -> str:
+    """Шаблон LIKE "начинается с value" (без учета регистра) с экранированием спецсимволов."""
+    escaped = value.lower().replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"{escaped}%"
+
+async def search_requests(
+    session: AsyncSession,
+    text: str | None = None,
+    building: str | None = None,
+    room: str | None = None,
+    pc_number: str | None = None,
+    contact_phone: str | None = None,
+    limit: int = 10,
+    offset: int = 0
+) -> tuple[list[Request], int]:
+    """
+    Ищет заявки (в любом статусе): полнотекстовый поиск по описанию (GIN-индекс по search_vector,
+    в SQLite - индекс FTS5) и фильтры по началу значения корпуса, кабинета, ПК/инв. номера и телефона.
+    С текстом запроса результаты ранжируются по релевантности, без него - сначала новые.
+    Возвращает кортеж: (заявки на странице, количество найденных, но не больше SEARCH_RESULTS_LIMIT + 1 -
+    значение больше лимита означает, что показаны не все совпадения).
+    """
+    conditions = []
+    order_by = [Request.created_at.desc(), Request.id.desc()]
+    if text and session.bind.dialect.name == "sqlite":
+        fts_query = _fts5_query(text)
+        if fts_query is None:
+            # Как и websearch_to_tsquery без искомых слов в PostgreSQL, такой запрос ничего не находит
+            return [], 0
+        # Совпадения из индекса FTS5 соединяются с заявками по id; rank (bm25) меньше - релевантнее
+        fts_matches = (
+            select(_requests_fts.c.rowid.label("request_id"), _requests_fts.c.rank)
+            .where(literal_column("requests_fts").op("MATCH")(fts_query))
+            .subquery()
+        )
+        conditions.append(Request.id == fts_matches.c.request_id)
+        order_by = [fts_matches.c.rank, Request.id.desc()]
+    elif text:
+        ts_query = sql_func.websearch_to_tsquery(SEARCH_TS_CONFIG, text)
+        conditions.append(_search_vector.op("@@")(ts_query))
+        order_by = [sql_func.ts_rank_cd(_search_vector, ts_query).desc(), Request.id.desc()]
+    for column, value in (
+        (Request.building, building), (Request.room, room),
+        (Request.pc_number, pc_number), (Request.contact_phone, contact_phone)
+    ):
+        if value:
+            conditions.append(sql_func.lower(column).like(_prefix_pattern(value), escape="/"))
+
+    # Количество считается только в пределах лимита выдачи (не больше SEARCH_RESULTS_LIMIT + 1 строк)
+    matches = select(Request.id).where(*conditions).limit(SEARCH_RESULTS_LIMIT + 1).subquery()
+    count_stmt = on_replica(select(sql_func.count()).select_from(matches))
+    if offset >= SEARCH_RESULTS_LIMIT:
+        return [], (await session.execute(count_stmt)).scalar_one()
+
+    page_stmt = on_replica(
+        select(Request)
+        .where(*conditions)
+        .options(*_request_users())
+        .order_by(*order_by)
+        .offset(offset)
+        .limit(min(limit, SEARCH_RESULTS_LIMIT - offset))
+    )
+    return await _fetch_page(session, page_stmt, count_stmt, None, backward=False)
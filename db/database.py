@@ -1,20 +1,188 @@
 # db/database.py
+import time
+
+from sqlalchemy import event, exc, make_url
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import functions
+from sqlalchemy.sql.dml import UpdateBase
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
 from sqlalchemy.ext.asyncio import AsyncAttrs
-from config import DATABASE_URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+
+import metrics
+from config import (
+    DATABASE_URL, DATABASE_REPLICA_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE, DB_INSTRUMENTATION
+)
+from .instrumentation import instrument_engine
+
+# Метрики пула соединений
+POOL_CHECKOUT_WAIT = metrics.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a connection from the pool"
+)
+POOL_CHECKOUT_TIMEOUTS = metrics.counter(
+    "db_pool_checkout_timeouts_total", "Connection checkouts that failed with a pool timeout"
+)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, замеряющий время получения соединения (ожидание свободного или открытие нового)."""
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started_at)
+
+
+# Настройки соединений встроенной SQLite (выполняются при открытии каждого соединения):
+# WAL - чтение не блокируется записью; synchronous=NORMAL - в режиме WAL без риска повредить БД,
+# теряются только последние транзакции при отключении питания; busy_timeout - ожидание блокировки
+# записи другим соединением вместо ошибки "database is locked"
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", "5000"),
+    ("foreign_keys", "ON"),
+    ("cache_size", "-65536"),        # 64 МБ кэша страниц
+    ("temp_store", "MEMORY"),
+    ("mmap_size", "268435456"),      # 256 МБ
+)
+
+# Формат, в котором SQLAlchemy пишет datetime в SQLite (текстом, всегда с микросекундами).
+# now() и умолчания колонок (server_default=func.now()) должны давать тот же формат: время
+# в SQLite сравнивается как строка, и CURRENT_TIMESTAMP ('YYYY-MM-DD HH:MM:SS') не сравним
+# со значением из курсора пагинации или фильтра ('YYYY-MM-DD HH:MM:SS.ffffff')
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+@compiles(functions.now, "sqlite")
+def _compile_sqlite_now(element, compiler, **kw):
+    return SQLITE_NOW
+
+def _unicode_lower(value):
+    return value.lower() if isinstance(value, str) else value
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+def _on_sqlite_connect(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+    # Встроенная lower() SQLite меняет регистр только латиницы - фильтры поиска по префиксу
+    # (lower(колонка) LIKE ...) должны работать и для кириллицы
+    dbapi_connection.create_function("lower", 1, _unicode_lower, deterministic=True)
+
+def _create_sqlite_engine(engine_url):
+    if engine_url.database in (None, "", ":memory:"):
+        # БД в памяти существует, пока открыто соединение - все сессии работают через одно
+        sqlite_engine = create_async_engine(engine_url, echo=False, poolclass=StaticPool)
+    else:
+        sqlite_engine = create_async_engine(
+            engine_url,
+            echo=False,
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    event.listen(sqlite_engine.sync_engine, "connect", _on_sqlite_connect)
+    return sqlite_engine
+
+def create_db_engine(url: str):
+    """Движок с настройками пула и соединений приложения (используется и бенчмарками)."""
+    engine_url = make_url(url)
+    if engine_url.get_backend_name() == "sqlite":
+        return _create_sqlite_engine(engine_url)
+    # Размер кэша подготовленных выражений asyncpg задается параметром URL диалекта
+    engine_url = engine_url.update_query_dict(
+        {"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)}
+    )
+    return create_async_engine(
+        engine_url,
+        echo=False,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+engine = create_db_engine(DATABASE_URL)
+# Реплика только для чтения (None, если не настроена)
+replica_engine = create_db_engine(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+# Учет запросов по функциям db/ и хендлерам, журнал медленных запросов (db/instrumentation.py)
+if DB_INSTRUMENTATION:
+    instrument_engine(engine)
+    if replica_engine is not None:
+        instrument_engine(replica_engine)
+
+# Текущее состояние пула читается при каждом запросе метрик (у пула SQLite в памяти размера нет)
+if isinstance(engine.pool, InstrumentedAsyncQueuePool):
+    metrics.gauge("db_pool_size", "Configured number of persistent pool connections", lambda: engine.pool.size())
+    metrics.gauge("db_pool_checked_out", "Connections currently in use by handlers", lambda: engine.pool.checkedout())
+    metrics.gauge("db_pool_checked_in", "Idle connections available in the pool", lambda: engine.pool.checkedin())
+    metrics.gauge("db_pool_overflow", "Connections opened above pool_size (negative while below)", lambda: engine.pool.overflow())
+if replica_engine is not None:
+    metrics.gauge(
+        "db_replica_pool_checked_out", "Read replica connections currently in use",
+        lambda: replica_engine.pool.checkedout()
+    )
 
 # Создаем базовый класс для декларативных моделей с поддержкой AsyncAttrs
 # AsyncAttrs нужен для удобной работы со связанными объектами в async коде
 class Base(AsyncAttrs, DeclarativeBase):
     pass
 
+# --- Маршрутизация чтения на реплику ---
+# Опция выполнения, которой crud помечает запросы, допускающие чтение с реплики
+REPLICA_OPTION = "replica"
+# Ключ в session.info: сессия уже писала в основную БД, все дальнейшие запросы - туда же
+_PRIMARY_ONLY = "primary_only"
+
+def on_replica(stmt):
+    """Помечает SELECT как допускающий чтение с реплики (отставание реплики для него приемлемо)."""
+    return stmt.execution_options(**{REPLICA_OPTION: True})
+
+
+class RoutingSession(Session):
+    """
+    Сессия, отправляющая помеченные on_replica() запросы на реплику.
+    Все остальное (записи и обычные чтения) идет в основную БД. После первой записи
+    (flush или UPDATE/INSERT/DELETE) сессия до конца читает только с основной БД,
+    чтобы чтение сразу после записи видело собственные изменения.
+    """
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if replica_engine is not None and clause is not None:
+            if isinstance(clause, UpdateBase):
+                self.info[_PRIMARY_ONLY] = True
+            elif (
+                not self.info.get(_PRIMARY_ONLY)
+                and not self._flushing
+                and clause.get_execution_options().get(REPLICA_OPTION)
+            ):
+                return replica_engine.sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def reads_from_replica(session: AsyncSession, stmt) -> bool:
+    """Будет ли stmt выполнен сессией на реплике (см. RoutingSession.get_bind)."""
+    return replica_engine is not None and session.sync_session.get_bind(clause=stmt) is replica_engine.sync_engine
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_primary_only(session, flush_context):
+    session.info[_PRIMARY_ONLY] = True
+
+
 # Создаем фабрику для асинхронных сессий
 # expire_on_commit=False предотвращает истечение срока действия объектов после коммита
 AsyncSessionFactory = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
     expire_on_commit=False
 )
@@ -0,0 +1,162 @@
+# db/events.py
+"""
+Журнал событий заявок (таблица request_events) с пакетной записью.
+
+Хендлеры только добавляют событие в буфер в памяти (event_log.record) - без обращения к БД.
+Фоновая задача (event_log.start) пишет буфер одним многострочным INSERT раз в EVENT_FLUSH_INTERVAL
+секунд или сразу, как только накопилось EVENT_BATCH_SIZE событий. При ошибке записи пачка
+возвращается в буфер и пишется при следующей попытке.
+
+Запись не транзакционна с изменением заявки: события, не записанные к моменту аварийного
+завершения процесса, теряются. При штатной остановке буфер дописывается (event_log.stop).
+"""
+import asyncio
+import datetime
+import logging
+from typing import NamedTuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import metrics
+from config import EVENT_BATCH_SIZE, EVENT_BUFFER_MAXSIZE, EVENT_FLUSH_INTERVAL
+from .models import RequestEvent, RequestEventType
+
+EVENTS_WRITTEN = metrics.counter("request_events_written_total", "Request events written to the database")
+EVENTS_DROPPED = metrics.counter(
+    "request_events_dropped_total", "Request events dropped because the buffer was full"
+)
+
+
+def as_utc(moment: datetime.datetime) -> datetime.datetime:
+    """Время с часовым поясом UTC (SQLite возвращает время без пояса - оно хранится в UTC)."""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.astimezone(datetime.timezone.utc)
+
+
+class TimelineEntry(NamedTuple):
+    """Событие в хронологии заявки (из БД или еще не записанное из буфера)."""
+    event_type: RequestEventType
+    actor_id: int | None
+    details: str | None
+    created_at: datetime.datetime
+
+
+class EventLog:
+    """
+    Буфер событий с фоновой пакетной записью. Рассчитан на один event loop.
+    Записи буфера (фоновая задача и явные flush, например из crud._bulk_update) выполняются по очереди.
+    """
+    def __init__(self, batch_size: int, flush_interval: float, maxsize: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.maxsize = maxsize
+        self._pending: list[dict] = []
+        # Пачка, которая пишется прямо сейчас (уже не в буфере, но еще не зафиксирована)
+        self._in_flight: list[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._batch_ready = asyncio.Event()
+        self._engine: AsyncEngine | None = None
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(
+        self,
+        event_type: RequestEventType,
+        request_id: int | None = None,
+        actor_id: int | None = None,
+        user_id: int | None = None,
+        details: str | None = None,
+        at: datetime.datetime | None = None
+    ) -> None:
+        """Добавляет событие в буфер. at - время события (по умолчанию - текущее)."""
+        self._pending.append({
+            "request_id": request_id,
+            "user_id": user_id,
+            "actor_id": actor_id,
+            "event_type": event_type.value,
+            "details": details,
+            "created_at": as_utc(at) if at else datetime.datetime.now(datetime.timezone.utc),
+        })
+        self._trim()
+        if len(self._pending) >= self.batch_size:
+            self._batch_ready.set()
+
+    def _trim(self) -> None:
+        overflow = len(self._pending) - self.maxsize
+        if overflow > 0:
+            del self._pending[:overflow]
+            EVENTS_DROPPED.inc(overflow)
+            logging.warning(f"Request event buffer is full, dropped {overflow} oldest events.")
+
+    def pending_for_request(self, request_id: int) -> list[TimelineEntry]:
+        """Еще не записанные события заявки (чтобы хронология сразу показывала последние действия)."""
+        return [
+            TimelineEntry(RequestEventType(row["event_type"]), row["actor_id"], row["details"], row["created_at"])
+            for row in self._in_flight + self._pending if row["request_id"] == request_id
+        ]
+
+    async def flush(self, engine: AsyncEngine | None = None) -> int:
+        """Записывает буфер пачками по batch_size. Возвращает число записанных событий."""
+        engine = engine or self._engine
+        if engine is None:
+            return 0
+        # Одна запись за раз: у параллельной был бы свой in-flight, и события выпадали бы из хронологии
+        # (pending_for_request), а пачки писались бы не в порядке событий
+        async with self._flush_lock:
+            return await self._flush(engine)
+
+    async def _flush(self, engine: AsyncEngine) -> int:
+        written = 0
+        while self._pending:
+            # Пачка забирается из буфера до await: новые события копятся отдельно
+            batch = self._in_flight = self._pending[:self.batch_size]
+            del self._pending[:len(batch)]
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(insert(RequestEvent), batch)
+            except asyncio.CancelledError:
+                self._pending[:0] = batch
+                raise
+            except Exception as e:
+                logging.error(f"Failed to write {len(batch)} request events: {e}", exc_info=True)
+                self._pending[:0] = batch
+                self._trim()
+                break
+            finally:
+                self._in_flight = []
+            written += len(batch)
+            EVENTS_WRITTEN.inc(len(batch))
+        return written
+
+    def start(self, engine: AsyncEngine) -> None:
+        """Запускает фоновую запись в БД engine."""
+        self._engine = engine
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую запись и дописывает буфер (текущая запись не прерывается)."""
+        if self._task:
+            self._stopping = True
+            self._batch_ready.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+
+event_log = EventLog(batch_size=EVENT_BATCH_SIZE, flush_interval=EVENT_FLUSH_INTERVAL, maxsize=EVENT_BUFFER_MAXSIZE)
+metrics.gauge("request_events_pending", "Request events buffered in memory, not yet written", lambda: len(event_log))
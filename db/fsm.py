@@ -0,0 +1,69 @@
+# db/fsm.py
+"""
+Таблица состояний FSM диалогов fsm_states (хранилище aiogram - bot/fsm_storage.py).
+
+Одна строка на ключ FSM: имя состояния и данные формы в компактном JSON. Запись - одна команда
+INSERT ... ON CONFLICT DO UPDATE (или DELETE, если состояние и данные пусты), каждая запись продлевает
+expires_at. Просроченные строки не читаются и периодически удаляются (delete_expired).
+"""
+import datetime
+import json
+from typing import Any
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .models import FsmState
+
+_fsm_states = FsmState.__table__
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def dump_data(data: dict[str, Any]) -> str | None:
+    """Данные FSM в компактном JSON (None для пустых)."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")) if data else None
+
+def load_data(raw: str | None) -> dict[str, Any]:
+    return json.loads(raw) if raw else {}
+
+
+async def read_state(engine: AsyncEngine, key: str) -> tuple[str | None, dict[str, Any]]:
+    """Состояние и данные по ключу ((None, {}), если записи нет или она просрочена)."""
+    stmt = select(_fsm_states.c.state, _fsm_states.c.data).where(
+        _fsm_states.c.key == key, _fsm_states.c.expires_at > _utcnow()
+    )
+    async with engine.connect() as conn:
+        row = (await conn.execute(stmt)).one_or_none()
+    if row is None:
+        return None, {}
+    return row.state, load_data(row.data)
+
+async def write_state(engine: AsyncEngine, key: str, state: str | None, data: dict[str, Any], ttl: float) -> None:
+    """Записывает состояние и данные одной командой (пустые - удаляет запись)."""
+    async with engine.begin() as conn:
+        if state is None and not data:
+            await conn.execute(delete(_fsm_states).where(_fsm_states.c.key == key))
+            return
+        values = {
+            "state": state, "data": dump_data(data),
+            "expires_at": _utcnow() + datetime.timedelta(seconds=ttl),
+        }
+        dialect_name = engine.dialect.name
+        if dialect_name == "postgresql":
+            stmt = postgresql.insert(_fsm_states)
+        elif dialect_name == "sqlite":
+            stmt = sqlite.insert(_fsm_states)
+        else:
+            raise NotImplementedError(f"FSM state upsert is not supported for dialect {dialect_name}")
+        await conn.execute(
+            stmt.values(key=key, **values).on_conflict_do_update(index_elements=[_fsm_states.c.key], set_=values)
+        )
+
+async def delete_expired(engine: AsyncEngine) -> int:
+    """Удаляет просроченные состояния (брошенные формы). Возвращает число удаленных."""
+    async with engine.begin() as conn:
+        result = await conn.execute(delete(_fsm_states).where(_fsm_states.c.expires_at <= _utcnow()))
+    return result.rowcount
@@ -0,0 +1,172 @@
+# db/instrumentation.py
+"""
+Учет запросов к БД: каждый запрос приписывается вызвавшей его функции модулей db/
+(crud, stats, events, ...) и хендлеру бота (bot/handlers, bot/filters), для которого он выполнен.
+
+Хуки SQLAlchemy (before/after_cursor_execute) замеряют время запроса и число строк и пишут:
+  * метрики по функциям и хендлерам (metrics.py);
+  * журнал медленных запросов (дольше SLOW_QUERY_THRESHOLD секунд);
+  * итоги апдейта (track_update в DbSessionMiddleware): число запросов на апдейт и предупреждение
+    о вероятном N+1, если обработка апдейта выполнила больше N_PLUS_ONE_THRESHOLD запросов.
+
+Вызывающие функции определяются по стеку. Асинхронный API SQLAlchemy выполняет запрос в отдельном
+greenlet, поэтому после кадров SQLAlchemy обход продолжается по стеку родительского greenlet
+(корутины хендлера и crud).
+"""
+import contextvars
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import greenlet
+from sqlalchemy import event
+
+import metrics
+from config import N_PLUS_ONE_THRESHOLD, SLOW_QUERY_THRESHOLD
+
+STATEMENT_DURATION = metrics.histogram("db_statement_duration_seconds", "Database statement execution time")
+STATEMENTS = metrics.counter("db_statements_total", "Database statements by calling db function", label="function")
+STATEMENT_SECONDS = metrics.counter(
+    "db_statement_seconds_total", "Database statement time by calling db function", label="function"
+)
+STATEMENT_ROWS = metrics.counter(
+    "db_statement_rows_total", "Rows returned or affected by calling db function", label="function"
+)
+HANDLER_STATEMENTS = metrics.counter("db_handler_statements_total", "Database statements by bot handler", label="handler")
+SLOW_QUERIES = metrics.counter(
+    "db_slow_queries_total", "Statements slower than SLOW_QUERY_THRESHOLD by calling db function", label="function"
+)
+STATEMENTS_PER_UPDATE = metrics.histogram(
+    "db_statements_per_update", "Database statements issued while processing one update",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+)
+N_PLUS_ONE_UPDATES = metrics.counter(
+    "db_n_plus_one_updates_total", "Updates that issued more than N_PLUS_ONE_THRESHOLD statements", label="handler"
+)
+
+# Запрос вне функций db/ или вне хендлера (фоновые задачи, консольные команды)
+UNKNOWN = "-"
+_DB_PREFIX = "db."
+_CRUD_MODULE = "db.crud"
+_IGNORED_DB_MODULES = ("db.database", "db.instrumentation")
+_HANDLER_PREFIXES = ("bot.handlers.", "bot.filters.")
+# Длина текста запроса в журнале медленных запросов
+_STATEMENT_LOG_LIMIT = 1000
+
+
+class UpdateQueryStats:
+    """Запросы, выполненные при обработке одного апдейта."""
+    __slots__ = ("statements", "seconds", "rows", "handler", "functions")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.handler = UNKNOWN
+        # Функция db/ -> число запросов
+        self.functions: dict[str, int] = {}
+
+_current_update: contextvars.ContextVar[UpdateQueryStats | None] = contextvars.ContextVar(
+    "db_update_query_stats", default=None
+)
+
+
+def _calling_frames() -> Iterator:
+    """Кадры стека от текущего к внешним, включая стеки родительских greenlet."""
+    frame = sys._getframe(1)
+    current = greenlet.getcurrent()
+    while True:
+        while frame is not None:
+            yield frame
+            frame = frame.f_back
+        current = current.parent
+        if current is None:
+            return
+        frame = current.gr_frame
+
+def _callers() -> tuple[str, str]:
+    """
+    (функция db/, хендлер) текущего запроса. Функция - внешняя из db.crud (та, что вызвал хендлер),
+    иначе ближайшая из других модулей db/; хендлер - внешняя функция из bot/handlers или bot/filters.
+    """
+    crud_function = db_function = handler = None
+    for frame in _calling_frames():
+        module = frame.f_globals.get("__name__", "")
+        if module == _CRUD_MODULE:
+            crud_function = f"crud.{frame.f_code.co_name}"
+        elif module.startswith(_DB_PREFIX) and module not in _IGNORED_DB_MODULES:
+            if db_function is None:
+                db_function = f"{module[len(_DB_PREFIX):]}.{frame.f_code.co_name}"
+        elif module.startswith(_HANDLER_PREFIXES):
+            handler = f"{module.rsplit('.', 1)[-1]}.{frame.f_code.co_name}"
+    return crud_function or db_function or UNKNOWN, handler or UNKNOWN
+
+def _row_count(cursor) -> int:
+    """Строки результата SELECT (адаптеры asyncpg и aiosqlite получают результат целиком) или измененные строки."""
+    if cursor.description is not None:
+        rows = getattr(cursor, "_rows", None)
+        return len(rows) if rows is not None else 0
+    return max(cursor.rowcount, 0)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._instrumentation_started_at = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._instrumentation_started_at
+    rows = _row_count(cursor)
+    function, handler = _callers()
+
+    STATEMENT_DURATION.observe(elapsed)
+    STATEMENTS.inc(label_value=function)
+    STATEMENT_SECONDS.inc(elapsed, label_value=function)
+    STATEMENT_ROWS.inc(rows, label_value=function)
+    HANDLER_STATEMENTS.inc(label_value=handler)
+
+    update_stats = _current_update.get()
+    if update_stats is not None:
+        update_stats.statements += 1
+        update_stats.seconds += elapsed
+        update_stats.rows += rows
+        update_stats.functions[function] = update_stats.functions.get(function, 0) + 1
+        if update_stats.handler == UNKNOWN:
+            update_stats.handler = handler
+
+    if SLOW_QUERY_THRESHOLD and elapsed >= SLOW_QUERY_THRESHOLD:
+        SLOW_QUERIES.inc(label_value=function)
+        text = " ".join(statement.split())
+        if len(text) > _STATEMENT_LOG_LIMIT:
+            text = text[:_STATEMENT_LOG_LIMIT] + "..."
+        logging.warning(f"Slow query {elapsed:.3f}s in {function} (handler {handler}, rows {rows}): {text}")
+
+
+def instrument_engine(engine) -> None:
+    """Подключает учет запросов к движку (AsyncEngine или синхронному Engine)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _finish_update(stats: UpdateQueryStats) -> None:
+    STATEMENTS_PER_UPDATE.observe(stats.statements)
+    if N_PLUS_ONE_THRESHOLD and stats.statements > N_PLUS_ONE_THRESHOLD:
+        N_PLUS_ONE_UPDATES.inc(label_value=stats.handler)
+        top = sorted(stats.functions.items(), key=lambda item: item[1], reverse=True)[:5]
+        top_text = ", ".join(f"{function} x{count}" for function, count in top)
+        logging.warning(
+            f"Possible N+1 in handler {stats.handler}: {stats.statements} statements "
+            f"({stats.seconds:.3f}s, {stats.rows} rows) for one update; top: {top_text}"
+        )
+
+@contextmanager
+def track_update() -> Iterator[UpdateQueryStats]:
+    """Считает запросы, выполненные внутри блока (обработка одного апдейта)."""
+    stats = UpdateQueryStats()
+    token = _current_update.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_update.reset(token)
+        _finish_update(stats)
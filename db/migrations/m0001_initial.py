@@ -0,0 +1,49 @@
+# db/migrations/m0001_initial.py
+"""
+Исходная схема: таблицы users и requests в том виде, в котором их создавал create_all.
+Таблицы описаны здесь же (а не берутся из db/models.py), чтобы миграция не менялась вместе с моделями.
+Для баз, созданных старыми версиями бота через create_all, ничего не делает (checkfirst).
+"""
+from sqlalchemy import (BigInteger, Column, DateTime, Enum, ForeignKey, Integer, MetaData,
+                        String, Table, Text, func)
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", BigInteger, primary_key=True, index=True, autoincrement=False),
+    Column("username", String, nullable=True),
+    Column("first_name", String, nullable=True),
+    Column("last_name", String, nullable=True),
+    Column("role", Enum("CLIENT", "ENGINEER", "ADMIN", name="user_role_enum"), nullable=False),
+    Column("phone_number", String, nullable=True),
+    Column("registered_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "requests", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("requester_id", BigInteger, ForeignKey("users.id"), nullable=False, index=True),
+    Column("engineer_id", BigInteger, ForeignKey("users.id"), nullable=True, index=True),
+    Column("full_name", String, nullable=True),
+    Column("building", String, nullable=False),
+    Column("room", String, nullable=False),
+    Column("description", Text, nullable=False),
+    Column("pc_number", String, nullable=True),
+    Column("contact_phone", String, nullable=True),
+    Column(
+        "status",
+        Enum("WAITING", "IN_PROGRESS", "COMPLETED", "ARCHIVED", "CANCELED", name="request_status_enum"),
+        nullable=False, index=True
+    ),
+    Column("created_at", DateTime(timezone=True), server_default=func.now(), index=True),
+    Column("accepted_at", DateTime(timezone=True), nullable=True),
+    Column("completed_at", DateTime(timezone=True), nullable=True),
+    Column("archived_at", DateTime(timezone=True), nullable=True),
+    Column("last_updated_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+def upgrade(conn: Connection) -> None:
+    metadata.create_all(conn, checkfirst=True)
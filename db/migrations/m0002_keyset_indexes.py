@@ -0,0 +1,23 @@
+# db/migrations/m0002_keyset_indexes.py
+"""
+Составные индексы под курсорную пагинацию (db/pagination.py).
+Строятся CONCURRENTLY, не блокируя запись в requests на работающем боте.
+"""
+from sqlalchemy.engine import Connection
+
+from db.migrations.runner import create_index
+
+TRANSACTIONAL = False
+
+INDEXES = {
+    "ix_requests_status_archived_at_id": ["status", "archived_at", "id"],
+    "ix_requests_engineer_status_archived_at_id": ["engineer_id", "status", "archived_at", "id"],
+    "ix_requests_status_accepted_at_id": ["status", "accepted_at", "id"],
+    "ix_requests_engineer_status_accepted_at_id": ["engineer_id", "status", "accepted_at", "id"],
+    "ix_requests_status_created_at_id": ["status", "created_at", "id"],
+}
+
+
+def upgrade(conn: Connection) -> None:
+    for name, columns in INDEXES.items():
+        create_index(conn, name, "requests", columns)
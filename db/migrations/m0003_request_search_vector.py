@@ -0,0 +1,17 @@
+# db/migrations/m0003_request_search_vector.py
+"""
+Колонка requests.search_vector для полнотекстового поиска по описанию заявки (только PostgreSQL).
+Генерируемая (STORED) колонка: PostgreSQL сам пересчитывает ее при изменении описания.
+Добавление переписывает таблицу под эксклюзивной блокировкой - применять в окно обслуживания.
+Конфигурация словаря должна совпадать с SEARCH_TS_CONFIG в db/crud.py, иначе индекс не будет использоваться.
+"""
+from sqlalchemy.engine import Connection
+
+
+def upgrade(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    conn.exec_driver_sql(
+        "ALTER TABLE requests ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('russian', coalesce(description, ''))) STORED"
+    )
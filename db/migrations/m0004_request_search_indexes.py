@@ -0,0 +1,25 @@
+# db/migrations/m0004_request_search_indexes.py
+"""
+Индексы поиска заявок (только PostgreSQL): GIN по search_vector для полнотекстового поиска
+и btree по lower(колонка) с text_pattern_ops для фильтров по префиксу (LIKE 'abc%').
+"""
+from sqlalchemy.engine import Connection
+
+from db.migrations.runner import create_index
+
+TRANSACTIONAL = False
+
+PREFIX_INDEXES = {
+    "ix_requests_building_prefix": "building",
+    "ix_requests_room_prefix": "room",
+    "ix_requests_pc_number_prefix": "pc_number",
+    "ix_requests_contact_phone_prefix": "contact_phone",
+}
+
+
+def upgrade(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    create_index(conn, "ix_requests_search_vector", "requests", ["search_vector"], using="gin")
+    for name, column in PREFIX_INDEXES.items():
+        create_index(conn, name, "requests", [f"lower({column}) text_pattern_ops"])
@@ -0,0 +1,152 @@
+# db/migrations/m0005_request_stats.py
+"""
+Таблицы предагрегированной статистики (db/stats.py) и их заполнение по существующим заявкам.
+Заполнение - однократный проход по requests; миграцию нужно применять до запуска бота
+(иначе переходы статусов, сделанные во время прохода, могут быть учтены дважды).
+
+Миграция не импортирует код приложения: правила подсчета и границы корзин ниже зафиксированы
+на момент ее написания (дальнейшие изменения db/stats.py не должны менять уже примененную миграцию).
+"""
+import datetime
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import (BigInteger, Column, Date, DateTime, Float, Integer, MetaData, SmallInteger,
+                        String, Table, select)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+
+# Заявки читаются пачками по id; приращения копятся в памяти (их объем - дни x разрезы, а не число заявок)
+# и применяются одним upsert в конце
+BACKFILL_BATCH_SIZE = 50000
+
+# Разрезы дневных счетчиков и метрики гистограмм (значения SCOPE_* и METRIC_* из db/stats.py)
+SCOPE_TOTAL, SCOPE_ENGINEER, SCOPE_BUILDING = "total", "engineer", "building"
+METRIC_ACCEPT, METRIC_COMPLETE = "accept", "complete"
+# Верхние границы корзин гистограммы в секундах (LATENCY_BUCKETS из db/stats.py)
+LATENCY_BUCKETS = (
+    60, 300, 900, 1800, 3600, 2 * 3600, 4 * 3600, 8 * 3600,
+    86400, 2 * 86400, 3 * 86400, 7 * 86400, 14 * 86400,
+)
+COUNTERS = ("created", "accepted", "completed", "canceled", "accept_seconds", "complete_seconds")
+
+metadata = MetaData()
+
+request_stats_daily = Table(
+    "request_stats_daily", metadata,
+    Column("day", Date, primary_key=True),
+    Column("scope", String, primary_key=True),
+    Column("scope_key", String, primary_key=True),
+    Column("created", Integer, nullable=False, default=0),
+    Column("accepted", Integer, nullable=False, default=0),
+    Column("completed", Integer, nullable=False, default=0),
+    Column("canceled", Integer, nullable=False, default=0),
+    Column("accept_seconds", Float, nullable=False, default=0),
+    Column("complete_seconds", Float, nullable=False, default=0),
+)
+
+request_latency_stats = Table(
+    "request_latency_stats", metadata,
+    Column("day", Date, primary_key=True),
+    Column("metric", String, primary_key=True),
+    Column("bucket", SmallInteger, primary_key=True),
+    Column("count", Integer, nullable=False, default=0),
+)
+
+# Колонки requests, нужные для заполнения (статус читается как строка - имя значения enum)
+requests = Table(
+    "requests", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("engineer_id", BigInteger),
+    Column("building", String),
+    Column("status", String),
+    Column("created_at", DateTime(timezone=True)),
+    Column("accepted_at", DateTime(timezone=True)),
+    Column("completed_at", DateTime(timezone=True)),
+    Column("last_updated_at", DateTime(timezone=True)),
+)
+
+
+def upgrade(conn: Connection) -> None:
+    metadata.create_all(conn, checkfirst=True)
+    backfill(conn)
+
+
+def backfill(conn: Connection, after_id: int = 0) -> None:
+    """
+    Добавляет в таблицы статистики переходы заявок из requests с id больше after_id
+    (значения прибавляются к имеющимся).
+    """
+    daily: dict[tuple, dict[str, float]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    latency: dict[tuple, int] = defaultdict(int)
+
+    def add(moment, building, engineer_id, **values) -> datetime.date:
+        day = _utc(moment).date()
+        scopes = [(SCOPE_TOTAL, ""), (SCOPE_BUILDING, building)]
+        if engineer_id is not None:
+            scopes.append((SCOPE_ENGINEER, str(engineer_id)))
+        for scope, scope_key in scopes:
+            row = daily[(day, scope, scope_key)]
+            for name, value in values.items():
+                row[name] += value
+        return day
+
+    last_id = after_id
+    while True:
+        rows = conn.execute(
+            select(requests).where(requests.c.id > last_id).order_by(requests.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for row in rows:
+            if row.created_at is not None:
+                add(row.created_at, row.building, None, created=1)
+            if row.accepted_at is not None and row.engineer_id is not None:
+                seconds = _seconds_between(row.created_at or row.accepted_at, row.accepted_at)
+                day = add(row.accepted_at, row.building, row.engineer_id, accepted=1, accept_seconds=seconds)
+                latency[(day, METRIC_ACCEPT, bisect_left(LATENCY_BUCKETS, seconds))] += 1
+            if row.completed_at is not None and row.engineer_id is not None:
+                # accepted_at может отсутствовать у заявок, созданных до появления поля
+                seconds = _seconds_between(row.accepted_at or row.completed_at, row.completed_at)
+                day = add(row.completed_at, row.building, row.engineer_id, completed=1, complete_seconds=seconds)
+                latency[(day, METRIC_COMPLETE, bisect_left(LATENCY_BUCKETS, seconds))] += 1
+            if row.status == "CANCELED" and row.last_updated_at is not None:
+                add(row.last_updated_at, row.building, row.engineer_id, canceled=1)
+
+    # Строки отсортированы по первичному ключу, как и при upsert'ах из приложения
+    _upsert(conn, request_stats_daily, COUNTERS, [
+        {"day": day, "scope": scope, "scope_key": scope_key, **values}
+        for (day, scope, scope_key), values in sorted(daily.items())
+    ])
+    _upsert(conn, request_latency_stats, ("count",), [
+        {"day": day, "metric": metric, "bucket": bucket, "count": count}
+        for (day, metric, bucket), count in sorted(latency.items())
+    ])
+
+
+def _utc(moment: datetime.datetime) -> datetime.datetime:
+    # SQLite возвращает время без часового пояса - в БД оно хранится в UTC
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.astimezone(datetime.timezone.utc)
+
+def _seconds_between(start: datetime.datetime, end: datetime.datetime) -> float:
+    return max(0.0, (_utc(end) - _utc(start)).total_seconds())
+
+def _upsert(conn: Connection, table: Table, counters: tuple[str, ...], rows: list[dict]) -> None:
+    """INSERT ... ON CONFLICT DO UPDATE с прибавлением счетчиков к имеющимся."""
+    if not rows:
+        return
+    dialect_name = conn.dialect.name
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(table)
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(table)
+    else:
+        raise NotImplementedError(f"Statistics upsert is not supported for dialect {dialect_name}")
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key],
+        set_={name: table.c[name] + stmt.excluded[name] for name in counters},
+    )
+    conn.execute(stmt, rows)
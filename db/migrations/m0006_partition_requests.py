@@ -0,0 +1,101 @@
+# db/migrations/m0006_partition_requests.py
+"""
+Колонка requests.archived_month и секционирование requests по ней (db/partitions.py).
+
+PostgreSQL: таблица пересоздается как секционированная (RANGE по archived_month) с активной
+секцией, месячными секциями архива и секцией по умолчанию; данные копируются, индексы
+пересоздаются с прежними именами и определениями. Первичный ключ становится (id, archived_month) -
+ключ секционирования обязан входить в уникальные ограничения. Таблица переписывается целиком
+под эксклюзивной блокировкой - применять в окно обслуживания, при остановленном боте.
+
+Другие СУБД: только колонка archived_month, заполненная по archived_at.
+
+Миграция не импортирует код приложения: ключ активной секции, имена секций и их число ниже
+зафиксированы на момент ее написания (db/partitions.py может меняться, примененная миграция - нет).
+Дальнейшие секции архива создает работающий бот (db/partitions.py).
+"""
+import datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Ключ секции неархивированных заявок (ACTIVE_PARTITION_KEY из db/partitions.py)
+_ACTIVE = "9999-12-31"
+# Сколько месяцев после текущего получают секции архива сразу
+_ARCHIVE_PARTITIONS_AHEAD = 3
+
+
+def upgrade(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        conn.exec_driver_sql(f"ALTER TABLE requests ADD COLUMN archived_month DATE NOT NULL DEFAULT '{_ACTIVE}'")
+        conn.exec_driver_sql(
+            "UPDATE requests SET archived_month = date(archived_at, 'start of month') WHERE archived_at IS NOT NULL"
+        )
+        return
+
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence('requests', 'id')")).scalar()
+    # Определения индексов (кроме первичного ключа) - пересоздаются на новой таблице с теми же именами
+    index_definitions = conn.execute(text(
+        "SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i "
+        "WHERE i.indrelid = 'requests'::regclass AND NOT i.indisprimary"
+    )).scalars().all()
+    # Копируются все колонки, кроме генерируемых (search_vector вычисляется заново)
+    columns = ", ".join(conn.execute(text(
+        "SELECT quote_ident(column_name) FROM information_schema.columns "
+        "WHERE table_name = 'requests' AND table_schema = current_schema() AND is_generated = 'NEVER' "
+        "ORDER BY ordinal_position"
+    )).scalars())
+    first_archived = conn.execute(text(
+        "SELECT min(archived_at AT TIME ZONE 'UTC')::date FROM requests WHERE archived_at IS NOT NULL"
+    )).scalar()
+
+    conn.exec_driver_sql("ALTER TABLE requests RENAME TO requests_unpartitioned")
+    conn.exec_driver_sql(
+        "CREATE TABLE requests ("
+        "LIKE requests_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED, "
+        f"archived_month DATE NOT NULL DEFAULT '{_ACTIVE}'"
+        ") PARTITION BY RANGE (archived_month)"
+    )
+    conn.exec_driver_sql(f"CREATE TABLE requests_active PARTITION OF requests FOR VALUES FROM ('{_ACTIVE}') TO (MAXVALUE)")
+    conn.exec_driver_sql("CREATE TABLE requests_archive_default PARTITION OF requests DEFAULT")
+    _create_archive_partitions(conn, start=first_archived)
+
+    conn.exec_driver_sql(
+        f"INSERT INTO requests ({columns}, archived_month) "
+        f"SELECT {columns}, CASE WHEN archived_at IS NULL THEN DATE '{_ACTIVE}' "
+        "ELSE date_trunc('month', archived_at AT TIME ZONE 'UTC')::date END "
+        "FROM requests_unpartitioned"
+    )
+    if sequence:
+        # Иначе последовательность id удалится вместе со старой таблицей
+        conn.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY requests.id")
+    conn.exec_driver_sql("DROP TABLE requests_unpartitioned")
+
+    conn.exec_driver_sql("ALTER TABLE requests ADD CONSTRAINT requests_pkey PRIMARY KEY (id, archived_month)")
+    conn.exec_driver_sql(
+        "ALTER TABLE requests ADD CONSTRAINT requests_requester_id_fkey FOREIGN KEY (requester_id) REFERENCES users (id)"
+    )
+    conn.exec_driver_sql(
+        "ALTER TABLE requests ADD CONSTRAINT requests_engineer_id_fkey FOREIGN KEY (engineer_id) REFERENCES users (id)"
+    )
+    for definition in index_definitions:
+        conn.exec_driver_sql(definition)
+    conn.exec_driver_sql("ANALYZE requests")
+
+
+def _next_month(month: datetime.date) -> datetime.date:
+    return (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+def _create_archive_partitions(conn: Connection, start: datetime.date | None) -> None:
+    """Месячные секции requests_archive_YYYY_MM с месяца start (по умолчанию текущего) по текущий + _ARCHIVE_PARTITIONS_AHEAD."""
+    current = datetime.datetime.now(datetime.timezone.utc).date().replace(day=1)
+    month = start.replace(day=1) if start else current
+    last = current
+    for _ in range(_ARCHIVE_PARTITIONS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS requests_archive_{month:%Y_%m} PARTITION OF requests "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+        )
+        month = _next_month(month)
@@ -0,0 +1,25 @@
+# db/migrations/m0007_request_events.py
+"""
+Журнал событий заявок request_events (db/events.py) - только добавление строк.
+"""
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+Table(
+    "request_events", metadata,
+    Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True),
+    Column("request_id", Integer, nullable=True),
+    Column("user_id", BigInteger, nullable=True),
+    Column("actor_id", BigInteger, nullable=True),
+    Column("event_type", String, nullable=False),
+    Column("details", String, nullable=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Index("ix_request_events_request_id_created_at", "request_id", "created_at", "id"),
+    Index("ix_request_events_user_id_created_at", "user_id", "created_at"),
+)
+
+
+def upgrade(conn: Connection) -> None:
+    metadata.create_all(conn, checkfirst=True)
@@ -0,0 +1,33 @@
+# db/migrations/m0008_sqlite_request_search.py
+"""
+Полнотекстовый поиск заявок во встроенной SQLite: внешняя таблица FTS5 requests_fts по описанию
+(только SQLite; в PostgreSQL поиск идет по колонке search_vector, миграции m0003/m0004).
+Индекс хранит только токены (content='requests'), триггеры поддерживают его при изменении заявок.
+Токенизатор unicode61 приводит регистр и кириллицы; словоформы не учитываются - поиск
+по словам запроса идет как по префиксам (см. search_requests в db/crud.py).
+"""
+from sqlalchemy.engine import Connection
+
+
+def upgrade(conn: Connection) -> None:
+    if conn.dialect.name != "sqlite":
+        return
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS requests_fts USING fts5("
+        "description, content='requests', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS requests_fts_insert AFTER INSERT ON requests BEGIN "
+        "INSERT INTO requests_fts (rowid, description) VALUES (new.id, new.description); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS requests_fts_delete AFTER DELETE ON requests BEGIN "
+        "INSERT INTO requests_fts (requests_fts, rowid, description) VALUES ('delete', old.id, old.description); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS requests_fts_update AFTER UPDATE OF description ON requests BEGIN "
+        "INSERT INTO requests_fts (requests_fts, rowid, description) VALUES ('delete', old.id, old.description); "
+        "INSERT INTO requests_fts (rowid, description) VALUES (new.id, new.description); END"
+    )
+    # Индекс по уже существующим заявкам
+    conn.exec_driver_sql("INSERT INTO requests_fts (requests_fts) VALUES ('rebuild')")
@@ -0,0 +1,21 @@
+# db/migrations/m0010_fsm_states.py
+"""
+Состояния FSM диалогов fsm_states (db/fsm.py) вместо хранения в памяти процесса бота.
+"""
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, Text
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+Table(
+    "fsm_states", metadata,
+    Column("key", String, primary_key=True),
+    Column("state", String, nullable=True),
+    Column("data", Text, nullable=True),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    Index("ix_fsm_states_expires_at", "expires_at"),
+)
+
+
+def upgrade(conn: Connection) -> None:
+    metadata.create_all(conn, checkfirst=True)
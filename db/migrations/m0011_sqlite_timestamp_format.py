@@ -0,0 +1,25 @@
+# db/migrations/m0011_sqlite_timestamp_format.py
+"""
+Единый текстовый формат времени во встроенной SQLite: 'YYYY-MM-DD HH:MM:SS.ffffff'.
+
+Время, поставленное умолчанием CURRENT_TIMESTAMP, хранилось без долей секунды и при строковом
+сравнении с временем из приложения (курсоры пагинации, фильтры) давало неверный порядок.
+Теперь now() в SQLite возвращает формат приложения (db/database.py), а уже записанные значения
+дополняются нулевыми микросекундами. В PostgreSQL время хранится как timestamptz - миграция пустая.
+"""
+from sqlalchemy.engine import Connection
+
+_TIMESTAMP_COLUMNS = {
+    "users": ("registered_at",),
+    "requests": ("created_at", "accepted_at", "completed_at", "archived_at", "last_updated_at"),
+}
+
+
+def upgrade(conn: Connection) -> None:
+    if conn.dialect.name != "sqlite":
+        return
+    for table, columns in _TIMESTAMP_COLUMNS.items():
+        for column in columns:
+            conn.exec_driver_sql(
+                f"UPDATE {table} SET {column} = {column} || '.000000' WHERE length({column}) = 19"
+            )
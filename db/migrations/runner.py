@@ -0,0 +1,197 @@
+# db/migrations/runner.py
+"""
+Версионные миграции схемы БД.
+
+Каждая миграция - модуль этого пакета с именем mNNNN_описание.py (NNNN - номер версии),
+в котором определена функция `upgrade(conn)` (синхронная, получает sqlalchemy Connection).
+Миграции применяются по порядку номеров, примененные версии записываются в таблицу schema_version.
+
+По умолчанию миграция выполняется в транзакции вместе с записью своей версии.
+Миграция с `TRANSACTIONAL = False` выполняется в режиме AUTOCOMMIT - это нужно
+для CREATE INDEX CONCURRENTLY, который нельзя выполнять внутри транзакции.
+Такие миграции должны быть идемпотентными (IF NOT EXISTS), чтобы их можно было перезапустить.
+Помощник create_index учитывает секционирование таблицы (CONCURRENTLY - по секциям).
+
+При старте бот только сравнивает номер версии (check_schema_version), сами миграции
+применяются командой `python main.py migrate`.
+"""
+import hashlib
+import importlib
+import logging
+import pkgutil
+import re
+from types import ModuleType
+from typing import NamedTuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from db import migrations as migrations_package
+
+_MODULE_NAME_RE = re.compile(r"^m(\d{4})_\w+$")
+
+# Таблица примененных версий (отдельные метаданные: в моделях ее нет)
+_version_metadata = MetaData()
+schema_version_table = Table(
+    "schema_version", _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    module: ModuleType
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.module, "TRANSACTIONAL", True)
+
+
+def discover_migrations() -> list[Migration]:
+    """Все миграции пакета, отсортированные по номеру версии."""
+    found = []
+    for module_info in pkgutil.iter_modules(migrations_package.__path__):
+        match = _MODULE_NAME_RE.match(module_info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{migrations_package.__name__}.{module_info.name}")
+        found.append(Migration(int(match.group(1)), module_info.name, module))
+    found.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return found
+
+def latest_version() -> int:
+    """Версия схемы, которую ожидает код (номер последней миграции)."""
+    found = discover_migrations()
+    return found[-1].version if found else 0
+
+
+def _current_version(conn: Connection) -> int:
+    schema_version_table.create(conn, checkfirst=True)
+    return conn.execute(select(func.max(schema_version_table.c.version))).scalar() or 0
+
+def _record_version(conn: Connection, migration: Migration) -> None:
+    conn.execute(insert(schema_version_table).values(version=migration.version, name=migration.name))
+
+
+async def get_schema_version(engine: AsyncEngine) -> int:
+    """Текущая версия схемы в БД (0 - миграции еще не применялись)."""
+    async with engine.begin() as conn:
+        return await conn.run_sync(_current_version)
+
+async def check_schema_version(engine: AsyncEngine) -> tuple[int, int]:
+    """Возвращает (версия в БД, версия, ожидаемая кодом). Только чтение номера версии, без рефлексии таблиц."""
+    async with engine.connect() as conn:
+        current = await conn.run_sync(
+            lambda sync_conn: sync_conn.execute(select(func.max(schema_version_table.c.version))).scalar()
+            if sync_conn.dialect.has_table(sync_conn, schema_version_table.name) else 0
+        )
+    return current or 0, latest_version()
+
+async def migrate(engine: AsyncEngine, target: int | None = None) -> int:
+    """
+    Применяет все миграции новее текущей версии (до target включительно, если задан).
+    Возвращает версию схемы после применения.
+    """
+    current = await get_schema_version(engine)
+    pending = [
+        migration for migration in discover_migrations()
+        if migration.version > current and (target is None or migration.version <= target)
+    ]
+    if not pending:
+        logging.info(f"Schema is up to date (version {current}).")
+        return current
+
+    for migration in pending:
+        logging.info(f"Applying migration {migration.name}...")
+        if migration.transactional:
+            async with engine.begin() as conn:
+                await conn.run_sync(migration.module.upgrade)
+                await conn.run_sync(_record_version, migration)
+        else:
+            async with engine.connect() as conn:
+                autocommit_conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await autocommit_conn.run_sync(migration.module.upgrade)
+            async with engine.begin() as conn:
+                await conn.run_sync(_record_version, migration)
+        current = migration.version
+        logging.info(f"Migration {migration.name} applied (schema version {current}).")
+    return current
+
+
+# --- Помощники для модулей миграций ---
+# Предел длины идентификатора PostgreSQL
+_MAX_IDENTIFIER_LENGTH = 63
+
+def create_index(conn: Connection, name: str, table: str, columns: list[str], using: str | None = None) -> None:
+    """
+    Создает индекс, если его нет. В PostgreSQL - CONCURRENTLY, без блокировки записи в таблицу
+    (миграция должна быть объявлена с TRANSACTIONAL = False).
+    columns - колонки или выражения (например, "lower(room) text_pattern_ops"), using - метод (gin, ...).
+
+    Для секционированной таблицы (requests после m0006) CONCURRENTLY недоступен: индекс создается
+    на самой таблице (ON ONLY, без построения), на каждой секции - CONCURRENTLY под именем
+    "<name>_<секция>", и индексы секций присоединяются к нему (ATTACH PARTITION). Индекс таблицы
+    становится рабочим, когда присоединены индексы всех секций; новые секции получают его автоматически.
+    """
+    column_list = ", ".join(columns)
+    using_clause = f" USING {using}" if using else ""
+    if conn.dialect.name != "postgresql":
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table}{using_clause} ({column_list})")
+        return
+    if not _is_partitioned_table(conn, table):
+        _create_index_concurrently(conn, name, table, using_clause, column_list)
+        return
+
+    # Индекс таблицы остается невалидным, пока не присоединены индексы всех секций -
+    # при перезапуске прерванной миграции он не пересоздается, а достраивается
+    conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table}{using_clause} ({column_list})")
+    for partition in _partitions(conn, table):
+        partition_index = _partition_index_name(name, table, partition)
+        if _is_partitioned_table(conn, partition):
+            # Секция, секционированная сама, получает индекс тем же способом
+            create_index(conn, partition_index, partition, columns, using)
+        else:
+            _create_index_concurrently(conn, partition_index, partition, using_clause, column_list)
+        attached = conn.execute(text(
+            "SELECT 1 FROM pg_inherits WHERE inhrelid = CAST(:child AS regclass) AND inhparent = CAST(:parent AS regclass)"
+        ), {"child": partition_index, "parent": name}).first()
+        if not attached:
+            conn.exec_driver_sql(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
+
+def _create_index_concurrently(conn: Connection, name: str, table: str, using_clause: str, column_list: str) -> None:
+    # Прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс - пересоздаем его
+    invalid = conn.execute(text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    conn.exec_driver_sql(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table}{using_clause} ({column_list})")
+
+def _is_partitioned_table(conn: Connection, table: str) -> bool:
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_class WHERE relname = :table AND relkind = 'p' AND pg_table_is_visible(oid)"
+    ), {"table": table}).first())
+
+def _partitions(conn: Connection, table: str) -> list[str]:
+    return list(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname"
+    ), {"table": table}).scalars())
+
+def _partition_index_name(name: str, table: str, partition: str) -> str:
+    """Имя индекса секции: имя индекса таблицы и секции без префикса таблицы (requests_active -> <name>_active)."""
+    suffix = partition.removeprefix(f"{table}_")
+    index_name = f"{name}_{suffix}"
+    if len(index_name) > _MAX_IDENTIFIER_LENGTH:
+        # PostgreSQL обрезал бы длинное имя, и имена индексов разных секций могли бы совпасть
+        digest = hashlib.md5(index_name.encode()).hexdigest()[:8]
+        index_name = f"{index_name[:_MAX_IDENTIFIER_LENGTH - len(digest) - 1]}_{digest}"
+    return index_name
@@ -1,12 +1,13 @@
 # db/models.py
-from sqlalchemy import (BigInteger, Column, DateTime, ForeignKey, Integer,
-                        String, Enum as SQLEnum, Text, func)
+from sqlalchemy import (BigInteger, Column, Date, DateTime, Float, ForeignKey, Index, Integer,
+                        SmallInteger, String, Enum as SQLEnum, Text, func, text)
 from sqlalchemy.orm import relationship
 from enum import Enum as PyEnum
 import datetime
 
 # Импортируем базовый класс для моделей SQLAlchemy
 from .database import Base
+from .partitions import ACTIVE_PARTITION_KEY
 
 # Определяем возможные роли пользователей через Enum
 class UserRole(PyEnum):
@@ -34,23 +35,25 @@ class User(Base):
     # Явное имя 'user_role_enum' для SQL Enum типа улучшает совместимость
     role = Column(SQLEnum(UserRole, name="user_role_enum"), default=UserRole.CLIENT, nullable=False)
     phone_number = Column(String, nullable=True) # Номер телефона (может быть запрошен позже)
-    # Дата и время регистрации пользователя (автоматически устанавливается БД)
-    registered_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Дата и время регистрации пользователя (автоматически устанавливается БД).
+    # default дублирует server_default в INSERT: формат времени SQLite не зависит от умолчания в схеме
+    registered_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
 
     # Связь "один ко многим": один пользователь может создать много заявок
-    # lazy="selectin" оптимизирует загрузку: связанные заявки грузятся одним доп. запросом
+    # lazy="raise": история заявок никогда не грузится неявно (у инженера их могут быть тысячи),
+    # нужные связи подгружаются явно опциями в db/crud.py (см. get_user_with_requests)
     created_requests = relationship(
         "Request",
         back_populates="requester", # Обратная связь с моделью Request (поле requester)
         foreign_keys="Request.requester_id", # Указываем внешний ключ для этой связи
-        lazy="selectin"
+        lazy="raise"
     )
     # Связь "один ко многим": один инженер может быть назначен на много заявок
     assigned_requests = relationship(
         "Request",
         back_populates="engineer", # Обратная связь с моделью Request (поле engineer)
         foreign_keys="Request.engineer_id", # Указываем внешний ключ для этой связи
-        lazy="selectin"
+        lazy="raise"
     )
 
     # Стандартный метод для представления объекта User в виде строки (удобно для отладки)
@@ -60,6 +63,15 @@ class User(Base):
 # Модель заявки на техподдержку
 class Request(Base):
     __tablename__ = 'requests'
+    # Составные индексы под курсорную пагинацию (db/pagination.py):
+    # фильтр (статус / инженер + статус) и ключ сортировки с id для однозначности
+    __table_args__ = (
+        Index('ix_requests_status_archived_at_id', 'status', 'archived_at', 'id'),
+        Index('ix_requests_engineer_status_archived_at_id', 'engineer_id', 'status', 'archived_at', 'id'),
+        Index('ix_requests_status_accepted_at_id', 'status', 'accepted_at', 'id'),
+        Index('ix_requests_engineer_status_accepted_at_id', 'engineer_id', 'status', 'accepted_at', 'id'),
+        Index('ix_requests_status_created_at_id', 'status', 'created_at', 'id'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True) # Первичный ключ заявки
     # Внешний ключ на пользователя-создателя заявки (обязательно)
     requester_id = Column(BigInteger, ForeignKey('users.id'), nullable=False, index=True)
@@ -76,7 +88,7 @@ class Request(Base):
     # Статус заявки (из RequestStatus enum)
     status = Column(SQLEnum(RequestStatus, name="request_status_enum"), default=RequestStatus.WAITING, nullable=False, index=True)
     # Дата и время создания заявки (автоматически устанавливается БД)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), index=True)
     # Дата и время принятия заявки инженером
     accepted_at = Column(DateTime(timezone=True), nullable=True)
     # Дата и время выполнения заявки
@@ -84,18 +96,126 @@ class Request(Base):
     # Дата и время архивации заявки
     archived_at = Column(DateTime(timezone=True), nullable=True)
     # Дата и время последнего обновления записи (автоматически обновляется БД)
-    last_updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+    last_updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), server_default=func.now())
+    # Ключ секционирования (db/partitions.py): первое число месяца архивации или ACTIVE_PARTITION_KEY.
+    # В PostgreSQL входит в первичный ключ (id, archived_month); для ORM идентификатор - id
+    archived_month = Column(Date, nullable=False, default=ACTIVE_PARTITION_KEY, server_default=text("'9999-12-31'"))
 
     # Связи "многие к одному"
+    # lazy="raise": пользователи подгружаются только там, где они нужны (опции загрузки в db/crud.py)
     # Связь с пользователем, создавшим заявку
     requester = relationship(
-        "User", back_populates="created_requests", foreign_keys=[requester_id], lazy="selectin"
+        "User", back_populates="created_requests", foreign_keys=[requester_id], lazy="raise"
     )
     # Связь с инженером, назначенным на заявку
     engineer = relationship(
-        "User", back_populates="assigned_requests", foreign_keys=[engineer_id], lazy="selectin"
+        "User", back_populates="assigned_requests", foreign_keys=[engineer_id], lazy="raise"
     )
 
     # Стандартный метод для представления объекта Request в виде строки
     def __repr__(self):
-         return f"<Request(id={self.id}, status='{self.status.value}', requester_id={self.requester_id})>"
\ No newline at end of file
+         return f"<Request(id={self.id}, status='{self.status.value}', requester_id={self.requester_id})>"
+
+
+# Типы событий журнала заявок (хранятся строкой: новые типы не требуют миграции enum в БД)
+class RequestEventType(PyEnum):
+    CREATED = "created"           # Заявка создана клиентом
+    ACCEPTED = "accepted"         # Принята инженером
+    COMPLETED = "completed"       # Выполнена и архивирована
+    REASSIGNED = "reassigned"     # Передана другому инженеру (массовая операция админа)
+    CANCELED = "canceled"         # Отменена админом
+    ARCHIVED = "archived"         # Архивирована админом без выполнения
+    ROLE_CHANGED = "role_changed" # Изменена роль пользователя (request_id пустой)
+
+# Журнал событий: только добавление строк, записывается пачками (db/events.py).
+# Связи с requests нет (у секционированной таблицы составной первичный ключ) - только индекс
+class RequestEvent(Base):
+    __tablename__ = 'request_events'
+    __table_args__ = (
+        # Хронология заявки (get_request_timeline) и история пользователя
+        Index('ix_request_events_request_id_created_at', 'request_id', 'created_at', 'id'),
+        Index('ix_request_events_user_id_created_at', 'user_id', 'created_at'),
+    )
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    request_id = Column(Integer, nullable=True)      # Заявка (для событий заявок)
+    user_id = Column(BigInteger, nullable=True)      # Пользователь, над которым выполнено действие (смена роли)
+    actor_id = Column(BigInteger, nullable=True)     # Кто выполнил действие (None - система/консоль)
+    event_type = Column(String, nullable=False)      # Значение RequestEventType
+    details = Column(String, nullable=True)          # Доп. сведения (например, "client -> engineer")
+    created_at = Column(DateTime(timezone=True), nullable=False) # Время события (в приложении, до записи в БД)
+
+    def __repr__(self):
+        return f"<RequestEvent(id={self.id}, type='{self.event_type}', request_id={self.request_id})>"
+
+class OutboxStatus(PyEnum):
+    PENDING = "pending"   # Ожидает отправки (в том числе повторной)
+    DEAD = "dead"         # Не доставлено: Telegram отклонил сообщение или исчерпаны попытки
+
+# Исходящие сообщения бота (transactional outbox, см. db/outbox.py): пишутся в той же транзакции,
+# что и изменение заявки, и удаляются после отправки. Недоставленные остаются со статусом DEAD
+class OutboxMessage(Base):
+    __tablename__ = 'outbox_messages'
+    __table_args__ = (
+        # Выборка готовых к отправке: status = 'pending' AND next_attempt_at <= now() ORDER BY next_attempt_at, id
+        Index('ix_outbox_messages_status_next_attempt_at', 'status', 'next_attempt_at', 'id'),
+    )
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    reply_markup = Column(Text, nullable=True)       # Клавиатура в JSON (Bot API)
+    status = Column(String, nullable=False)          # Значение OutboxStatus
+    attempts = Column(Integer, nullable=False, default=0)  # Неудачных попыток отправки
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<OutboxMessage(id={self.id}, chat_id={self.chat_id}, status='{self.status}')>"
+
+# Состояния FSM диалогов (хранилище aiogram, см. db/fsm.py и bot/fsm_storage.py): общие для всех
+# экземпляров бота и не теряются при перезапуске. Запись удаляется, когда состояние и данные пусты
+class FsmState(Base):
+    __tablename__ = 'fsm_states'
+    __table_args__ = (
+        # Удаление брошенных форм: expires_at <= now()
+        Index('ix_fsm_states_expires_at', 'expires_at'),
+    )
+    key = Column(String, primary_key=True)           # "bot:chat:user[:thread:business:destiny]"
+    state = Column(String, nullable=True)            # Имя состояния ("CreateRequest:waiting_for_room")
+    data = Column(Text, nullable=True)               # Данные в компактном JSON (NULL - пусто)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<FsmState(key='{self.key}', state='{self.state}')>"
+
+# --- Предагрегированная статистика (см. db/stats.py) ---
+# Обновляется инкрементально в той же транзакции, что и смена статуса заявки,
+# поэтому отчеты админа не сканируют таблицу requests.
+
+# Дневные счетчики переходов по статусам в разрезе: общий итог, инженер, корпус
+class RequestStatsDaily(Base):
+    __tablename__ = 'request_stats_daily'
+    day = Column(Date, primary_key=True)             # День события (UTC)
+    scope = Column(String, primary_key=True)         # 'total', 'engineer' или 'building'
+    scope_key = Column(String, primary_key=True)     # '' для total, ID инженера или название корпуса
+    created = Column(Integer, nullable=False, default=0)    # Создано заявок (-> WAITING)
+    accepted = Column(Integer, nullable=False, default=0)   # Принято в работу (-> IN_PROGRESS)
+    completed = Column(Integer, nullable=False, default=0)  # Выполнено (-> ARCHIVED)
+    canceled = Column(Integer, nullable=False, default=0)   # Отменено (-> CANCELED)
+    # Суммы длительностей в секундах (среднее = сумма / количество принятых/выполненных)
+    accept_seconds = Column(Float, nullable=False, default=0)    # От создания до принятия
+    complete_seconds = Column(Float, nullable=False, default=0)  # От принятия до выполнения
+
+    def __repr__(self):
+        return f"<RequestStatsDaily(day={self.day}, scope='{self.scope}', key='{self.scope_key}')>"
+
+# Дневные гистограммы длительностей (для перцентилей): количество заявок в корзине
+class RequestLatencyStats(Base):
+    __tablename__ = 'request_latency_stats'
+    day = Column(Date, primary_key=True)
+    metric = Column(String, primary_key=True)        # 'accept' или 'complete'
+    bucket = Column(SmallInteger, primary_key=True)  # Индекс корзины в db.stats.LATENCY_BUCKETS
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<RequestLatencyStats(day={self.day}, metric='{self.metric}', bucket={self.bucket})>"
@@ -0,0 +1,137 @@
+# db/outbox.py
+"""
+Transactional outbox: исходящие сообщения бота в таблице outbox_messages.
+
+Сообщение пишется той же транзакцией, что и изменение, о котором оно сообщает (add_messages
+до commit в db/crud.py): оно не теряется при перезапуске процесса и не уходит, если транзакция
+откатилась. Отправляет сообщения фоновая задача (bot/notifications.py):
+  * claim_batch - выбирает готовые к отправке сообщения и сдвигает их next_attempt_at на время
+    аренды (в PostgreSQL - FOR UPDATE SKIP LOCKED, экземпляры бота не берут одни и те же сообщения).
+    Транзакция сразу фиксируется: во время запросов к Telegram соединение с БД не удерживается;
+  * finish_batch - одной транзакцией удаляет отправленные, переносит повторы и помечает недоставленные (DEAD).
+Если процесс завершился после отправки, но до finish_batch, сообщение будет отправлено повторно
+по окончании аренды: доставка "хотя бы один раз".
+"""
+import asyncio
+import datetime
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from .events import as_utc
+from .models import OutboxMessage, OutboxStatus
+
+_outbox = OutboxMessage.__table__
+# Сигнал фоновой задаче этого процесса: зафиксированы новые сообщения (другие процессы их находят опросом)
+_new_messages = asyncio.Event()
+
+
+class OutgoingMessage(NamedTuple):
+    """Сообщение для записи в outbox (клавиатура уже сериализована в JSON)."""
+    chat_id: int
+    text: str
+    reply_markup: str | None = None
+
+
+class ClaimedMessage(NamedTuple):
+    """Сообщение, взятое на отправку."""
+    id: int
+    chat_id: int
+    text: str
+    reply_markup: str | None
+    attempts: int
+    created_at: datetime.datetime
+
+
+class Reschedule(NamedTuple):
+    """Итог неудачной попытки: повтор в next_attempt_at или DEAD, если next_attempt_at = None."""
+    message_id: int
+    attempts: int
+    next_attempt_at: datetime.datetime | None
+    error: str
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+async def add_messages(session: AsyncSession, messages: Iterable[OutgoingMessage]) -> int:
+    """Добавляет сообщения в текущую транзакцию сессии (фиксирует вызывающий). Возвращает их число."""
+    now = _utcnow()
+    rows = [
+        {
+            "chat_id": message.chat_id, "text": message.text, "reply_markup": message.reply_markup,
+            "status": OutboxStatus.PENDING.value, "attempts": 0, "next_attempt_at": now, "created_at": now,
+        }
+        for message in messages
+    ]
+    if rows:
+        await session.execute(insert(_outbox), rows)
+    return len(rows)
+
+def signal_new_messages() -> None:
+    """Будит фоновую отправку (вызывается после commit транзакции с новыми сообщениями)."""
+    _new_messages.set()
+
+async def wait_for_new_messages(timeout: float) -> None:
+    """Ждет сигнала о новых сообщениях не дольше timeout секунд."""
+    try:
+        await asyncio.wait_for(_new_messages.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    _new_messages.clear()
+
+
+async def claim_batch(engine: AsyncEngine, limit: int, lease: float) -> list[ClaimedMessage]:
+    """Берет до limit готовых к отправке сообщений и откладывает их повторную выдачу на lease секунд."""
+    now = _utcnow()
+    stmt = (
+        select(_outbox.c.id, _outbox.c.chat_id, _outbox.c.text, _outbox.c.reply_markup,
+               _outbox.c.attempts, _outbox.c.created_at)
+        .where(_outbox.c.status == OutboxStatus.PENDING.value, _outbox.c.next_attempt_at <= now)
+        .order_by(_outbox.c.next_attempt_at, _outbox.c.id)
+        .limit(limit)
+    )
+    if engine.dialect.name == "postgresql":
+        stmt = stmt.with_for_update(skip_locked=True)
+    async with engine.begin() as conn:
+        messages = [
+            ClaimedMessage(row.id, row.chat_id, row.text, row.reply_markup, row.attempts, as_utc(row.created_at))
+            for row in await conn.execute(stmt)
+        ]
+        if messages:
+            await conn.execute(
+                update(_outbox)
+                .where(_outbox.c.id.in_([message.id for message in messages]))
+                .values(next_attempt_at=now + datetime.timedelta(seconds=lease))
+            )
+    return messages
+
+async def finish_batch(engine: AsyncEngine, sent_ids: list[int], failed: list[Reschedule]) -> None:
+    """Удаляет отправленные сообщения, переносит повторы и помечает недоставленные одной транзакцией."""
+    retries = [
+        {"message_id": item.message_id, "failed_attempts": item.attempts, "retry_at": item.next_attempt_at,
+         "error": item.error}
+        for item in failed if item.next_attempt_at is not None
+    ]
+    dead = [
+        {"message_id": item.message_id, "failed_attempts": item.attempts, "error": item.error}
+        for item in failed if item.next_attempt_at is None
+    ]
+    async with engine.begin() as conn:
+        if sent_ids:
+            await conn.execute(delete(_outbox).where(_outbox.c.id.in_(sent_ids)))
+        if retries:
+            await conn.execute(
+                update(_outbox).where(_outbox.c.id == bindparam("message_id"))
+                .values(attempts=bindparam("failed_attempts"), next_attempt_at=bindparam("retry_at"),
+                        last_error=bindparam("error")),
+                retries
+            )
+        if dead:
+            await conn.execute(
+                update(_outbox).where(_outbox.c.id == bindparam("message_id"))
+                .values(status=OutboxStatus.DEAD.value, attempts=bindparam("failed_attempts"),
+                        last_error=bindparam("error")),
+                dead
+            )
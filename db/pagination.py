@@ -0,0 +1,118 @@
+# db/pagination.py
+"""
+Курсорная (keyset) пагинация.
+
+Вместо LIMIT/OFFSET страница выбирается условием "строки после ключа последней
+показанной строки", например (archived_at, id) < (:archived_at, :id).
+Стоимость любой страницы равна стоимости первой (индекс по ключу сортировки),
+а добавление новых строк не сдвигает уже открытые страницы.
+
+Курсор - компактная строка из значений ключа в base36, разделенных точкой.
+Он передается в callback_data кнопок, поэтому должен быть коротким (лимит Telegram - 64 байта).
+"""
+import datetime
+import string
+from typing import Any, NamedTuple
+
+from sqlalchemy import Select, literal, tuple_
+
+from .models import Request, User
+
+_DIGITS = string.digits + string.ascii_lowercase
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_SEPARATOR = "."
+
+
+class SortKey(NamedTuple):
+    """Ключ сортировки: колонки (последняя - уникальная, обычно id) и направление."""
+    columns: tuple
+    descending: bool = False
+
+
+# --- Ключи сортировки списков ---
+ARCHIVE_SORT_KEYS = {
+    'date_desc': SortKey((Request.archived_at, Request.id), descending=True),
+    'date_asc': SortKey((Request.archived_at, Request.id)),
+    'id_asc': SortKey((Request.id,)),
+    'id_desc': SortKey((Request.id,), descending=True),
+}
+ACTIVE_SORT_KEYS = {
+    'accepted_asc': SortKey((Request.accepted_at, Request.id)),
+    'created_asc': SortKey((Request.created_at, Request.id)),
+    'created_desc': SortKey((Request.created_at, Request.id), descending=True),
+}
+# Очередь новых заявок: сначала самые старые (индекс ix_requests_status_created_at_id)
+WAITING_SORT_KEY = SortKey((Request.created_at, Request.id))
+USERS_SORT_KEY = SortKey((User.id,))
+
+
+def archive_sort_key(sort_by: str) -> SortKey:
+    """Ключ сортировки архива (по умолчанию 'date_desc' - сначала самые новые)."""
+    return ARCHIVE_SORT_KEYS.get(sort_by, ARCHIVE_SORT_KEYS['date_desc'])
+
+def active_sort_key(sort_by: str) -> SortKey:
+    """Ключ сортировки активных заявок (по умолчанию 'accepted_asc')."""
+    return ACTIVE_SORT_KEYS.get(sort_by, ACTIVE_SORT_KEYS['accepted_asc'])
+
+
+# --- Кодирование курсора ---
+def _to_base36(number: int) -> str:
+    if number < 0:
+        return "-" + _to_base36(-number)
+    digits = []
+    while True:
+        number, remainder = divmod(number, 36)
+        digits.append(_DIGITS[remainder])
+        if number == 0:
+            return "".join(reversed(digits))
+
+def _encode_value(value: Any) -> str:
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        delta = value - _EPOCH
+        # Микросекунды с эпохи: точность совпадает с timestamp в PostgreSQL
+        return _to_base36((delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+    return _to_base36(int(value))
+
+def _decode_value(raw: str, column) -> Any:
+    number = int(raw, 36)
+    if column.type.python_type is datetime.datetime:
+        return _EPOCH + datetime.timedelta(microseconds=number)
+    return number
+
+def encode_cursor(item: Any, key: SortKey) -> str:
+    """Курсор, указывающий на строку `item` в списке, отсортированном по `key`."""
+    return _SEPARATOR.join(_encode_value(getattr(item, column.key)) for column in key.columns)
+
+def decode_cursor(cursor: str, key: SortKey) -> tuple | None:
+    """Значения ключа из курсора или None, если курсор поврежден или от другого ключа."""
+    parts = cursor.split(_SEPARATOR)
+    if len(parts) != len(key.columns):
+        return None
+    try:
+        return tuple(_decode_value(raw, column) for raw, column in zip(parts, key.columns))
+    except (ValueError, OverflowError):
+        return None
+
+
+def apply_keyset(stmt: Select, key: SortKey, cursor: str | None = None, backward: bool = False) -> Select:
+    """
+    Добавляет к запросу сортировку по ключу и условие "после курсора".
+    backward=True выбирает строки ПЕРЕД курсором (кнопка "Назад"): запрос идет
+    в обратном порядке, поэтому результат нужно развернуть (см. ordered_page).
+    Ключевые колонки не должны содержать NULL в выбираемом наборе строк.
+    """
+    descending = key.descending != backward
+    values = decode_cursor(cursor, key) if cursor else None
+    if values is not None:
+        row_key = tuple_(*key.columns)
+        row_cursor = tuple_(*(literal(value, column.type) for value, column in zip(values, key.columns)))
+        stmt = stmt.where(row_key < row_cursor if descending else row_key > row_cursor)
+    return stmt.order_by(*(column.desc() if descending else column.asc() for column in key.columns))
+
+def ordered_page(items: list, backward: bool) -> list:
+    """Возвращает строки страницы в прямом порядке сортировки."""
+    if backward:
+        items.reverse()
+    return items
@@ -0,0 +1,103 @@
+# db/partitions.py
+"""
+Секционирование таблицы requests (только PostgreSQL, см. миграцию m0006_partition_requests).
+
+Ключ секционирования - requests.archived_month (RANGE):
+  * requests_active - заявки без даты архивации (archived_month = ACTIVE_PARTITION_KEY);
+  * requests_archive_YYYY_MM - заявки, архивированные в этом месяце (UTC);
+  * requests_archive_default - страховка для месяцев, секция которых не была создана заранее.
+
+Очередь и активные заявки фильтруются по archived_month = ACTIVE_PARTITION_KEY, поэтому
+PostgreSQL читает только небольшую активную секцию и ее индексы. complete_request переносит
+строку в секцию месяца архивации (UPDATE ключа секционирования).
+
+Секции архива создаются заранее на ARCHIVE_PARTITIONS_AHEAD месяцев вперед: миграцией
+и периодически работающим ботом (partition_maintenance_loop).
+"""
+import asyncio
+import datetime
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Значение ключа для неархивированных заявок (далекое будущее - больше любого месяца архивации)
+ACTIVE_PARTITION_KEY = datetime.date(9999, 12, 31)
+
+# Сколько месяцев вперед (после текущего) держать готовые секции архива
+ARCHIVE_PARTITIONS_AHEAD = 3
+# Период проверки секций работающим ботом, секунды
+PARTITION_MAINTENANCE_INTERVAL = 12 * 3600
+
+
+def archive_partition_key(moment: datetime.datetime) -> datetime.date:
+    """Ключ секции архива: первое число месяца архивации (UTC)."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc)
+    return moment.date().replace(day=1)
+
+def _next_month(month: datetime.date) -> datetime.date:
+    return (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+def archive_partition_name(month: datetime.date) -> str:
+    return f"requests_archive_{month:%Y_%m}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    """True, если requests - секционированная таблица PostgreSQL."""
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_class WHERE relname = 'requests' AND relkind = 'p' AND pg_table_is_visible(oid)"
+    )).first())
+
+def ensure_archive_partitions(
+    conn: Connection,
+    start: datetime.date | None = None,
+    months_ahead: int = ARCHIVE_PARTITIONS_AHEAD
+) -> list[str]:
+    """
+    Создает недостающие месячные секции архива с месяца start (по умолчанию текущего)
+    по текущий + months_ahead. Возвращает имена созданных секций.
+    """
+    if not is_partitioned(conn):
+        return []
+    current = archive_partition_key(datetime.datetime.now(datetime.timezone.utc))
+    month = start.replace(day=1) if start else current
+    last = current
+    for _ in range(months_ahead):
+        last = _next_month(last)
+
+    existing = set(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'requests'::regclass"
+    )).scalars())
+    created = []
+    while month <= last:
+        name = archive_partition_name(month)
+        if name not in existing:
+            conn.exec_driver_sql(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF requests "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+            )
+            created.append(name)
+        month = _next_month(month)
+    return created
+
+
+async def maintain_partitions(engine: AsyncEngine) -> None:
+    """Создает секции архива на ближайшие месяцы; ошибки логируются (бот продолжает работу)."""
+    try:
+        async with engine.begin() as conn:
+            created = await conn.run_sync(ensure_archive_partitions)
+        if created:
+            logging.info(f"Created request archive partitions: {', '.join(created)}")
+    except Exception as e:
+        logging.error(f"Failed to create request archive partitions: {e}", exc_info=True)
+
+async def partition_maintenance_loop(engine: AsyncEngine, interval: float = PARTITION_MAINTENANCE_INTERVAL) -> None:
+    """Фоновая задача бота: периодически вызывает maintain_partitions."""
+    while True:
+        await maintain_partitions(engine)
+        await asyncio.sleep(interval)
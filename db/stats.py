@@ -0,0 +1,296 @@
+# db/stats.py
+"""
+Предагрегированная статистика по заявкам (таблицы request_stats_daily и request_latency_stats).
+
+Переходы статусов (create_request, accept_request, complete_request в db/crud.py) накапливают
+приращения в StatsDelta и применяют их upsert'ом в той же транзакции, что и сам переход.
+В PostgreSQL accept/complete вычисляют те же приращения в SQL (transition_stats_ctes)
+внутри одной команды с самим UPDATE.
+Отчеты читают только дневные агрегаты: объем чтения зависит от длины периода
+и числа инженеров/корпусов, но не от размера архива заявок.
+"""
+import datetime
+import math
+from bisect import bisect_left
+from collections import defaultdict
+from typing import NamedTuple
+
+from sqlalchemy import Date, String, case, cast, column, desc, func, literal, select, true, values
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import on_replica
+from .models import RequestLatencyStats, RequestStatsDaily
+
+# Разрезы дневных счетчиков
+SCOPE_TOTAL = "total"
+SCOPE_ENGINEER = "engineer"
+SCOPE_BUILDING = "building"
+
+# Метрики гистограмм длительностей
+METRIC_ACCEPT = "accept"      # От создания до принятия
+METRIC_COMPLETE = "complete"  # От принятия до выполнения
+
+# Верхние границы корзин гистограммы в секундах; последняя корзина (len(LATENCY_BUCKETS)) - все, что больше.
+# Менять границы можно только вместе с пересчетом request_latency_stats (миграция m0005 хранит свою копию).
+LATENCY_BUCKETS = (
+    60, 300, 900, 1800, 3600, 2 * 3600, 4 * 3600, 8 * 3600,
+    86400, 2 * 86400, 3 * 86400, 7 * 86400, 14 * 86400,
+)
+
+_COUNTERS = ("created", "accepted", "completed", "canceled", "accept_seconds", "complete_seconds")
+
+
+def latency_bucket(seconds: float) -> int:
+    """Индекс корзины гистограммы для длительности в секундах."""
+    return bisect_left(LATENCY_BUCKETS, seconds)
+
+def _utc(moment: datetime.datetime) -> datetime.datetime:
+    # SQLite возвращает время без часового пояса - в БД оно хранится в UTC
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.astimezone(datetime.timezone.utc)
+
+def _seconds_between(start: datetime.datetime, end: datetime.datetime) -> float:
+    return max(0.0, (_utc(end) - _utc(start)).total_seconds())
+
+
+class StatsDelta:
+    """
+    Приращения статистики от одного или нескольких переходов статусов.
+    Событие относится к дню (UTC), в который оно произошло.
+    """
+    def __init__(self):
+        # (day, scope, scope_key) -> {счетчик: приращение}
+        self.daily: dict[tuple, dict[str, float]] = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0))
+        # (day, metric, bucket) -> количество
+        self.latency: dict[tuple, int] = defaultdict(int)
+
+    def __bool__(self) -> bool:
+        return bool(self.daily or self.latency)
+
+    def _add(self, moment: datetime.datetime, building: str, engineer_id: int | None, **values: float) -> datetime.date:
+        day = _utc(moment).date()
+        scopes = [(SCOPE_TOTAL, ""), (SCOPE_BUILDING, building)]
+        if engineer_id is not None:
+            scopes.append((SCOPE_ENGINEER, str(engineer_id)))
+        for scope, scope_key in scopes:
+            row = self.daily[(day, scope, scope_key)]
+            for name, value in values.items():
+                row[name] += value
+        return day
+
+    def created(self, building: str, created_at: datetime.datetime) -> None:
+        self._add(created_at, building, None, created=1)
+
+    def accepted(self, building: str, engineer_id: int, created_at: datetime.datetime, accepted_at: datetime.datetime) -> None:
+        seconds = _seconds_between(created_at, accepted_at)
+        day = self._add(accepted_at, building, engineer_id, accepted=1, accept_seconds=seconds)
+        self.latency[(day, METRIC_ACCEPT, latency_bucket(seconds))] += 1
+
+    def completed(self, building: str, engineer_id: int, accepted_at: datetime.datetime | None, completed_at: datetime.datetime) -> None:
+        # accepted_at может отсутствовать у заявок, созданных до появления поля
+        seconds = _seconds_between(accepted_at or completed_at, completed_at)
+        day = self._add(completed_at, building, engineer_id, completed=1, complete_seconds=seconds)
+        self.latency[(day, METRIC_COMPLETE, latency_bucket(seconds))] += 1
+
+    def canceled(self, building: str, engineer_id: int | None, canceled_at: datetime.datetime) -> None:
+        self._add(canceled_at, building, engineer_id, canceled=1)
+
+    def rows(self) -> tuple[list[dict], list[dict]]:
+        """
+        Строки для upsert, отсортированные по первичному ключу: параллельные транзакции
+        блокируют строки агрегатов в одном порядке и не взаимоблокируются.
+        """
+        daily_rows = [
+            {"day": day, "scope": scope, "scope_key": scope_key, **values}
+            for (day, scope, scope_key), values in sorted(self.daily.items())
+        ]
+        latency_rows = [
+            {"day": day, "metric": metric, "bucket": bucket, "count": count}
+            for (day, metric, bucket), count in sorted(self.latency.items())
+        ]
+        return daily_rows, latency_rows
+
+
+def _upsert_statements(dialect_name: str, delta: StatsDelta) -> list[tuple]:
+    """Пары (INSERT ... ON CONFLICT DO UPDATE с прибавлением, строки) для непустых таблиц."""
+    if dialect_name == "postgresql":
+        insert_func = postgresql.insert
+    elif dialect_name == "sqlite":
+        insert_func = sqlite.insert
+    else:
+        raise NotImplementedError(f"Statistics upsert is not supported for dialect {dialect_name}")
+
+    statements = []
+    daily_rows, latency_rows = delta.rows()
+    for model, rows, counters in (
+        (RequestStatsDaily, daily_rows, _COUNTERS),
+        (RequestLatencyStats, latency_rows, ("count",)),
+    ):
+        if not rows:
+            continue
+        table = model.__table__
+        stmt = insert_func(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key],
+            set_={name: table.c[name] + stmt.excluded[name] for name in counters},
+        )
+        statements.append((stmt, rows))
+    return statements
+
+async def apply_delta(session: AsyncSession, delta: StatsDelta) -> None:
+    """Применяет приращения в текущей транзакции сессии (фиксируются вместе с переходом статуса)."""
+    if not delta:
+        return
+    for stmt, rows in _upsert_statements(session.bind.dialect.name, delta):
+        await session.execute(stmt, rows)
+
+
+# --- Статистика внутри команды перехода статуса (PostgreSQL) ---
+def transition_stats_ctes(updated, metric: str) -> list:
+    """
+    Upsert'ы статистики в виде CTE (INSERT ... SELECT FROM updated ON CONFLICT DO UPDATE)
+    для перехода, строки которого возвращает CTE updated (UPDATE ... RETURNING).
+    Позволяют выполнить переход и обновление агрегатов одной командой.
+    Вычисления совпадают с StatsDelta.accepted (METRIC_ACCEPT) и StatsDelta.completed (METRIC_COMPLETE).
+    """
+    if metric == METRIC_ACCEPT:
+        moment, start, counter, seconds_column = updated.c.accepted_at, updated.c.created_at, "accepted", "accept_seconds"
+    else:
+        moment = updated.c.completed_at
+        start = func.coalesce(updated.c.accepted_at, updated.c.completed_at)
+        counter, seconds_column = "completed", "complete_seconds"
+    day = cast(func.timezone("UTC", moment), Date)
+    seconds = func.greatest(0, func.extract("epoch", moment - start))
+    bucket = case(
+        *[(seconds <= bound, index) for index, bound in enumerate(LATENCY_BUCKETS)],
+        else_=len(LATENCY_BUCKETS)
+    )
+
+    scopes = values(column("scope", String), name="scopes").data([(SCOPE_TOTAL,), (SCOPE_BUILDING,), (SCOPE_ENGINEER,)])
+    scope_key = case(
+        (scopes.c.scope == SCOPE_BUILDING, updated.c.building),
+        (scopes.c.scope == SCOPE_ENGINEER, cast(updated.c.engineer_id, String)),
+        else_="",
+    )
+    daily = RequestStatsDaily.__table__
+    daily_insert = postgresql.insert(daily).from_select(
+        ["day", "scope", "scope_key", counter, seconds_column],
+        select(day, scopes.c.scope, scope_key, literal(1), seconds).select_from(updated).join(scopes, true()),
+    )
+    daily_insert = daily_insert.on_conflict_do_update(
+        index_elements=[column.name for column in daily.primary_key],
+        set_={name: daily.c[name] + daily_insert.excluded[name] for name in (counter, seconds_column)},
+    )
+
+    latency = RequestLatencyStats.__table__
+    latency_insert = postgresql.insert(latency).from_select(
+        ["day", "metric", "bucket", "count"],
+        select(day, literal(metric), bucket, literal(1)).select_from(updated),
+    )
+    latency_insert = latency_insert.on_conflict_do_update(
+        index_elements=[column.name for column in latency.primary_key],
+        set_={"count": latency.c.count + latency_insert.excluded.count},
+    )
+    return [daily_insert.cte(f"{metric}_stats_daily"), latency_insert.cte(f"{metric}_stats_latency")]
+
+
+# --- Отчеты ---
+class PeriodStats(NamedTuple):
+    """Сводка за период. Длительности - в секундах, перцентили - верхняя граница корзины (math.inf - больше последней)."""
+    days: int
+    created: int
+    accepted: int
+    completed: int
+    canceled: int
+    accept_avg: float | None
+    complete_avg: float | None
+    accept_p50: float | None
+    accept_p90: float | None
+    complete_p50: float | None
+    complete_p90: float | None
+    # (engineer_id, выполнено, среднее время выполнения), по убыванию выполненных
+    top_engineers: list[tuple[int, int, float | None]]
+    # (корпус, создано заявок), по убыванию
+    top_buildings: list[tuple[str, int]]
+
+
+def _percentile(bucket_counts: dict[int, int], fraction: float) -> float | None:
+    total = sum(bucket_counts.values())
+    if total == 0:
+        return None
+    threshold = math.ceil(total * fraction)
+    cumulative = 0
+    for bucket in sorted(bucket_counts):
+        cumulative += bucket_counts[bucket]
+        if cumulative >= threshold:
+            return LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else math.inf
+    return math.inf
+
+def _average(total_seconds: float | None, count: int) -> float | None:
+    return total_seconds / count if count else None
+
+async def get_period_stats(
+    session: AsyncSession,
+    days: int,
+    today: datetime.date | None = None,
+    top: int = 5
+) -> PeriodStats:
+    """Сводка за последние days дней (включая сегодняшний, UTC) по предагрегированным таблицам."""
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    start_day = today - datetime.timedelta(days=days - 1)
+    daily = RequestStatsDaily
+
+    sums = [func.coalesce(func.sum(getattr(daily, name)), 0) for name in _COUNTERS]
+    totals = (await session.execute(on_replica(
+        select(*sums).where(daily.scope == SCOPE_TOTAL, daily.day >= start_day)
+    ))).one()
+    created, accepted, completed, canceled, accept_seconds, complete_seconds = totals
+
+    latency_result = await session.execute(on_replica(
+        select(RequestLatencyStats.metric, RequestLatencyStats.bucket, func.sum(RequestLatencyStats.count))
+        .where(RequestLatencyStats.day >= start_day)
+        .group_by(RequestLatencyStats.metric, RequestLatencyStats.bucket)
+    ))
+    histograms: dict[str, dict[int, int]] = {METRIC_ACCEPT: {}, METRIC_COMPLETE: {}}
+    for metric, bucket, count in latency_result:
+        histograms.setdefault(metric, {})[bucket] = int(count)
+
+    completed_sum = func.sum(daily.completed)
+    engineers_result = await session.execute(on_replica(
+        select(daily.scope_key, completed_sum, func.sum(daily.complete_seconds))
+        .where(daily.scope == SCOPE_ENGINEER, daily.day >= start_day)
+        .group_by(daily.scope_key)
+        .having(completed_sum > 0)
+        .order_by(desc(completed_sum), daily.scope_key)
+        .limit(top)
+    ))
+    top_engineers = [
+        (int(engineer_id), int(count), _average(seconds, count))
+        for engineer_id, count, seconds in engineers_result
+    ]
+
+    created_sum = func.sum(daily.created)
+    buildings_result = await session.execute(on_replica(
+        select(daily.scope_key, created_sum)
+        .where(daily.scope == SCOPE_BUILDING, daily.day >= start_day)
+        .group_by(daily.scope_key)
+        .having(created_sum > 0)
+        .order_by(desc(created_sum), daily.scope_key)
+        .limit(top)
+    ))
+    top_buildings = [(building, int(count)) for building, count in buildings_result]
+
+    return PeriodStats(
+        days=days,
+        created=int(created), accepted=int(accepted), completed=int(completed), canceled=int(canceled),
+        accept_avg=_average(accept_seconds, accepted),
+        complete_avg=_average(complete_seconds, completed),
+        accept_p50=_percentile(histograms[METRIC_ACCEPT], 0.5),
+        accept_p90=_percentile(histograms[METRIC_ACCEPT], 0.9),
+        complete_p50=_percentile(histograms[METRIC_COMPLETE], 0.5),
+        complete_p90=_percentile(histograms[METRIC_COMPLETE], 0.9),
+        top_engineers=top_engineers,
+        top_buildings=top_buildings,
+    )
@@ -6,36 +6,71 @@ import sys # Для завершения работы скрипта
 
 # Импорты обработчиков (роутеров)
 from bot.handlers.admin import admin_panel as admin_main_router
+from bot.handlers.admin import bulk_operations as admin_bulk_router
 from bot.handlers.client import new_request as client_new_request_router
 from bot.handlers.client import view_requests as client_view_router
 from bot.handlers.engineer import manage_requests as engineer_manage_router
+from bot.handlers import search as search_router
 from bot.handlers import common
 
 # Импорты для работы с базой данных и middlewares
-from db.database import engine, Base, AsyncSessionFactory
-from db import models # noqa: Импортируем модели для создания таблиц SQLAlchemy
+from db.database import engine, AsyncSessionFactory
+from db.migrations.runner import check_schema_version, migrate
+from db.events import event_log
+from db.partitions import maintain_partitions, partition_maintenance_loop
 from db.crud import set_user_role, get_user
 from db.models import UserRole
 from bot.middlewares.db import DbSessionMiddleware
+from bot.middlewares.noop import NoopCallbackMiddleware
+from bot.notifications import notifier
+from bot.fsm_storage import DbStorage
+from bot.webhook import run_webhook
+from config import FSM_CLEANUP_INTERVAL, METRICS_HOST, METRICS_PORT, WEBHOOK_URL
+from metrics import start_metrics_server
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-async def create_db_tables():
-    """Проверяет и создает таблицы в базе данных, если они не существуют."""
-    # Логирование: Начало проверки/создания таблиц БД
-    logging.info("Проверка и создание таблиц базы данных...")
+async def check_db_schema() -> bool:
+    """Сверяет версию схемы в БД с версией, которую ожидает код (без создания таблиц и рефлексии)."""
     try:
-        async with engine.begin() as conn:
-            # Используем run_sync для вызова синхронной функции create_all
-            await conn.run_sync(Base.metadata.create_all)
-        # Логирование: Успешное завершение проверки/создания таблиц
-        logging.info("Таблицы базы данных проверены/созданы.")
+        current_version, expected_version = await check_schema_version(engine)
+    except Exception as e:
+        # Логирование: Ошибка при подключении к БД
+        logging.error(f"Не удалось подключиться к базе данных: {e}", exc_info=True)
+        return False
+    if current_version < expected_version:
+        # Логирование: Схема устарела - нужны миграции
+        logging.error(
+            f"Схема БД устарела (версия {current_version}, требуется {expected_version}). "
+            f"Примените миграции командой: python main.py migrate"
+        )
+        return False
+    if current_version > expected_version:
+        # Схема новее кода (например, во время выкладки новой версии) - работаем дальше
+        logging.warning(f"Схема БД новее кода (версия {current_version}, код ожидает {expected_version}).")
+    # Логирование: Схема актуальна
+    logging.info(f"Версия схемы БД: {current_version}.")
+    return True
+
+async def run_migrations(dispose: bool = True) -> bool:
+    """Применяет недостающие миграции схемы БД (команда migrate; dispose=False - перед запуском бота)."""
+    # Логирование: Начало применения миграций
+    logging.info("Применение миграций базы данных...")
+    try:
+        version = await migrate(engine)
+        # Секции архива заявок на ближайшие месяцы (PostgreSQL)
+        await maintain_partitions(engine)
+        # Логирование: Миграции применены
+        logging.info(f"Миграции применены, версия схемы: {version}.")
         return True
     except Exception as e:
-        # Логирование: Ошибка при подключении или создании таблиц
-        logging.error(f"Не удалось подключиться или создать таблицы базы данных: {e}", exc_info=True)
+        # Логирование: Ошибка при применении миграций
+        logging.error(f"Не удалось применить миграции: {e}", exc_info=True)
         return False
+    finally:
+        if dispose:
+            await engine.dispose()
 
 async def set_initial_admin(user_id: int):
     """Назначает роль ADMIN пользователю с заданным Telegram ID."""
@@ -66,55 +101,95 @@ async def set_initial_admin(user_id: int):
             logging.error(f"Ошибка при установке первоначального администратора для пользователя {user_id}: {e}", exc_info=True)
             return False
         finally:
-             # Освобождаем ресурсы БД, так как скрипт завершится после этой операции
+             # Дописываем журнал событий (смена роли) и освобождаем ресурсы БД, так как скрипт завершится после этой операции
+             await event_log.flush(engine)
              await engine.dispose()
              # Логирование: Освобождение ресурсов БД
              logging.info("Движок БД освобожден после попытки установки администратора.")
 
 
 async def run_bot():
-    """Настраивает и запускает бота в режиме поллинга."""
+    """Настраивает и запускает бота: вебхук, если задан WEBHOOK_URL, иначе поллинг."""
     # Импортируем объекты бота и диспетчера только при реальном запуске
     from bot.loader import bot, dp
 
     # Логирование: Начало настройки диспетчера и роутеров
-    logging.info("Настройка диспетчера и роутеров для поллинга бота...")
+    logging.info("Настройка диспетчера и роутеров бота...")
     # Передаем объект бота в диспетчер
     dp['bot'] = bot
+    # Кнопки-заполнители ("ignore_*") отвечаются до роутеров и без сессии БД
+    dp.update.outer_middleware.register(NoopCallbackMiddleware())
     # Создаем и регистрируем middleware для сессий БД
     db_middleware = DbSessionMiddleware(session_pool=AsyncSessionFactory)
     dp.update.outer_middleware.register(db_middleware)
 
     # Подключаем роутеры к диспетчеру
     dp.include_router(admin_main_router.router)
+    dp.include_router(admin_bulk_router.router)
     dp.include_router(client_new_request_router.router)
     dp.include_router(client_view_router.router)
     dp.include_router(engineer_manage_router.router)
+    dp.include_router(search_router.router)
     dp.include_router(common.router)
     # Логирование: Успешная регистрация роутеров
     logging.info("Роутеры зарегистрированы.")
 
-    # Удаляем вебхук (если был) и запускаем поллинг
-    await bot.delete_webhook(drop_pending_updates=True)
-    # Логирование: Удаление вебхука и запуск поллинга
-    logging.info("Вебхук удален. Запуск поллинга...")
+    # HTTP-эндпоинт метрик (пул соединений и т.д.), если задан METRICS_PORT
+    metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+    # Периодическое создание секций архива заявок на следующие месяцы
+    partition_task = asyncio.create_task(partition_maintenance_loop(engine))
+    # Периодическое удаление брошенных форм (состояний FSM с истекшим сроком) из БД
+    fsm_cleanup_task = (
+        asyncio.create_task(dp.storage.cleanup_loop(FSM_CLEANUP_INTERVAL)) if isinstance(dp.storage, DbStorage) else None
+    )
+    # Фоновая пакетная запись журнала событий заявок
+    event_log.start(engine)
+    # Фоновая отправка уведомлений из outbox с учетом лимитов Telegram
+    notifier.start(bot, engine)
+
     try:
-        # Запуск получения обновлений
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if WEBHOOK_URL:
+            # Логирование: Запуск в режиме вебхука
+            logging.info("Запуск в режиме вебхука...")
+            # Прием апдейтов встроенным HTTP-сервером (bot/webhook.py)
+            await run_webhook(bot, dp)
+        else:
+            # Удаляем вебхук (если был) и запускаем поллинг
+            await bot.delete_webhook(drop_pending_updates=True)
+            # Логирование: Удаление вебхука и запуск поллинга
+            logging.info("Вебхук удален. Запуск поллинга...")
+            # Запуск получения обновлений
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
-        # Логирование: Начало остановки поллинга и закрытия ресурсов
-        logging.info("Остановка поллинга. Закрытие ресурсов...")
+        # Логирование: Начало остановки бота и закрытия ресурсов
+        logging.info("Остановка бота. Закрытие ресурсов...")
+        partition_task.cancel()
+        if fsm_cleanup_task:
+            fsm_cleanup_task.cancel()
+        # Останавливаем отправку уведомлений (неотправленные остаются в outbox до следующего запуска)
+        await notifier.stop()
+        # Дописываем буфер событий до закрытия соединений с БД
+        await event_log.stop()
         # Закрываем соединение с БД и сессию бота
         # Повторный вызов dispose() безопасен, если он уже был вызван в set_initial_admin
         await engine.dispose()
         await bot.session.close()
-        # Логирование: Успешное завершение поллинга
-        logging.info("Поллинг бота остановлен.")
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        # Логирование: Успешное завершение работы бота
+        logging.info("Бот остановлен.")
 
 
 async def main():
     # Настройка парсера аргументов командной строки
     parser = argparse.ArgumentParser(description="Support Bot")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["run", "migrate"],
+        default="run",
+        help="run - запустить бота (по умолчанию), migrate - применить миграции схемы БД и выйти."
+    )
     parser.add_argument(
         "--set-admin",
         type=int,
@@ -123,11 +198,20 @@ async def main():
     )
     args = parser.parse_args()
 
-    # Инициализация базы данных (необходима в любом случае)
-    db_ready = await create_db_tables()
+    # Применение миграций выполняется отдельной командой, вне запуска бота
+    if args.command == "migrate":
+        success = await run_migrations()
+        sys.exit(0 if success else 1)
+
+    # Встроенная SQLite обслуживает один процесс бота - схема обновляется прямо при запуске
+    if engine.dialect.name == "sqlite" and not await run_migrations(dispose=False):
+        sys.exit(1)
+
+    # Проверка версии схемы БД (необходима в любом случае)
+    db_ready = await check_db_schema()
     if not db_ready:
          # Логирование: Критическая ошибка инициализации БД
-         logging.critical("Инициализация базы данных не удалась. Завершение работы.")
+         logging.critical("Проверка базы данных не удалась. Завершение работы.")
          # Освобождаем ресурсы движка БД перед выходом
          await engine.dispose()
          sys.exit(1) # Выход с кодом ошибки
@@ -147,7 +231,7 @@ async def main():
 
     # Если флаг --set-admin не указан, запускаем бота
     # Логирование: Запуск бота в обычном режиме
-    logging.info("Флаг --set-admin не указан, запуск поллинга бота...")
+    logging.info("Флаг --set-admin не указан, запуск бота...")
     await run_bot()
 
 
@@ -0,0 +1,160 @@
+# metrics.py
+"""
+Метрики процесса бота в формате Prometheus (text exposition format).
+
+Метрики регистрируются в общем реестре `registry` функциями counter()/gauge()/histogram().
+Отдаются HTTP-эндпоинтом /metrics (start_metrics_server, порт METRICS_PORT в config.py).
+Реализация без внешних зависимостей: рассчитана на один процесс и один event loop.
+"""
+import logging
+import math
+from typing import Callable, Iterable
+
+from aiohttp import web
+
+# Границы корзин гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{str(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Монотонно растущий счетчик (с необязательной меткой)."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label: str | None = None):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values: dict[str | None, float] = {}
+
+    def inc(self, amount: float = 1, label_value: str | None = None) -> None:
+        self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value: str | None = None) -> float:
+        return self._values.get(label_value, 0)
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        if not self._values and self.label is None:
+            yield self.name, {}, 0
+        for label_value, value in self._values.items():
+            labels = {self.label: label_value} if self.label else {}
+            yield self.name, labels, value
+
+
+class Gauge:
+    """Текущее значение: задается через set() или вычисляется функцией при каждом чтении."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], float] | None = None):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self._value: float = 0
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self._value -= amount
+
+    def value(self) -> float:
+        return self.func() if self.func else self._value
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        yield self.name, {}, self.value()
+
+
+class Histogram:
+    """Распределение значений (например, длительностей) по накопительным корзинам."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self._counts[index] += 1
+                break
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        cumulative = 0
+        for bound, count in zip(self.buckets, self._counts):
+            cumulative += count
+            yield f"{self.name}_bucket", {"le": _format_value(bound)}, cumulative
+        yield f"{self.name}_sum", {}, self.sum
+        yield f"{self.name}_count", {}, self.count
+
+
+class Registry:
+    """Реестр метрик процесса. Повторная регистрация имени возвращает существующую метрику."""
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+def counter(name: str, documentation: str, label: str | None = None) -> Counter:
+    return registry.register(Counter(name, documentation, label))
+
+def gauge(name: str, documentation: str, func: Callable[[], float] | None = None) -> Gauge:
+    return registry.register(Gauge(name, documentation, func))
+
+def histogram(name: str, documentation: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, documentation, buckets))
+
+
+# --- HTTP-эндпоинт ---
+async def _metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Запускает HTTP-сервер с эндпоинтом /metrics. Возвращает runner для остановки (runner.cleanup())."""
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Metrics endpoint started on http://{host}:{port}/metrics")
+    return runner
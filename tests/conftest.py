@@ -0,0 +1,39 @@
+# tests/conftest.py
+"""
+Тесты работают на встроенной SQLite в памяти: переменные окружения задаются до импорта config.
+"""
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ["SQLITE_PATH"] = ":memory:"
+os.environ.pop("DATABASE_REPLICA_HOST", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def run_db():
+    """Выполняет корутину test(session) на новой схеме БД в памяти (схема удаляется вместе с соединением)."""
+    from db import crud
+    from db.cache import user_directory
+    from db.database import AsyncSessionFactory, engine
+    from db.events import event_log
+    from db.migrations.runner import migrate
+
+    def run(test):
+        async def scenario():
+            # Кэши процесса не должны переживать пересоздание БД
+            user_directory.clear()
+            crud._count_cache.clear()
+            event_log._pending.clear()
+            await migrate(engine)
+            try:
+                async with AsyncSessionFactory() as session:
+                    return await test(session)
+            finally:
+                await engine.dispose()
+        return asyncio.run(scenario())
+    return run
@@ -0,0 +1,49 @@
+# tests/test_bulk.py
+"""Массовые операции над заявками (db/crud.py, _bulk_update)."""
+import pytest
+
+from db import crud
+from db.events import event_log
+from db.models import RequestEventType, RequestStatus
+
+CLIENT_ID = 1001
+ADMIN_ID = 3003
+
+
+async def _create_waiting(session, count: int, building: str = "A") -> list[int]:
+    await crud.get_or_create_user(session, CLIENT_ID, "client", "Client", None)
+    ids = []
+    for number in range(count):
+        request = await crud.create_request(session, CLIENT_ID, "Client", building, str(number), f"problem {number}")
+        ids.append(request.id)
+    return ids
+
+
+def _pending_types(request_ids: list[int]) -> list[RequestEventType]:
+    return [entry.event_type for request_id in request_ids for entry in event_log.pending_for_request(request_id)]
+
+
+def test_bulk_events_recorded_after_commit(run_db):
+    async def scenario(session):
+        ids = await _create_waiting(session, 5)
+        assert await crud.bulk_cancel_building_requests(session, "A", ADMIN_ID, chunk_size=2) == 5
+        assert _pending_types(ids).count(RequestEventType.CANCELED) == 5
+    run_db(scenario)
+
+
+def test_bulk_events_not_recorded_when_commit_fails(run_db, monkeypatch):
+    async def scenario(session):
+        ids = await _create_waiting(session, 3)
+
+        async def failing_commit():
+            raise RuntimeError("commit failed")
+        monkeypatch.setattr(session, "commit", failing_commit)
+        with pytest.raises(RuntimeError):
+            await crud.bulk_cancel_building_requests(session, "A", ADMIN_ID)
+        await session.rollback()
+        monkeypatch.undo()
+
+        assert RequestEventType.CANCELED not in _pending_types(ids)
+        statuses = [(await crud.get_request(session, request_id)).status for request_id in ids]
+        assert statuses == [RequestStatus.WAITING] * 3
+    run_db(scenario)
@@ -0,0 +1,31 @@
+# tests/test_events.py
+"""Пакетная запись журнала событий (db/events.py)."""
+import asyncio
+
+from sqlalchemy import func, select
+
+from db.database import engine
+from db.events import EventLog
+from db.models import RequestEvent, RequestEventType
+
+
+def test_concurrent_flushes_keep_in_flight_events(run_db):
+    async def scenario(session):
+        log = EventLog(batch_size=2, flush_interval=60, maxsize=100)
+        for number in range(6):
+            log.record(RequestEventType.CREATED, details=str(number))
+
+        first = asyncio.create_task(log.flush(engine))
+        await asyncio.sleep(0)
+        # Пока первая пачка пишется, ее события видны в хронологии, а вторая запись ждет первую
+        assert [entry.details for entry in log.pending_for_request(None)] == [str(number) for number in range(6)]
+        second = asyncio.create_task(log.flush(engine))
+        await asyncio.sleep(0)
+        assert [entry.details for entry in log.pending_for_request(None)] == [str(number) for number in range(6)]
+
+        assert sorted(await asyncio.gather(first, second)) == [0, 6]
+        assert log.pending_for_request(None) == [] and len(log) == 0
+        details = (await session.execute(select(RequestEvent.details).order_by(RequestEvent.id))).scalars().all()
+        assert details == [str(number) for number in range(6)]
+        assert (await session.execute(select(func.count(RequestEvent.id)))).scalar_one() == 6
+    run_db(scenario)
@@ -0,0 +1,157 @@
+# tests/test_fsm_storage.py
+"""Хранилища состояний FSM (bot/fsm_storage.py): в БД с объединением записей и ограниченное в памяти."""
+import asyncio
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import event, func, select
+
+from bot import fsm_storage
+from bot.fsm_storage import BoundedMemoryStorage, DbEventIsolation, DbStorage
+from db import cache
+from db.database import engine
+from db.fsm import delete_expired, read_state, write_state
+from db.models import FsmState
+
+KEY = StorageKey(bot_id=1, chat_id=1001, user_id=1001)
+
+
+class FsmStatements:
+    """Считает чтения (SELECT) и записи (INSERT/DELETE) таблицы fsm_states."""
+    def __init__(self):
+        self.reset()
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if "fsm_states" not in statement:
+            return
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.reads += 1
+        else:
+            self.writes += 1
+
+    def reset(self) -> None:
+        self.reads = self.writes = 0
+
+    def close(self) -> None:
+        event.remove(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+
+@pytest.fixture
+def fsm_statements():
+    statements = FsmStatements()
+    yield statements
+    statements.close()
+
+
+def test_one_write_per_update(run_db, fsm_statements):
+    async def scenario(session):
+        fsm_statements.reset()  # Без команд миграций
+        storage = DbStorage(engine, ttl=3600)
+        isolation = DbEventIsolation(storage)
+        context = FSMContext(storage, KEY)
+
+        # Шаг формы: чтение состояния и несколько изменений - одна запись при выходе
+        async with isolation.lock(KEY):
+            assert await context.get_state() is None
+            await context.update_data(building="A")
+            await context.update_data(room="101")
+            await context.set_state("Form:description")
+            assert fsm_statements.writes == 0
+        assert (fsm_statements.reads, fsm_statements.writes) == (1, 1)
+
+        # Апдейт без изменений ничего не пишет
+        async with isolation.lock(KEY):
+            assert await context.get_data() == {"building": "A", "room": "101"}
+        assert (fsm_statements.reads, fsm_statements.writes) == (2, 1)
+
+        # Состояние в БД - его видит новый экземпляр хранилища (перезапуск бота)
+        restarted = FSMContext(DbStorage(engine, ttl=3600), KEY)
+        assert await restarted.get_state() == "Form:description"
+        assert await restarted.get_data() == {"building": "A", "room": "101"}
+
+        # Сброс формы удаляет строку
+        async with isolation.lock(KEY):
+            await context.clear()
+        assert await read_state(engine, "1:1001:1001") == (None, {})
+        assert (await session.execute(select(func.count()).select_from(FsmState))).scalar_one() == 0
+    run_db(scenario)
+
+
+def test_updates_of_one_key_are_serialized(run_db, fsm_statements):
+    async def scenario(session):
+        fsm_statements.reset()
+        storage = DbStorage(engine, ttl=3600)
+        isolation = DbEventIsolation(storage)
+
+        async def increment():
+            async with isolation.lock(KEY):
+                context = FSMContext(storage, KEY)
+                value = (await context.get_data()).get("value", 0)
+                await asyncio.sleep(0.01)  # Без очереди параллельный апдейт прочитал бы то же значение
+                await context.update_data(value=value + 1)
+
+        await asyncio.gather(*(increment() for _ in range(5)))
+        assert await FSMContext(DbStorage(engine, ttl=3600), KEY).get_data() == {"value": 5}
+        # Апдейты из очереди используют уже прочитанное состояние; каждый пишет свое изменение
+        assert fsm_statements.reads == 2 and fsm_statements.writes == 5
+    run_db(scenario)
+
+
+def test_expired_states_are_deleted(run_db):
+    async def scenario(session):
+        await write_state(engine, "expired", "Form:room", {"building": "A"}, ttl=-1)
+        await write_state(engine, "alive", "Form:room", {"building": "B"}, ttl=3600)
+        # Просроченное состояние не читается еще до удаления
+        assert await read_state(engine, "expired") == (None, {})
+
+        assert await delete_expired(engine) == 1
+        keys = (await session.execute(select(FsmState.key))).scalars().all()
+        assert keys == ["alive"]
+        assert await read_state(engine, "alive") == ("Form:room", {"building": "B"})
+    run_db(scenario)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_bounded_memory_storage_ttl_and_lru(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, "time", clock)
+    monkeypatch.setattr(fsm_storage, "time", clock)
+
+    async def scenario():
+        storage = BoundedMemoryStorage(maxsize=3, ttl=60, sweep_interval=30)
+        keys = [StorageKey(bot_id=1, chat_id=chat_id, user_id=chat_id) for chat_id in range(5)]
+        for key in keys[:3]:
+            await storage.set_state(key, "Form:building")
+        # Обращение делает запись недавно использованной: вытесняется keys[1], а не keys[0]
+        assert await storage.get_state(keys[0]) == "Form:building"
+        await storage.set_data(keys[3], {"building": "A"})
+        assert len(storage._records) == 3
+        assert [await storage.get_state(key) for key in keys[:3]] == ["Form:building", None, "Form:building"]
+
+        # Пустое состояние не хранится
+        await storage.set_state(keys[2], None)
+        assert len(storage._records) == 2
+
+        # Через ttl после последнего изменения записи устаревают; очистка - при изменении после sweep_interval
+        clock.now += 45
+        await storage.update_data(keys[3], {"room": "101"})
+        clock.now += 30
+        await storage.set_state(keys[4], "Form:room")
+        assert len(storage._records) == 2  # keys[0] (изменен 75 с назад) удален, keys[3] (30 с) - нет
+        assert await storage.get_state(keys[0]) is None
+        assert await storage.get_data(keys[3]) == {"building": "A", "room": "101"}
+
+        clock.now += 61
+        assert await storage.get_data(keys[3]) == {}
+        assert await storage.get_state(keys[4]) is None
+        assert len(storage._records) == 0
+    asyncio.run(scenario())
@@ -0,0 +1,97 @@
+# tests/test_notifications.py
+"""Лимиты отправки уведомлений (bot/notifications.py): токен-бакет, интервал чата, пауза после RetryAfter."""
+import asyncio
+import datetime
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from bot import notifications
+from bot.notifications import NotificationDispatcher, TokenBucket
+from db.outbox import ClaimedMessage
+
+
+class FakeClock:
+    """time.monotonic под управлением теста; sleep сдвигает время вместо ожидания."""
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(notifications, "time", clock)
+    return clock
+
+
+def _dispatcher(rate: float = 1000, chat_interval: float = 0) -> NotificationDispatcher:
+    return NotificationDispatcher(
+        rate=rate, chat_interval=chat_interval, workers=4, batch_size=10, poll_interval=1, lease=60, max_attempts=3
+    )
+
+
+def _message(message_id: int, chat_id: int) -> ClaimedMessage:
+    return ClaimedMessage(message_id, chat_id, "text", None, 0, datetime.datetime.now(datetime.timezone.utc))
+
+
+def test_token_bucket(clock):
+    bucket = TokenBucket(rate=10, capacity=2)
+    # Запас capacity - сразу, дальше - в долг с ожиданием 1/rate на каждый токен
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, pytest.approx(0.1), pytest.approx(0.2)]
+    clock.now += 0.2
+    assert bucket.reserve() == pytest.approx(0.1)
+    # Простой не копит больше capacity
+    clock.now += 60
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, pytest.approx(0.1)]
+
+
+def test_global_rate_limit(clock, monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+    dispatcher = _dispatcher(rate=2)
+
+    async def scenario():
+        for chat_id in range(5):
+            await dispatcher._wait_for_slot(chat_id)
+    asyncio.run(scenario())
+    # Всплеск в 2 сообщения, затем не чаще 2 в секунду
+    assert clock.sleeps == [0.5, 0.5, 0.5]
+
+
+def test_chat_interval(clock, monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+    dispatcher = _dispatcher(chat_interval=1)
+
+    async def scenario():
+        for chat_id in (1, 1, 2, 1):
+            await dispatcher._wait_for_slot(chat_id)
+    asyncio.run(scenario())
+    # Повторы в чат 1 ждут интервал, чат 2 - нет
+    assert clock.sleeps == [1.0, 1.0]
+
+
+def test_retry_after_pauses_all_chats(clock, monkeypatch):
+    class FloodBot:
+        async def send_message(self, chat_id, text, reply_markup=None):
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Flood control", retry_after=5)
+
+    dispatcher = _dispatcher()
+    dispatcher._bot = FloodBot()
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+
+    async def scenario():
+        result = await dispatcher._deliver(_message(1, chat_id=1))
+        # Отправка в другой чат ждет окончания паузы
+        await dispatcher._wait_for_slot(2)
+        return result
+    result, delay, _ = asyncio.run(scenario())
+    assert (result, delay) == ("retry_after", 5)
+    assert clock.sleeps == [5.0]
@@ -0,0 +1,122 @@
+# tests/test_outbox.py
+"""Outbox исходящих сообщений (db/outbox.py) и его обработка фоновой отправкой (bot/notifications.py)."""
+import asyncio
+import datetime
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from sqlalchemy import select
+
+from bot import notifications
+from bot.notifications import NotificationDispatcher
+from db.database import engine
+from db.models import OutboxMessage, OutboxStatus
+from db.outbox import OutgoingMessage, Reschedule, add_messages, claim_batch, finish_batch
+
+OK_CHAT, BLOCKED_CHAT, FAILING_CHAT, FLOOD_CHAT = 1, 2, 3, 4
+
+
+async def _add(session, *chat_ids: int) -> None:
+    await add_messages(session, [OutgoingMessage(chat_id, f"to {chat_id}") for chat_id in chat_ids])
+    await session.commit()
+
+async def _rows(session) -> dict[int, OutboxMessage]:
+    session.expire_all()
+    return {row.chat_id: row for row in (await session.execute(select(OutboxMessage))).scalars()}
+
+
+def test_claim_lease_and_reclaim(run_db):
+    async def scenario(session):
+        await _add(session, 1, 2, 3)
+        claimed = await claim_batch(engine, limit=2, lease=0.2)
+        assert [message.chat_id for message in claimed] == [1, 2]
+        # Взятые сообщения не выдаются повторно до конца аренды
+        assert [message.chat_id for message in await claim_batch(engine, limit=10, lease=60)] == [3]
+        assert await claim_batch(engine, limit=10, lease=60) == []
+
+        # Аренда закончилась без finish_batch (процесс упал) - сообщения выдаются снова
+        await asyncio.sleep(0.3)
+        assert [message.chat_id for message in await claim_batch(engine, limit=10, lease=60)] == [1, 2]
+    run_db(scenario)
+
+
+def test_finish_batch(run_db):
+    async def scenario(session):
+        await _add(session, 1, 2, 3)
+        claimed = {message.chat_id: message for message in await claim_batch(engine, limit=10, lease=60)}
+        retry_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1)
+        await finish_batch(engine, [claimed[1].id], [
+            Reschedule(claimed[2].id, 1, retry_at, "timeout"),
+            Reschedule(claimed[3].id, 1, None, "blocked"),
+        ])
+        rows = await _rows(session)
+        assert set(rows) == {2, 3}  # Отправленное удалено
+        assert (rows[2].status, rows[2].attempts, rows[2].last_error) == (OutboxStatus.PENDING.value, 1, "timeout")
+        assert (rows[3].status, rows[3].attempts, rows[3].last_error) == (OutboxStatus.DEAD.value, 1, "blocked")
+        # Повтор снова выдается, недоставленное (DEAD) - нет
+        assert [message.chat_id for message in await claim_batch(engine, limit=10, lease=60)] == [2]
+    run_db(scenario)
+
+
+class FakeBot:
+    """Отправляет в OK_CHAT; BLOCKED_CHAT - бот заблокирован, FAILING_CHAT - сетевая ошибка, FLOOD_CHAT - RetryAfter."""
+    def __init__(self):
+        self.sent: list[int] = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        method = SendMessage(chat_id=chat_id, text=text)
+        if chat_id == BLOCKED_CHAT:
+            raise TelegramForbiddenError(method, "bot was blocked by the user")
+        if chat_id == FAILING_CHAT:
+            raise ConnectionError("connection reset")
+        if chat_id == FLOOD_CHAT:
+            raise TelegramRetryAfter(method, "Flood control", retry_after=30)
+        self.sent.append(chat_id)
+
+
+def test_dispatcher_retries_and_dead_letters(run_db, monkeypatch):
+    monkeypatch.setattr(notifications, "BACKOFF_BASE", 0.5)
+
+    async def scenario(session):
+        dispatcher = NotificationDispatcher(
+            rate=1000, chat_interval=0, workers=4, batch_size=10, poll_interval=1, lease=60, max_attempts=2
+        )
+        bot = FakeBot()
+        dispatcher._bot, dispatcher._engine = bot, engine
+        await _add(session, OK_CHAT, BLOCKED_CHAT, FAILING_CHAT)
+
+        assert await dispatcher.drain_batch() == 3
+        assert bot.sent == [OK_CHAT]
+        rows = await _rows(session)
+        assert set(rows) == {BLOCKED_CHAT, FAILING_CHAT}
+        # Отклоненное Telegram - сразу в dead letters, сетевая ошибка - повтор с задержкой
+        assert (rows[BLOCKED_CHAT].status, rows[BLOCKED_CHAT].attempts) == (OutboxStatus.DEAD.value, 1)
+        assert (rows[FAILING_CHAT].status, rows[FAILING_CHAT].attempts) == (OutboxStatus.PENDING.value, 1)
+        assert await dispatcher.drain_batch() == 0  # Повтор еще не наступил
+
+        # После NOTIFY_MAX_ATTEMPTS (2) неудачных попыток - dead letter
+        await asyncio.sleep(0.6)
+        assert await dispatcher.drain_batch() == 1
+        rows = await _rows(session)
+        assert (rows[FAILING_CHAT].status, rows[FAILING_CHAT].attempts) == (OutboxStatus.DEAD.value, 2)
+        assert rows[FAILING_CHAT].last_error == "connection reset"
+        assert await dispatcher.drain_batch() == 0
+    run_db(scenario)
+
+
+def test_dispatcher_retry_after_does_not_count_attempt(run_db):
+    async def scenario(session):
+        dispatcher = NotificationDispatcher(
+            rate=1000, chat_interval=0, workers=4, batch_size=10, poll_interval=1, lease=60, max_attempts=1
+        )
+        dispatcher._bot, dispatcher._engine = FakeBot(), engine
+        await _add(session, FLOOD_CHAT)
+        before = datetime.datetime.now(datetime.timezone.utc)
+
+        assert await dispatcher.drain_batch() == 1
+        row = (await _rows(session))[FLOOD_CHAT]
+        # Ограничение скорости - не ошибка сообщения: попытка не засчитана, повтор через retry_after
+        assert (row.status, row.attempts) == (OutboxStatus.PENDING.value, 0)
+        next_attempt_at = row.next_attempt_at.replace(tzinfo=datetime.timezone.utc)
+        assert next_attempt_at >= before + datetime.timedelta(seconds=30)
+    run_db(scenario)
@@ -0,0 +1,62 @@
+# tests/test_pagination.py
+"""Курсорная пагинация на строках, созданных приложением (время ставит БД)."""
+from db import crud
+from db.pagination import WAITING_SORT_KEY, archive_sort_key, encode_cursor
+
+CLIENT_ID = 1001
+ENGINEER_ID = 2002
+PAGE_SIZE = 8
+
+
+async def _create_requests(session, count: int) -> list[int]:
+    await crud.get_or_create_user(session, CLIENT_ID, "client", "Client", None)
+    await crud.get_or_create_user(session, ENGINEER_ID, "engineer", "Engineer", None)
+    ids = []
+    for number in range(count):
+        request = await crud.create_request(session, CLIENT_ID, "Client", "1", str(number), f"problem {number}")
+        ids.append(request.id)
+    return ids
+
+
+def test_new_requests_pages_forward_and_back(run_db):
+    async def scenario(session):
+        ids = await _create_requests(session, 25)
+        pages, cursor = [], None
+        while True:
+            page, total = await crud.get_new_requests(session, limit=PAGE_SIZE, cursor=cursor)
+            if not page:
+                break
+            pages.append(page)
+            cursor = encode_cursor(page[-1], WAITING_SORT_KEY)
+        assert total == 25
+        assert [[request.id for request in page] for page in pages] == [ids[0:8], ids[8:16], ids[16:24], ids[24:25]]
+
+        # "Назад" со второй страницы - первая страница
+        back, _ = await crud.get_new_requests(
+            session, limit=PAGE_SIZE, cursor=encode_cursor(pages[1][0], WAITING_SORT_KEY), backward=True
+        )
+        assert [request.id for request in back] == ids[0:8]
+    run_db(scenario)
+
+
+def test_archived_requests_pages_forward_and_back(run_db):
+    async def scenario(session):
+        ids = await _create_requests(session, 9)
+        for request_id in ids:
+            assert await crud.accept_request(session, request_id, ENGINEER_ID)
+            await session.commit()
+            assert await crud.complete_request(session, request_id, ENGINEER_ID)
+            await session.commit()
+        sort_key = archive_sort_key("date_desc")
+        newest_first = list(reversed(ids))
+
+        first, total = await crud.get_archived_requests(session, limit=3)
+        assert total == 9
+        assert [request.id for request in first] == newest_first[0:3]
+        second, _ = await crud.get_archived_requests(session, limit=3, cursor=encode_cursor(first[-1], sort_key))
+        assert [request.id for request in second] == newest_first[3:6]
+        back, _ = await crud.get_archived_requests(
+            session, limit=3, cursor=encode_cursor(second[0], sort_key), backward=True
+        )
+        assert [request.id for request in back] == newest_first[0:3]
+    run_db(scenario)
@@ -0,0 +1,34 @@
+# tests/test_search.py
+"""Поиск заявок (db/crud.py, search_requests; в SQLite - через FTS5)."""
+import pytest
+
+from db import crud
+
+CLIENT_ID = 1001
+
+
+async def _create(session, descriptions: list[str]) -> list[int]:
+    await crud.get_or_create_user(session, CLIENT_ID, "client", "Client", None)
+    ids = []
+    for number, description in enumerate(descriptions):
+        request = await crud.create_request(session, CLIENT_ID, "Client", "A", str(number), description)
+        ids.append(request.id)
+    return ids
+
+
+def test_search_by_words(run_db):
+    async def scenario(session):
+        printer, laptop, _ = await _create(session, ["Не печатает принтер", "Сломался ноутбук", "Нет сети"])
+        found, total = await crud.search_requests(session, text="принтер")
+        assert [request.id for request in found] == [printer] and total == 1
+        found, total = await crud.search_requests(session, text="сломался -принтер")
+        assert [request.id for request in found] == [laptop] and total == 1
+    run_db(scenario)
+
+
+@pytest.mark.parametrize("text", ["-принтер", '"..."', "!!!"])
+def test_search_without_positive_terms_finds_nothing(run_db, text):
+    async def scenario(session):
+        await _create(session, ["Не печатает принтер", "Сломался ноутбук"])
+        assert await crud.search_requests(session, text=text) == ([], 0)
+    run_db(scenario)
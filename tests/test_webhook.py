@@ -0,0 +1,122 @@
+# tests/test_webhook.py
+"""Прием апдейтов вебхуком (bot/webhook.py) с имитацией Bot API на aiohttp."""
+import asyncio
+import socket
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+from aiohttp import ClientSession, web
+
+from bot.webhook import SECRET_HEADER, WebhookServer
+
+TOKEN = "123456:test"
+SECRET = "webhook-secret"
+CHAT_ID = 1001
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _update(update_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": text,
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Client"},
+        },
+    }
+
+
+class FakeBotApi:
+    """Имитация Bot API: запоминает вызванные методы и отвечает успехом на sendMessage."""
+    def __init__(self):
+        self.calls: list[tuple[str, dict]] = []
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = dict(await request.post())
+        self.calls.append((method, data))
+        result = {
+            "message_id": len(self.calls), "date": 0, "text": data.get("text"),
+            "chat": {"id": int(data["chat_id"]), "type": "private"},
+        }
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        port = _free_port()
+        await web.TCPSite(self._runner, "127.0.0.1", port).start()
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+
+def _dispatcher(handled: list[str], release: asyncio.Event) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def echo(message: Message) -> None:
+        await release.wait()
+        handled.append(message.text)
+        await message.answer(f"echo: {message.text}")
+
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    return dispatcher
+
+
+def test_webhook_secret_queue_and_dispatch():
+    async def scenario():
+        api = FakeBotApi()
+        await api.start()
+        bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api.url)))
+        handled: list[str] = []
+        release = asyncio.Event()
+        server = WebhookServer(_dispatcher(handled, release), bot, "/webhook", SECRET, workers=1, queue_size=1)
+        port = _free_port()
+        await server.start("127.0.0.1", port)
+        url = f"http://127.0.0.1:{port}/webhook"
+        try:
+            async with ClientSession() as client:
+                async def post(update: dict, secret: str | None = SECRET) -> int:
+                    headers = {SECRET_HEADER: secret} if secret is not None else {}
+                    async with client.post(url, json=update, headers=headers) as response:
+                        return response.status
+
+                assert await post(_update(1, "wrong"), secret="wrong") == 401
+                assert await post(_update(1, "none"), secret=None) == 401
+
+                # Подтверждение до обработки: обработчик еще ждет release, а ответ уже 200
+                assert await post(_update(1, "first")) == 200
+                while len(server):  # Единственный обработчик забрал первый апдейт из очереди
+                    await asyncio.sleep(0.01)
+                assert await post(_update(2, "second")) == 200
+                assert len(server) == 1
+                # Обработчик занят, очередь (1) заполнена
+                assert await post(_update(3, "third")) == 503
+                assert handled == []
+
+            release.set()
+            await server.stop(timeout=5)
+        finally:
+            await bot.session.close()
+            await api.stop()
+
+        # Отклоненные апдейты не обработаны, принятые - обработаны по порядку до остановки
+        assert handled == ["first", "second"]
+        assert [(method, data["text"]) for method, data in api.calls] == [
+            ("sendMessage", "echo: first"), ("sendMessage", "echo: second")
+        ]
+    asyncio.run(scenario())